@@ -0,0 +1,55 @@
+"""Cost of building the /login authorization URL: prepared request vs. template.
+
+Usage:
+    python benchmarks/bench_authorization_url.py --iterations 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import timeit
+
+import requests
+
+from feide_login_full.login_flow import authorization_url_template
+
+_ENDPOINT = "https://auth.dataporten.no/oauth/authorization"
+_CLIENT_ID = "4a3b1c2d-0000-4000-8000-123456789abc"
+_REDIRECT_URI = "http://localhost:8000/callback"
+_STATE = "Jx0f3a9Zq1p3Yk6m2Vb7cA"
+_NONCE = "q9Vw2Lr7Tz4Hs1Nd8Kp0eB"
+_CHALLENGE = "E9Melhoa2OwvFrEMTJguCHaoeK1t8URWbuGJSstw-cM"
+
+
+def _prepared() -> str | None:
+    params = {
+        "response_type": "code",
+        "client_id": _CLIENT_ID,
+        "redirect_uri": _REDIRECT_URI,
+        "scope": "openid",
+        "state": _STATE,
+        "nonce": _NONCE,
+        "code_challenge": _CHALLENGE,
+        "code_challenge_method": "S256",
+    }
+    return requests.Request("GET", _ENDPOINT, params=params).prepare().url
+
+
+def _templated() -> str:
+    template = authorization_url_template(_ENDPOINT, _CLIENT_ID, _REDIRECT_URI, "openid")
+    return template.render(state=_STATE, nonce=_NONCE, challenge=_CHALLENGE)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=100_000)
+    args = parser.parse_args()
+
+    assert _prepared() == _templated()
+    for name, func in (("prepared request", _prepared), ("template", _templated)):
+        seconds = min(timeit.repeat(func, number=args.iterations, repeat=3))
+        print(f"{name:<17} {seconds / args.iterations * 1e6:8.2f} µs/url")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Throughput of feide_login_full's index page with and without the fragment cache.
+
+Runs the app in-process through Flask's test client with a realistic session
+(ID token claims, userinfo and a large extended userinfo document), so the
+numbers isolate rendering cost from network and server overhead.
+
+Usage:
+    python benchmarks/bench_index_page.py --requests 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from feide_login_full.app import create_app
+from feide_login_full.config import Settings
+
+_SETTINGS = Settings(
+    issuer="https://issuer",
+    client_id="bench",
+    client_secret="bench",
+    redirect_uri="http://localhost/callback",
+    app_secret_key="bench",
+    extended_userinfo_url="https://example/userinfo",
+    token_exchange_audience=None,
+    token_exchange_scope=None,
+    post_logout_redirect_uri=None,
+    datasource_api_url=None,
+)
+
+
+def _user(version: str | None) -> dict[str, object]:
+    user: dict[str, object] = {
+        "sub": "76a7a061-3c55-430d-8ee0-6f82ec42501f",
+        "id_token_claims": {"iss": "https://issuer", "sub": "bench", "aud": "bench", "exp": 0},
+        "oidc_userinfo": {"name": "Ada Lovelace", "email": "ada@example.org"},
+        "extended_userinfo": {
+            "eduPersonPrincipalName": "ada@example.org",
+            "eduPersonEntitlement": [f"urn:mace:example.org:entitlement:{i}" for i in range(200)],
+            "eduPersonAffiliation": ["member", "employee", "staff"],
+        },
+        "feide_access_token": "x" * 40,
+        "feide_access_token_expires_in": 28800,
+        "exchanged_access_token": "y" * 800,
+        "exchanged_expires_in": 3600,
+    }
+    if version is not None:
+        user["render_version"] = version
+    return user
+
+
+def _run(version: str | None, count: int) -> float:
+    client = create_app(_SETTINGS).test_client()
+    with client.session_transaction() as session:
+        session["user"] = _user(version)
+    _ = client.get("/")
+    started = time.perf_counter()
+    for _ in range(count):
+        _ = client.get("/")
+    return count / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"uncached: {_run(None, args.requests):8.0f} req/s")
+    print(f"cached:   {_run('bench', args.requests):8.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Memory and throughput of the jti replay cache.
+
+Inserts N random jtis spread over the token lifetime window and reports filter
+memory per million tokens, insert rate and the measured false-positive rate.
+
+Usage:
+    python benchmarks/bench_replay_cache.py --tokens 1000000 --fp-rate 1e-6
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import time
+import uuid
+
+from feide_login_core.replay_cache import ReplayCache
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=1_000_000)
+    parser.add_argument("--fp-rate", type=float, default=1e-6)
+    parser.add_argument("--lifetime-s", type=float, default=3600.0)
+    parser.add_argument("--slice-s", type=float, default=600.0)
+    parser.add_argument("--probes", type=int, default=200_000)
+    args = parser.parse_args()
+
+    now = time.time()
+    slices = math.ceil(args.lifetime_s / args.slice_s)
+    cache = ReplayCache(
+        max_lifetime_s=args.lifetime_s,
+        slice_s=args.slice_s,
+        tokens_per_slice=math.ceil(args.tokens / slices),
+        false_positive_rate=args.fp_rate,
+        clock=lambda: now,
+    )
+
+    jtis = [uuid.uuid4().hex for _ in range(args.tokens)]
+    started = time.perf_counter()
+    for i, jti in enumerate(jtis):
+        _ = cache.check_and_add(jti, now + 1 + (i % slices) * args.slice_s)
+    elapsed = time.perf_counter() - started
+
+    false_positives = sum(
+        not cache.check_and_add(uuid.uuid4().hex, now + 1 + (i % slices) * args.slice_s)
+        for i in range(args.probes)
+    )
+
+    stats = cache.stats()
+    per_million = stats.bytes / args.tokens * 1_000_000
+    print(f"tokens:              {args.tokens}")
+    print(f"filters:             {stats.filters} (bound {cache.max_bytes / 2**20:.1f} MiB)")
+    print(f"memory:              {stats.bytes / 2**20:.2f} MiB")
+    print(f"per million tokens:  {per_million / 2**20:.2f} MiB")
+    print(f"insert rate:         {args.tokens / elapsed:,.0f}/s")
+    print(f"false positives:     {false_positives}/{args.probes} (budget {args.fp_rate:g})")
+
+
+if __name__ == "__main__":
+    main()
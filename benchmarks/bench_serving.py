@@ -0,0 +1,116 @@
+"""Throughput of the data source API under the dev server vs. gunicorn.
+
+Starts ``feide_data_source_api`` with dummy credentials (no Feide calls are made),
+drives ``/healthz`` from a pool of keep-alive client threads and prints
+requests/second and latency percentiles.
+
+Usage:
+    python benchmarks/bench_serving.py --server dev
+    python benchmarks/bench_serving.py --server gunicorn --workers 4 --threads 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+_ENV = {
+    "DATASOURCE_CLIENT_ID": "bench",
+    "DATASOURCE_CLIENT_SECRET": "bench",
+    "DATASOURCE_AUDIENCE": "bench",
+    "DATASOURCE_REQUIRED_SCOPE": "bench",
+    "DATASOURCE_TOKEN_EXCHANGE_AUDIENCE": "bench",
+}
+
+
+def _start(server: str, port: int, workers: int, threads: int) -> subprocess.Popen[bytes]:
+    env = {
+        **os.environ,
+        **_ENV,
+        "PORT": str(port),
+        "SERVER_WORKERS": str(workers),
+        "SERVER_THREADS": str(threads),
+    }
+    code = (
+        "from feide_data_source_api.app import create_app, load_settings;"
+        f"create_app(load_settings()).run(host='127.0.0.1', port={port}, debug=False)"
+        if server == "dev"
+        else "from feide_data_source_api.app import serve; serve()"
+    )
+    return subprocess.Popen(
+        [sys.executable, "-c", code], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def _wait_until_up(url: str, timeout_s: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=1.0).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+def _drive(url: str, clients: int, duration_s: float) -> list[float]:
+    latencies: list[float] = []
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration_s
+
+    def client() -> None:
+        session = requests.Session()
+        local: list[float] = []
+        while time.monotonic() < stop_at:
+            started = time.perf_counter()
+            _ = session.get(url, timeout=5.0)
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    _ = parser.add_argument("--server", choices=["dev", "gunicorn"], default="gunicorn")
+    _ = parser.add_argument("--workers", type=int, default=2)
+    _ = parser.add_argument("--threads", type=int, default=4)
+    _ = parser.add_argument("--clients", type=int, default=16)
+    _ = parser.add_argument("--duration", type=float, default=10.0)
+    _ = parser.add_argument("--port", type=int, default=18001)
+    args = parser.parse_args()
+
+    proc = _start(args.server, args.port, args.workers, args.threads)
+    url = f"http://127.0.0.1:{args.port}/healthz"
+    try:
+        _wait_until_up(url)
+        latencies = sorted(_drive(url, args.clients, args.duration))
+    finally:
+        proc.terminate()
+        _ = proc.wait()
+
+    count = len(latencies)
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(count * 0.99) - 1] * 1000
+    print(
+        f"{args.server}: {count / args.duration:.0f} req/s, "
+        f"p50 {p50:.1f} ms, p99 {p99:.1f} ms ({args.clients} clients, {os.cpu_count()} CPU)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,13 @@
 """Type-safe Flask app for a Feide data source API.
 
 Routes / endpoints:
-- /me    Returns extended userinfo and groupinfo for the authenticated subject
+- /me       Returns extended userinfo and groupinfo for the authenticated subject
+            (``?fields=subject,groupinfo`` limits the response and the upstream calls made,
+            ``?stream=1`` writes the JSON incrementally as a chunked response)
+- /me/groups  Filtered, paginated groupinfo (type, id_prefix, role, active, offset, limit)
+- /healthz  Liveness probe (reports discovery/JWKS cache state)
+- /metrics  Bulkhead, admission and cache counters (JSON)
+- /readyz   Readiness probe (503 until discovery and JWKS are cached and fresh)
 
 This sample is intentionally explicit. No OAuth2 third-party libraries are used.
 """
@@ -10,26 +16,125 @@ This sample is intentionally explicit. No OAuth2 third-party libraries are used.
 
 from __future__ import annotations
 
-import json
-from collections.abc import Mapping
+import math
+import time
+from collections.abc import Iterator, Mapping
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import asdict
 from http import HTTPStatus
 from typing import Any, cast
 
 import requests
 from flask import Flask, Response, request
 
-from feide_data_source_api.config import Settings, load_settings
+from feide_data_source_api.config import RELOADABLE_FIELDS, Settings, load_settings
+from feide_data_source_api.encoding import available_encodings, compress_stream, iter_json, peek
+from feide_data_source_api.groups import GroupQuery
+from feide_data_source_api.payload import JsonDocument, MeEntry, dumps, parse_fields
+from feide_login_core.bulkhead import Bulkheads
+from feide_login_core.cache_backend import (
+    InProcessCacheBackend,
+    SharedCache,
+    create_shared_cache,
+)
+from feide_login_core.concurrency import ConcurrencyLimiter, ConcurrencyLimitExceeded
+from feide_login_core.http_pool import create_http_session
 from feide_login_core.json_utils import require_json_array
-from feide_login_core.jwt_validation import AccessTokenValidationError, validate_access_token
+from feide_login_core.jwt_validation import (
+    AccessTokenValidationError,
+    check_replay,
+    validate_access_token,
+)
+from feide_login_core.metadata_cache import SharedMetadataCache
 from feide_login_core.oidc import OIDCClient, OIDCError
+from feide_login_core.oidc_models import TokenExchangeResponse
+from feide_login_core.pinned_metadata import MetadataRefresher, load_pinned_metadata
+from feide_login_core.rate_limit import InMemoryRateLimitBackend, RateLimit, RateLimitBackend
+from feide_login_core.replay_cache import ReplayCache
+from feide_login_core.serving import exit_on_sigterm, run_server
+from feide_login_core.settings_reload import (
+    SettingsProvider,
+    create_settings_provider,
+    fixed_settings,
+    load_reload_settings,
+)
+from feide_login_core.snapshot import (
+    entries_from_json,
+    entries_to_json,
+    metadata_from_json,
+    metadata_to_json,
+    open_snapshot,
+    save_at_exit,
+)
+from feide_login_core.ttl_cache import TTLCache
+from feide_login_core.warmup import WarmupReport, readiness, warm_up
+
+
+def _pretty_requested() -> bool:
+    return request.args.get("pretty", "").lower() in {"1", "true", "yes"}
 
 
 def _json_response(data: Any, *, status: int = HTTPStatus.OK) -> Response:
     return Response(
-        json.dumps(data, indent=2, sort_keys=True), status=status, mimetype="application/json"
+        dumps(data, pretty=_pretty_requested()), status=status, mimetype="application/json"
     )
 
 
+def _stream_requested(default: bool) -> bool:
+    raw = request.args.get("stream")
+    if raw is None:
+        return default
+    return raw.lower() in {"1", "true", "yes"}
+
+
+def _negotiated_encoding(compression_min_bytes: int) -> str | None:
+    if compression_min_bytes <= 0:
+        return None
+    return request.accept_encodings.best_match(available_encodings())
+
+
+def _document_response(doc: JsonDocument, *, compression_min_bytes: int = 0) -> Response:
+    # The ETag is weak: compact and pretty bodies differ in bytes but not in content.
+    encoding = _negotiated_encoding(compression_min_bytes)
+    if request.if_none_match.contains_weak(doc.etag):
+        resp = Response(status=HTTPStatus.NOT_MODIFIED)
+    elif _pretty_requested():
+        resp = Response(dumps(doc.payload, pretty=True), mimetype="application/json")
+    elif encoding is not None and len(doc.body) >= compression_min_bytes:
+        resp = Response(doc.encoded(encoding), mimetype="application/json")
+        resp.headers["Content-Encoding"] = encoding
+    else:
+        resp = Response(doc.body, mimetype="application/json")
+    resp.set_etag(doc.etag, weak=True)
+    # Let clients (and the login example) revalidate instead of refetching.
+    resp.headers["Cache-Control"] = "private, no-cache"
+    if compression_min_bytes > 0:
+        resp.headers["Vary"] = "Accept-Encoding"
+    return resp
+
+
+def _stream_response(payload: Mapping[str, object], *, compression_min_bytes: int = 0) -> Response:
+    """Chunked response written while serializing. Streams carry no ETag (not known up front)."""
+    chunks = iter_json(payload, pretty=_pretty_requested())
+    resp = Response(mimetype="application/json")
+    encoding = _negotiated_encoding(compression_min_bytes)
+    if encoding is not None:
+        large, chunks = peek(chunks, compression_min_bytes)
+        if large:
+            chunks = compress_stream(chunks, encoding)
+            resp.headers["Content-Encoding"] = encoding
+        resp.headers["Vary"] = "Accept-Encoding"
+    resp.response = chunks
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+
+def _retry_response(message: str, *, status: int, retry_after_s: float) -> Response:
+    resp = Response(message, status=status)
+    resp.headers["Retry-After"] = str(max(1, math.ceil(retry_after_s)))
+    return resp
+
+
 def _extract_bearer_token() -> str | None:
     auth = request.headers.get("Authorization", "")
     if not auth.startswith("Bearer "):
@@ -37,35 +142,309 @@ def _extract_bearer_token() -> str | None:
     return auth.removeprefix("Bearer ").strip() or None
 
 
-def _has_scope(claims: Mapping[str, object], required_scope: str) -> bool:
+def _scopes(claims: Mapping[str, object]) -> frozenset[str]:
     raw = claims.get("scope")
     if isinstance(raw, str):
-        return required_scope in raw.split()
+        return frozenset(raw.split())
     if isinstance(raw, list):
         raw_list = cast(list[object], raw)
-        for item in raw_list:
-            if isinstance(item, str) and item == required_scope:
-                return True
-        return False
-    return False
+        return frozenset(item for item in raw_list if isinstance(item, str))
+    return frozenset()
+
+
+def _has_scope(claims: Mapping[str, object], required_scope: str) -> bool:
+    return required_scope in _scopes(claims)
 
 
-def create_app(settings: Settings) -> Flask:
+def _me_cache_key(claims: Mapping[str, object]) -> str | None:
+    sub = claims.get("sub")
+    if not isinstance(sub, str) or not sub:
+        return None
+    return f"{sub} {' '.join(sorted(_scopes(claims)))}"
+
+
+def _rate_limit_keys(
+    claims: Mapping[str, object], settings: Settings
+) -> Iterator[tuple[str, RateLimit]]:
+    client = claims.get("azp") or claims.get("client_id")
+    if isinstance(client, str) and client and settings.client_rate_limit.enabled:
+        yield f"client:{client}", settings.client_rate_limit
+    sub = claims.get("sub")
+    if isinstance(sub, str) and sub and settings.subject_rate_limit.enabled:
+        yield f"sub:{sub}", settings.subject_rate_limit
+
+
+def _cache_bypass_requested() -> bool:
+    directives = request.headers.get("Cache-Control", "").lower()
+    return "no-cache" in directives or "no-store" in directives
+
+
+class _UpstreamError(Exception):
+    pass
+
+
+# Cached exchanged tokens are handed out only while they stay valid this much longer.
+_EXCHANGE_CACHE_MARGIN_S = 30.0
+
+
+def _exchanged_from_shared(value: object) -> TokenExchangeResponse | None:
+    """A cached token exchange result with ``expires_in`` counted from now, if still usable."""
+    if not isinstance(value, dict):
+        return None
+    data = cast(dict[str, object], value)
+    expires_at = data.get("expires_at")
+    if not isinstance(expires_at, int | float):
+        return None
+    remaining = int(expires_at - time.time())
+    if remaining <= _EXCHANGE_CACHE_MARGIN_S:
+        return None
+    try:
+        return TokenExchangeResponse.from_json({**data, "expires_in": remaining})
+    except (TypeError, ValueError):
+        return None
+
+
+def _me_entry_from_shared(value: object, ttl_s: float) -> MeEntry | None:
+    """Rebuild a shared /me entry with the age it had on the node that fetched it."""
+    if not isinstance(value, dict):
+        return None
+    data = cast(dict[str, object], value)
+    parts, expires_at = data.get("parts"), data.get("expires_at")
+    if not isinstance(parts, dict) or not isinstance(expires_at, int | float):
+        return None
+    remaining = expires_at - time.time()
+    if remaining <= 0:
+        return None
+    return MeEntry(
+        parts=cast(dict[str, object], parts),
+        created_at=time.monotonic() - max(0.0, ttl_s - remaining),
+    )
+
+
+def create_app(
+    settings: Settings,
+    *,
+    rate_limit_backend: RateLimitBackend | None = None,
+    settings_provider: SettingsProvider[Settings] | None = None,
+) -> Flask:
+    """Build the app. Rate limits are per process unless a shared ``rate_limit_backend`` is passed.
+
+    With a ``settings_provider``, ``settings`` is its initial version and request
+    handlers use whichever version is current when they start.
+    """
     app = Flask("feide_data_source_api")
+    live = settings_provider or fixed_settings(settings)
 
+    http = (
+        create_http_session(pool_maxsize=settings.http_pool_maxsize)
+        if settings.http_pool_maxsize > 0
+        else None
+    )
+    bulkheads = Bulkheads(settings.bulkheads) if settings.bulkheads.enabled else None
     oidc = OIDCClient(
         issuer=settings.issuer,
         client_id=settings.client_id,
         client_secret=settings.client_secret,
         redirect_uri="http://unused",  # We are only using the token endpoint (client credentials).
         http_timeout_s=settings.http_timeout_s,
+        metadata_cache=(
+            SharedMetadataCache(settings.metadata_cache_path, ttl_s=settings.metadata_cache_ttl_s)
+            if settings.metadata_cache_path
+            else None
+        ),
+        http=http,
+        bulkheads=bulkheads,
     )
 
-    @app.get("/me")
-    def me():
+    def apply_credentials(old: Settings, new: Settings) -> None:
+        if (new.client_id, new.client_secret) != (old.client_id, old.client_secret):
+            oidc.set_credentials(new.client_id, new.client_secret)
+
+    live.on_reload(apply_credentials)
+
+    @app.before_request
+    def reload_settings() -> None:
+        _ = live.maybe_reload()
+
+    # /me parts per (sub, scope set). Disabled when the TTL is 0.
+    me_cache: TTLCache[MeEntry] | None = (
+        TTLCache(max_entries=settings.me_cache_max_entries, max_size=settings.me_cache_max_bytes)
+        if settings.me_cache_ttl_s > 0
+        else None
+    )
+
+    shared_cache: SharedCache | None = (
+        create_shared_cache(settings.cache)
+        if settings.exchange_cache or settings.cache.url
+        else None
+    )
+    # Only worth a round trip when the shared cache actually lives outside this process.
+    shared_me = shared_cache if me_cache is not None and settings.cache.url else None
+
+    rate_limits = rate_limit_backend or InMemoryRateLimitBackend()
+    upstream_limiter = (
+        ConcurrencyLimiter(
+            settings.max_concurrent,
+            max_queue=settings.max_queued,
+            queue_timeout_s=settings.queue_timeout_s,
+        )
+        if settings.max_concurrent > 0
+        else None
+    )
+
+    def upstream_slot() -> AbstractContextManager[None]:
+        return upstream_limiter.slot() if upstream_limiter is not None else nullcontext()
+
+    replay_cache = (
+        ReplayCache(
+            max_lifetime_s=settings.replay_max_lifetime_s,
+            tokens_per_slice=settings.replay_tokens_per_slice,
+            false_positive_rate=settings.replay_false_positive_rate,
+        )
+        if settings.replay_detection
+        else None
+    )
+
+    # In-process token exchange results; with CACHE_URL they already outlive the process.
+    local_shared = (
+        shared_cache.backend
+        if shared_cache is not None and isinstance(shared_cache.backend, InProcessCacheBackend)
+        else None
+    )
+
+    def snapshot_contents() -> dict[str, object]:
+        return {
+            "metadata": metadata_to_json(oidc.cached_metadata()),
+            "me": (
+                entries_to_json(
+                    (key, dict(entry.parts), ttl_s) for key, entry, ttl_s in me_cache.entries()
+                )
+                if me_cache is not None
+                else []
+            ),
+            "shared": (
+                entries_to_json(
+                    (key, value.decode("utf-8"), ttl_s)
+                    for key, value, ttl_s in local_shared.entries()
+                )
+                if local_shared is not None
+                else []
+            ),
+        }
+
+    def restore_snapshot(data: Mapping[str, object]) -> dict[str, int]:
+        metadata = metadata_from_json(data.get("metadata"), max_age_s=settings.snapshot.max_age_s)
+        oidc.seed_metadata(metadata)
+        restored = {"metadata": len(metadata), "me": 0, "shared": 0}
+        if me_cache is not None:
+            for key, parts, ttl_s in entries_from_json(data.get("me")):
+                if not isinstance(parts, dict):
+                    continue
+                ttl_s = min(ttl_s, settings.me_cache_ttl_s)
+                entry = MeEntry(
+                    parts=cast(dict[str, object], parts),
+                    created_at=time.monotonic() - (settings.me_cache_ttl_s - ttl_s),
+                )
+                if me_cache.set(key, entry, ttl_s=ttl_s, size=entry.size()):
+                    restored["me"] += 1
+        if local_shared is not None:
+            shared = [
+                (key, value.encode("utf-8"), ttl_s)
+                for key, value, ttl_s in entries_from_json(data.get("shared"))
+                if isinstance(value, str)
+            ]
+            local_shared.restore(shared)
+            restored["shared"] = len(shared)
+        return restored
+
+    snapshot = open_snapshot(settings.snapshot, default_secret=settings.client_secret)
+    snapshot_restored: dict[str, int] | None = None
+    if snapshot is not None:
+        contents = snapshot.load()
+        if contents is not None:
+            snapshot_restored = restore_snapshot(contents)
+
+        def save_snapshot() -> None:
+            snapshot.save(snapshot_contents())
+
+        save_at_exit(save_snapshot)
+        app.extensions["save_cache_snapshot"] = save_snapshot
+
+    # Pinned documents only fill what the snapshot did not restore.
+    pinned = load_pinned_metadata(
+        discovery_path=settings.pinned_discovery_path, jwks_path=settings.pinned_jwks_path
+    )
+    metadata_refresher: MetadataRefresher | None = None
+    if pinned:
+        oidc.seed_metadata(pinned)
+        metadata_refresher = MetadataRefresher(
+            oidc, interval_s=settings.metadata_refresh_interval_s, pinned=pinned
+        )
+
+    if metadata_refresher is not None:
+
+        @app.before_request
+        def start_metadata_refresh() -> None:
+            metadata_refresher.ensure_running()
+
+    warmup_report: WarmupReport | None = None
+    if settings.warmup_on_start:
+        warmup_report = warm_up(
+            oidc, connect_urls=[settings.extended_userinfo_url, settings.groupinfo_url]
+        )
+
+    @app.get("/healthz")
+    def healthz() -> Response:
+        return _json_response(
+            {
+                "status": "ok",
+                "metadata": oidc.metadata_status(),
+                "warmup": asdict(warmup_report) if warmup_report is not None else None,
+                "metadata_refresh": (
+                    asdict(metadata_refresher.status()) if metadata_refresher else None
+                ),
+            }
+        )
+
+    @app.get("/metrics")
+    def metrics() -> Response:
+        return _json_response(
+            {
+                "bulkheads": {
+                    name: asdict(stats)
+                    for name, stats in (bulkheads.stats() if bulkheads else {}).items()
+                },
+                "admission": asdict(upstream_limiter.stats()) if upstream_limiter else None,
+                "me_cache": asdict(me_cache.stats()) if me_cache is not None else None,
+                "replay_cache": asdict(replay_cache.stats()) if replay_cache else None,
+                "shared_cache": asdict(shared_cache.stats()) if shared_cache else None,
+                "snapshot_restored": snapshot_restored,
+                "settings": asdict(live.status()),
+            }
+        )
+
+    @app.get("/readyz")
+    def readyz() -> Response:
+        ready, details = readiness(oidc)
+        return _json_response(
+            {"ready": ready, **details},
+            status=HTTPStatus.OK if ready else HTTPStatus.SERVICE_UNAVAILABLE,
+        )
+
+    @app.errorhandler(ConcurrencyLimitExceeded)
+    def overloaded(exc: ConcurrencyLimitExceeded) -> Response:
+        # Shed load instead of queueing more threads behind a slow upstream.
+        return _retry_response(
+            "Service overloaded",
+            status=HTTPStatus.SERVICE_UNAVAILABLE,
+            retry_after_s=exc.retry_after_s,
+        )
+
+    def authorize(settings: Settings) -> tuple[str, Mapping[str, object]] | Response:
+        """Return (access_token, claims) for a valid bearer token, or an error response."""
         access_token = _extract_bearer_token()
         if not access_token:
-            return "Missing Bearer token", HTTPStatus.UNAUTHORIZED
+            return Response("Missing Bearer token", status=HTTPStatus.UNAUTHORIZED)
 
         try:
             claims = validate_access_token(
@@ -74,61 +453,270 @@ def create_app(settings: Settings) -> Flask:
                 issuer=settings.issuer,
                 audience=settings.datasource_audience,
             )
+            if replay_cache is not None:
+                # Only checked here; the token is used up once the request succeeds.
+                check_replay(claims, replay_cache, record=False)
         except (AccessTokenValidationError, OIDCError) as exc:
-            return f"Invalid access token: {exc}", HTTPStatus.UNAUTHORIZED
+            if metadata_refresher is not None:
+                # Possibly signed with a key newer than the cached JWKS.
+                metadata_refresher.request_refresh()
+            return Response(f"Invalid access token: {exc}", status=HTTPStatus.UNAUTHORIZED)
 
         if not _has_scope(claims, settings.required_scope):
-            return f"Missing required scope: {settings.required_scope}", HTTPStatus.FORBIDDEN
+            return Response(
+                f"Missing required scope: {settings.required_scope}", status=HTTPStatus.FORBIDDEN
+            )
+
+        # A request refused by one bucket must not use up the others.
+        wait_s = rate_limits.take_all(list(_rate_limit_keys(claims, settings)))
+        if wait_s > 0:
+            return _retry_response(
+                "Rate limit exceeded",
+                status=HTTPStatus.TOO_MANY_REQUESTS,
+                retry_after_s=wait_s,
+            )
+        return access_token, claims
 
+    def record_use(claims: Mapping[str, object]) -> Response | None:
+        """Use up the token's ``jti`` for a request about to succeed; None if it may proceed.
+
+        Two concurrent requests with the same token both pass ``authorize``; only the
+        first to get here is answered.
+        """
+        if replay_cache is None:
+            return None
         try:
-            exchanged = oidc.token_exchange(
-                subject_token=access_token,
-                audience=settings.token_exchange_audience,
-                scope=settings.token_exchange_scope,
-                subject_token_type="urn:ietf:params:oauth:token-type:jwt",
-                requested_token_type="urn:ietf:params:oauth:token-type:access_token",
+            check_replay(claims, replay_cache)
+        except AccessTokenValidationError as exc:
+            return Response(f"Invalid access token: {exc}", status=HTTPStatus.UNAUTHORIZED)
+        return None
+
+    def remember(settings: Settings, cache_key: str, entry: MeEntry, *, share: bool) -> None:
+        if me_cache is None:
+            return
+        ttl_s = settings.me_cache_ttl_s - (time.monotonic() - entry.created_at)
+        _ = me_cache.set(cache_key, entry, ttl_s=ttl_s, size=entry.size())
+        if share and shared_me is not None:
+            shared_me.set(
+                shared_me.key("me", cache_key),
+                {"parts": dict(entry.parts), "expires_at": time.time() + ttl_s},
+                ttl_s=ttl_s,
             )
-        except OIDCError as exc:
-            return f"token exchange error: {exc}", HTTPStatus.BAD_GATEWAY
+
+    def load_entry(
+        settings: Settings, access_token: str, claims: Mapping[str, object], fields: tuple[str, ...]
+    ) -> tuple[MeEntry, str]:
+        """Return the /me parts covering ``fields`` and the cache status (hit/miss/bypass)."""
+        cache_key = _me_cache_key(claims) if me_cache is not None else None
+        bypass = _cache_bypass_requested()
+        entry = None
+        if me_cache is not None and cache_key is not None and not bypass:
+            entry = me_cache.get(cache_key)
+        if entry is not None and not entry.missing(fields):
+            return entry, "hit"
+        if shared_me is not None and cache_key is not None and not bypass:
+            # Another node may already have fetched (more of) this subject's parts.
+            shared = _me_entry_from_shared(
+                shared_me.get(shared_me.key("me", cache_key)), settings.me_cache_ttl_s
+            )
+            if shared is not None and (entry is None or shared.created_at > entry.created_at):
+                entry = shared
+                if not entry.missing(fields):
+                    remember(settings, cache_key, entry, share=False)
+                    return entry, "hit"
+
+        base = entry or MeEntry(parts={"subject": claims.get("sub")})
+        missing = base.missing(fields)
+        fetched: dict[str, object] = {}
+        if missing:
+            with upstream_slot():
+                fetched = fetch_upstream(settings, access_token, claims, missing)
+        entry = base.merged(fetched) if fetched else base
+        if cache_key is not None:
+            stored = entry
+            if bypass:
+                # Only the requested parts were refetched: update them in the cached entry
+                # instead of replacing it, so its other parts are not lost.
+                previous = me_cache.get(cache_key) if me_cache is not None else None
+                if previous is None and shared_me is not None:
+                    previous = _me_entry_from_shared(
+                        shared_me.get(shared_me.key("me", cache_key)), settings.me_cache_ttl_s
+                    )
+                if previous is not None:
+                    stored = previous.merged(fetched)
+            remember(settings, cache_key, stored, share=True)
+        return entry, "bypass" if bypass else "miss"
+
+    def with_cache_status(resp: Response, cache_status: str) -> Response:
+        if me_cache is not None:
+            resp.headers["X-Cache"] = cache_status
+        return resp
+
+    @app.get("/me")
+    def me():
+        settings = live.current
+        authorized = authorize(settings)
+        if isinstance(authorized, Response):
+            return authorized
+        access_token, claims = authorized
+
+        try:
+            fields = parse_fields(request.args.get("fields"))
+        except ValueError as exc:
+            return str(exc), HTTPStatus.BAD_REQUEST
 
         try:
-            extended_userinfo = oidc.extended_userinfo(
-                access_token=exchanged.access_token,
-                extended_userinfo_url=settings.extended_userinfo_url,
+            entry, cache_status = load_entry(settings, access_token, claims, fields)
+        except _UpstreamError as exc:
+            return str(exc), HTTPStatus.BAD_GATEWAY
+        replayed = record_use(claims)
+        if replayed is not None:
+            return replayed
+
+        if _stream_requested(settings.stream_responses):
+            payload = {name: entry.parts[name] for name in fields}
+            resp = _stream_response(payload, compression_min_bytes=settings.compression_min_bytes)
+        else:
+            resp = _document_response(
+                entry.document(fields), compression_min_bytes=settings.compression_min_bytes
             )
-        except OIDCError as exc:
-            return f"extended userinfo error: {exc}", HTTPStatus.BAD_GATEWAY
+        return with_cache_status(resp, cache_status)
 
-        groupinfo_resp = requests.get(
-            settings.groupinfo_url,
-            headers={"Authorization": f"Bearer {exchanged.access_token}"},
-            timeout=settings.http_timeout_s,
-        )
-        if groupinfo_resp.status_code != HTTPStatus.OK:
-            return (
-                f"groupinfo error ({groupinfo_resp.status_code}): {groupinfo_resp.text}",
-                HTTPStatus.BAD_GATEWAY,
+    @app.get("/me/groups")
+    def me_groups():
+        settings = live.current
+        authorized = authorize(settings)
+        if isinstance(authorized, Response):
+            return authorized
+        access_token, claims = authorized
+
+        try:
+            query = GroupQuery.from_args(request.args)
+        except ValueError as exc:
+            return str(exc), HTTPStatus.BAD_REQUEST
+
+        try:
+            entry, cache_status = load_entry(settings, access_token, claims, ("groupinfo",))
+        except _UpstreamError as exc:
+            return str(exc), HTTPStatus.BAD_GATEWAY
+        replayed = record_use(claims)
+        if replayed is not None:
+            return replayed
+
+        page = entry.group_index().query(query)
+        doc = JsonDocument.build(page.to_json())
+        resp = _document_response(doc, compression_min_bytes=settings.compression_min_bytes)
+        return with_cache_status(resp, cache_status)
+
+    def exchange_token(
+        settings: Settings, access_token: str, claims: Mapping[str, object]
+    ) -> TokenExchangeResponse:
+        """Exchange the caller's token, reusing a cached result for the same token."""
+        key = (
+            shared_cache.key(
+                "token-exchange",
+                access_token,
+                settings.token_exchange_audience,
+                settings.token_exchange_scope,
             )
-        groupinfo = require_json_array(
-            groupinfo_resp.json(), error="groupinfo response is not a JSON array"
+            if shared_cache is not None and settings.exchange_cache
+            else None
         )
+        if shared_cache is not None and key is not None:
+            cached = _exchanged_from_shared(shared_cache.get(key))
+            if cached is not None:
+                return cached
 
-        return _json_response(
-            {
-                "subject": claims.get("sub"),
-                "extended_userinfo": dict(extended_userinfo),
-                "groupinfo": groupinfo,
-            }
+        exchanged = oidc.token_exchange(
+            subject_token=access_token,
+            audience=settings.token_exchange_audience,
+            scope=settings.token_exchange_scope,
+            subject_token_type="urn:ietf:params:oauth:token-type:jwt",
+            requested_token_type="urn:ietf:params:oauth:token-type:access_token",
         )
+        if shared_cache is not None and key is not None:
+            expires_at = time.time() + exchanged.expires_in
+            # Never keep the result past the subject token's own expiry.
+            exp = claims.get("exp")
+            if isinstance(exp, int | float):
+                expires_at = min(expires_at, float(exp))
+            shared_cache.set(
+                key,
+                {
+                    "access_token": exchanged.access_token,
+                    "token_type": exchanged.token_type,
+                    "scope": exchanged.scope,
+                    "expires_at": expires_at,
+                },
+                ttl_s=expires_at - time.time() - _EXCHANGE_CACHE_MARGIN_S,
+            )
+        return exchanged
+
+    def fetch_upstream(
+        settings: Settings, access_token: str, claims: Mapping[str, object], fields: frozenset[str]
+    ) -> dict[str, object]:
+        """Fetch only the upstream parts in ``fields``; skips token exchange if none are needed."""
+        parts: dict[str, object] = {}
+        if not fields:
+            return parts
+
+        try:
+            exchanged = exchange_token(settings, access_token, claims)
+        except OIDCError as exc:
+            raise _UpstreamError(f"token exchange error: {exc}") from exc
+
+        if "extended_userinfo" in fields:
+            try:
+                extended_userinfo = oidc.extended_userinfo(
+                    access_token=exchanged.access_token,
+                    extended_userinfo_url=settings.extended_userinfo_url,
+                )
+            except OIDCError as exc:
+                raise _UpstreamError(f"extended userinfo error: {exc}") from exc
+            parts["extended_userinfo"] = dict(extended_userinfo)
+
+        if "groupinfo" in fields:
+            with bulkheads.call("groupinfo") if bulkheads is not None else nullcontext():
+                groupinfo_resp = (http or requests).get(
+                    settings.groupinfo_url,
+                    headers={"Authorization": f"Bearer {exchanged.access_token}"},
+                    timeout=settings.http_timeout_s,
+                )
+            if groupinfo_resp.status_code != HTTPStatus.OK:
+                raise _UpstreamError(
+                    f"groupinfo error ({groupinfo_resp.status_code}): {groupinfo_resp.text}"
+                )
+            parts["groupinfo"] = require_json_array(
+                groupinfo_resp.json(), error="groupinfo response is not a JSON array"
+            )
+
+        return parts
 
     return app
 
 
+def _settings_provider() -> SettingsProvider[Settings]:
+    return create_settings_provider(
+        lambda environ: load_settings(environ=environ),
+        reloadable=RELOADABLE_FIELDS,
+        settings=load_reload_settings(),
+    )
+
+
 def main() -> None:
-    settings = load_settings()
-    app = create_app(settings)
+    # Flask development server; use serve() (or the console script) in production.
+    exit_on_sigterm()
+    provider = _settings_provider()
+    app = create_app(provider.current, settings_provider=provider)
     app.run(host="0.0.0.0", port=8001, debug=False)
 
 
+def serve() -> None:
+    provider = _settings_provider()
+    run_server(
+        lambda: create_app(provider.current, settings_provider=provider), provider.current.server
+    )
+
+
 if __name__ == "__main__":
     main()
@@ -6,8 +6,16 @@ these should be supplied by your runtime (Kubernetes secrets, vault, etc.).
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from os import getenv
+import os
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+
+from feide_login_core.bulkhead import BulkheadSettings, load_bulkhead_settings
+from feide_login_core.cache_backend import CacheSettings, load_cache_settings
+from feide_login_core.env import env_flag, env_float, env_int
+from feide_login_core.rate_limit import RateLimit
+from feide_login_core.serving import ServerSettings, load_server_settings
+from feide_login_core.snapshot import SnapshotSettings, load_snapshot_settings
 
 
 @dataclass(frozen=True)
@@ -22,24 +30,116 @@ class Settings:
     extended_userinfo_url: str
     groupinfo_url: str
     http_timeout_s: float = 5.0
+    metadata_cache_path: str | None = None
+    metadata_cache_ttl_s: float = 3600.0
+    # Discovery/JWKS files that seed the caches at startup; the live documents then
+    # replace them every metadata_refresh_interval_s (see feide_login_core.pinned_metadata).
+    pinned_discovery_path: str | None = None
+    pinned_jwks_path: str | None = None
+    metadata_refresh_interval_s: float = 300.0
+    warmup_on_start: bool = False
+    http_pool_maxsize: int = 0
+    me_cache_ttl_s: float = 0.0
+    me_cache_max_entries: int = 10_000
+    me_cache_max_bytes: int = 32 * 1024 * 1024
+    stream_responses: bool = False
+    compression_min_bytes: int = 0
+    # Token buckets per client (azp/client_id claim) and per subject; 0 disables.
+    client_rate_limit: RateLimit = RateLimit(rate_per_s=0.0, burst=0.0)
+    subject_rate_limit: RateLimit = RateLimit(rate_per_s=0.0, burst=0.0)
+    # Concurrent upstream fetches (token exchange + Feide APIs); 0 disables.
+    max_concurrent: int = 0
+    max_queued: int = 0
+    queue_timeout_s: float = 1.0
+    # Reject reused access tokens (by jti); see feide_login_core.replay_cache.
+    replay_detection: bool = False
+    replay_max_lifetime_s: float = 8 * 3600
+    replay_tokens_per_slice: int = 100_000
+    replay_false_positive_rate: float = 1e-6
+    # Reuse token exchange results per subject token (hashed) until shortly before expiry.
+    exchange_cache: bool = False
+    # With cache.url set, exchange results and /me parts are shared by all nodes.
+    cache: CacheSettings = CacheSettings()
+    # Encrypted cache snapshot written on exit and restored on start (see feide_login_core.snapshot).
+    snapshot: SnapshotSettings = SnapshotSettings()
+    bulkheads: BulkheadSettings = BulkheadSettings()
+    server: ServerSettings = field(default_factory=lambda: ServerSettings(port=8001))
+
 
+# Fields read per request, which a settings reload can change in a running process
+# (see feide_login_core.settings_reload). The rest configure objects built at startup.
+RELOADABLE_FIELDS = frozenset(
+    {
+        "client_id",
+        "client_secret",
+        "datasource_audience",
+        "required_scope",
+        "token_exchange_audience",
+        "token_exchange_scope",
+        "extended_userinfo_url",
+        "groupinfo_url",
+        "stream_responses",
+        "compression_min_bytes",
+        "client_rate_limit",
+        "subject_rate_limit",
+    }
+)
 
-def load_settings() -> Settings:
-    issuer = getenv("FEIDE_ISSUER", "https://auth.dataporten.no")
-    client_id = getenv("DATASOURCE_CLIENT_ID", "")
-    client_secret = getenv("DATASOURCE_CLIENT_SECRET", "")
-    datasource_audience = getenv("DATASOURCE_AUDIENCE", "")
-    required_scope = getenv("DATASOURCE_REQUIRED_SCOPE", "")
-    token_exchange_audience = getenv("DATASOURCE_TOKEN_EXCHANGE_AUDIENCE", "")
-    token_exchange_scope = getenv("DATASOURCE_TOKEN_EXCHANGE_SCOPE", "")
 
-    extended_userinfo_url = getenv(
+def load_settings(*, environ: Mapping[str, str] | None = None) -> Settings:
+    env = os.environ if environ is None else environ
+    issuer = env.get("FEIDE_ISSUER", "https://auth.dataporten.no")
+    client_id = env.get("DATASOURCE_CLIENT_ID", "")
+    client_secret = env.get("DATASOURCE_CLIENT_SECRET", "")
+    datasource_audience = env.get("DATASOURCE_AUDIENCE", "")
+    required_scope = env.get("DATASOURCE_REQUIRED_SCOPE", "")
+    token_exchange_audience = env.get("DATASOURCE_TOKEN_EXCHANGE_AUDIENCE", "")
+    token_exchange_scope = env.get("DATASOURCE_TOKEN_EXCHANGE_SCOPE", "")
+
+    extended_userinfo_url = env.get(
         "FEIDE_EXTENDED_USERINFO_URL", "https://api.dataporten.no/userinfo/v1/userinfo"
     )
-    groupinfo_url = getenv(
+    groupinfo_url = env.get(
         "FEIDE_GROUPINFO_URL", "https://groups-api.dataporten.no/groups/me/groups"
     )
 
+    metadata_cache_path = env.get("OIDC_METADATA_CACHE_PATH") or None
+    metadata_cache_ttl_s = env_float("OIDC_METADATA_CACHE_TTL_S", 3600.0, environ=env)
+    pinned_discovery_path = env.get("OIDC_PINNED_DISCOVERY_PATH") or None
+    pinned_jwks_path = env.get("OIDC_PINNED_JWKS_PATH") or None
+    metadata_refresh_interval_s = env_float("OIDC_METADATA_REFRESH_INTERVAL_S", 300.0, environ=env)
+    if metadata_cache_path and (pinned_discovery_path or pinned_jwks_path):
+        raise RuntimeError(
+            "OIDC_PINNED_DISCOVERY_PATH/OIDC_PINNED_JWKS_PATH cannot be combined with "
+            "OIDC_METADATA_CACHE_PATH"
+        )
+    warmup_on_start = env_flag("OIDC_WARMUP_ON_START", environ=env)
+    http_pool_maxsize = env_int("HTTP_POOL_MAXSIZE", 0, environ=env)
+    me_cache_ttl_s = env_float("DATASOURCE_ME_CACHE_TTL_S", 0.0, environ=env)
+    me_cache_max_entries = env_int("DATASOURCE_ME_CACHE_MAX_ENTRIES", 10_000, environ=env)
+    me_cache_max_bytes = env_int("DATASOURCE_ME_CACHE_MAX_BYTES", 32 * 1024 * 1024, environ=env)
+    stream_responses = env_flag("DATASOURCE_STREAM_RESPONSES", environ=env)
+    compression_min_bytes = env_int("DATASOURCE_COMPRESSION_MIN_BYTES", 0, environ=env)
+    client_rate = env_float("DATASOURCE_CLIENT_RATE_PER_S", 0.0, environ=env)
+    client_rate_limit = RateLimit(
+        rate_per_s=client_rate, burst=env_float("DATASOURCE_CLIENT_BURST", client_rate, environ=env)
+    )
+    subject_rate = env_float("DATASOURCE_SUBJECT_RATE_PER_S", 0.0, environ=env)
+    subject_rate_limit = RateLimit(
+        rate_per_s=subject_rate,
+        burst=env_float("DATASOURCE_SUBJECT_BURST", subject_rate, environ=env),
+    )
+    max_concurrent = env_int("DATASOURCE_MAX_CONCURRENT", 0, environ=env)
+    max_queued = env_int("DATASOURCE_MAX_QUEUED", 0, environ=env)
+    queue_timeout_s = env_float("DATASOURCE_QUEUE_TIMEOUT_S", 1.0, environ=env)
+    replay_detection = env_flag("DATASOURCE_REPLAY_DETECTION", environ=env)
+    replay_max_lifetime_s = env_float("DATASOURCE_REPLAY_MAX_LIFETIME_S", 8 * 3600, environ=env)
+    replay_tokens_per_slice = env_int("DATASOURCE_REPLAY_TOKENS_PER_SLICE", 100_000, environ=env)
+    replay_false_positive_rate = env_float(
+        "DATASOURCE_REPLAY_FALSE_POSITIVE_RATE", 1e-6, environ=env
+    )
+    exchange_cache = env_flag("DATASOURCE_EXCHANGE_CACHE", environ=env)
+
     # Fail early with clear errors. These are required to run the sample.
     missing: list[str] = []
     if not client_id:
@@ -67,4 +167,30 @@ def load_settings() -> Settings:
         token_exchange_scope=token_exchange_scope,
         extended_userinfo_url=extended_userinfo_url,
         groupinfo_url=groupinfo_url,
+        metadata_cache_path=metadata_cache_path,
+        metadata_cache_ttl_s=metadata_cache_ttl_s,
+        pinned_discovery_path=pinned_discovery_path,
+        pinned_jwks_path=pinned_jwks_path,
+        metadata_refresh_interval_s=metadata_refresh_interval_s,
+        warmup_on_start=warmup_on_start,
+        http_pool_maxsize=http_pool_maxsize,
+        me_cache_ttl_s=me_cache_ttl_s,
+        me_cache_max_entries=me_cache_max_entries,
+        me_cache_max_bytes=me_cache_max_bytes,
+        stream_responses=stream_responses,
+        compression_min_bytes=compression_min_bytes,
+        client_rate_limit=client_rate_limit,
+        subject_rate_limit=subject_rate_limit,
+        max_concurrent=max_concurrent,
+        max_queued=max_queued,
+        queue_timeout_s=queue_timeout_s,
+        replay_detection=replay_detection,
+        replay_max_lifetime_s=replay_max_lifetime_s,
+        replay_tokens_per_slice=replay_tokens_per_slice,
+        replay_false_positive_rate=replay_false_positive_rate,
+        exchange_cache=exchange_cache,
+        cache=load_cache_settings(environ=env),
+        snapshot=load_snapshot_settings(environ=env),
+        bulkheads=load_bulkhead_settings(environ=env),
+        server=load_server_settings(default_port=8001, environ=env),
     )
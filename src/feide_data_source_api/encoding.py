@@ -0,0 +1,126 @@
+"""Incremental JSON serialization and response compression.
+
+Streaming keeps large /me payloads (big groupinfo arrays) from being rendered
+into one string before the first byte is sent. Compression is only applied
+above a size threshold; for streams the first chunks are buffered until the
+threshold is reached so the Content-Encoding can still be chosen up front.
+
+Brotli is optional (``pip install -e ".[compression]"``); gzip is always available.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import zlib
+from collections.abc import Iterable, Iterator
+from typing import Any, Final, Protocol, cast
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the optional extra
+    brotli = None
+
+_CHUNK_SIZE: Final[int] = 16 * 1024
+_GZIP_LEVEL: Final[int] = 6
+_BROTLI_QUALITY: Final[int] = 5
+
+
+class _Compressor(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+
+class _GzipCompressor:
+    def __init__(self) -> None:
+        # wbits=31 selects the gzip container.
+        self._obj = zlib.compressobj(_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self) -> None:
+        if brotli is None:
+            raise ValueError("Brotli support requires the 'compression' extra")
+        # The brotli bindings ship without type information.
+        self._obj: Any = cast(Any, brotli).Compressor(quality=_BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data)
+
+    def flush(self) -> bytes:
+        return self._obj.finish()
+
+
+def available_encodings() -> list[str]:
+    """Supported content codings, in order of preference."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def _compressor(encoding: str) -> _Compressor:
+    if encoding == "br":
+        return _BrotliCompressor()
+    if encoding == "gzip":
+        return _GzipCompressor()
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    compressor = _compressor(encoding)
+    return compressor.compress(body) + compressor.flush()
+
+
+def iter_json(
+    data: object, *, pretty: bool = False, chunk_size: int = _CHUNK_SIZE
+) -> Iterator[bytes]:
+    """Yield the key-sorted JSON encoding of ``data`` in chunks of ~chunk_size bytes.
+
+    The concatenated output is byte-for-byte identical to the buffered body.
+    """
+    encoder = (
+        json.JSONEncoder(sort_keys=True, indent=2)
+        if pretty
+        else json.JSONEncoder(sort_keys=True, separators=(",", ":"))
+    )
+    buffer: list[str] = []
+    buffered = 0
+    for piece in encoder.iterencode(data):
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered >= chunk_size:
+            yield "".join(buffer).encode("utf-8")
+            buffer.clear()
+            buffered = 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def peek(chunks: Iterable[bytes], min_bytes: int) -> tuple[bool, Iterator[bytes]]:
+    """Buffer chunks until ``min_bytes`` is reached or the stream ends.
+
+    Returns (reached_threshold, the full stream including the buffered head).
+    """
+    iterator = iter(chunks)
+    head: list[bytes] = []
+    size = 0
+    for chunk in iterator:
+        head.append(chunk)
+        size += len(chunk)
+        if size >= min_bytes:
+            return True, itertools.chain(head, iterator)
+    return False, iter(head)
+
+
+def compress_stream(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    compressor = _compressor(encoding)
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
@@ -0,0 +1,143 @@
+"""Indexed queries over a Feide groupinfo array.
+
+Teachers and administrators can be members of hundreds of groups. ``GroupIndex``
+is built once per groupinfo response (O(n)) and then answers filtered queries
+from posting lists: type, role and active status are dictionary lookups, and
+``id_prefix`` is a binary search over the sorted group ids, so a query costs
+O(log n + k) for k candidates instead of a scan of the whole array.
+"""
+
+from __future__ import annotations
+
+import bisect
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from typing import Final, cast
+
+DEFAULT_PAGE_SIZE: Final[int] = 100
+MAX_PAGE_SIZE: Final[int] = 1000
+
+
+@dataclass(frozen=True)
+class GroupQuery:
+    type: str | None = None
+    id_prefix: str | None = None
+    role: str | None = None
+    active: bool | None = None
+    offset: int = 0
+    limit: int = DEFAULT_PAGE_SIZE
+
+    @staticmethod
+    def from_args(args: Mapping[str, str]) -> GroupQuery:
+        """Parse query string arguments; raises ValueError on invalid values."""
+        active_raw = args.get("active")
+        active: bool | None = None
+        if active_raw is not None:
+            if active_raw.lower() not in {"true", "false"}:
+                raise ValueError("active must be 'true' or 'false'")
+            active = active_raw.lower() == "true"
+        try:
+            offset = int(args.get("offset", "0"))
+            limit = int(args.get("limit", str(DEFAULT_PAGE_SIZE)))
+        except ValueError as exc:
+            raise ValueError("offset and limit must be integers") from exc
+        if offset < 0 or not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"offset must be >= 0 and limit between 1 and {MAX_PAGE_SIZE}")
+        return GroupQuery(
+            type=args.get("type") or None,
+            id_prefix=args.get("id_prefix") or None,
+            role=args.get("role") or None,
+            active=active,
+            offset=offset,
+            limit=limit,
+        )
+
+
+@dataclass(frozen=True)
+class GroupPage:
+    total: int
+    offset: int
+    limit: int
+    groups: list[Mapping[str, object]]
+
+    def to_json(self) -> dict[str, object]:
+        return {
+            "total": self.total,
+            "offset": self.offset,
+            "limit": self.limit,
+            "groups": [dict(group) for group in self.groups],
+        }
+
+
+def _membership(group: Mapping[str, object]) -> Mapping[str, object]:
+    membership = group.get("membership")
+    if isinstance(membership, dict):
+        return cast(Mapping[str, object], membership)
+    return {}
+
+
+class GroupIndex:
+    """Posting lists over a groupinfo array. Positions preserve the upstream order."""
+
+    def __init__(self, groupinfo: Sequence[object]) -> None:
+        self._groups: list[Mapping[str, object]] = [
+            cast(Mapping[str, object], group) for group in groupinfo if isinstance(group, dict)
+        ]
+        self._by_type: dict[str, list[int]] = {}
+        self._by_role: dict[str, list[int]] = {}
+        self._by_active: dict[bool, list[int]] = {True: [], False: []}
+        ids: list[tuple[str, int]] = []
+
+        for pos, group in enumerate(self._groups):
+            group_type = group.get("type")
+            if isinstance(group_type, str):
+                self._by_type.setdefault(group_type, []).append(pos)
+            membership = _membership(group)
+            role = membership.get("basic")
+            if isinstance(role, str):
+                self._by_role.setdefault(role, []).append(pos)
+            # Groups without an explicit flag are current memberships.
+            self._by_active[membership.get("active") is not False].append(pos)
+            group_id = group.get("id")
+            if isinstance(group_id, str):
+                ids.append((group_id, pos))
+
+        ids.sort()
+        self._sorted_ids = [group_id for group_id, _ in ids]
+        self._sorted_positions = [pos for _, pos in ids]
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def query(self, query: GroupQuery) -> GroupPage:
+        candidates: list[list[int]] = []
+        if query.type is not None:
+            candidates.append(self._by_type.get(query.type, []))
+        if query.role is not None:
+            candidates.append(self._by_role.get(query.role, []))
+        if query.active is not None:
+            candidates.append(self._by_active[query.active])
+        if query.id_prefix is not None:
+            start = bisect.bisect_left(self._sorted_ids, query.id_prefix)
+            end = start
+            while end < len(self._sorted_ids) and self._sorted_ids[end].startswith(query.id_prefix):
+                end += 1
+            candidates.append(sorted(self._sorted_positions[start:end]))
+
+        if not candidates:
+            positions: Sequence[int] = range(len(self._groups))
+        else:
+            # Intersect starting from the shortest posting list.
+            candidates.sort(key=len)
+            matched = set(candidates[0])
+            for other in candidates[1:]:
+                matched.intersection_update(other)
+            positions = sorted(matched)
+
+        page = positions[query.offset : query.offset + query.limit]
+        return GroupPage(
+            total=len(positions),
+            offset=query.offset,
+            limit=query.limit,
+            groups=[self._groups[pos] for pos in page],
+        )
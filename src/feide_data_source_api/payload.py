@@ -0,0 +1,94 @@
+"""/me payload assembly: field selection, serialization and content hashing."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from typing import Any, Final, cast
+
+from feide_data_source_api.encoding import compress
+from feide_data_source_api.groups import GroupIndex
+
+# Response fields in canonical order. Only the upstream fields require token exchange.
+ME_FIELDS: Final[tuple[str, ...]] = ("subject", "extended_userinfo", "groupinfo")
+UPSTREAM_FIELDS: Final[frozenset[str]] = frozenset({"extended_userinfo", "groupinfo"})
+
+
+def dumps(data: Any, *, pretty: bool) -> str:
+    if pretty:
+        return json.dumps(data, indent=2, sort_keys=True)
+    return json.dumps(data, sort_keys=True, separators=(",", ":"))
+
+
+def parse_fields(raw: str | None) -> tuple[str, ...]:
+    """Parse a ``fields=a,b`` query value into canonical order (all fields if absent)."""
+    if raw is None:
+        return ME_FIELDS
+    requested = {item.strip() for item in raw.split(",") if item.strip()}
+    unknown = requested - set(ME_FIELDS)
+    if unknown or not requested:
+        allowed = ", ".join(ME_FIELDS)
+        raise ValueError(f"Invalid fields parameter; choose from: {allowed}")
+    return tuple(name for name in ME_FIELDS if name in requested)
+
+
+@dataclass(frozen=True)
+class JsonDocument:
+    """A payload with its compact serialization and content hash, computed once."""
+
+    payload: Mapping[str, object]
+    body: bytes
+    etag: str
+    # Compressed bodies per content coding, so cached documents are compressed only once.
+    _encoded: dict[str, bytes] = field(default_factory=dict, compare=False)
+
+    @staticmethod
+    def build(payload: Mapping[str, object]) -> JsonDocument:
+        body = dumps(payload, pretty=False).encode("utf-8")
+        return JsonDocument(payload=payload, body=body, etag=hashlib.sha256(body).hexdigest())
+
+    def encoded(self, encoding: str) -> bytes:
+        body = self._encoded.get(encoding)
+        if body is None:
+            body = compress(self.body, encoding)
+            self._encoded[encoding] = body
+        return body
+
+
+@dataclass(frozen=True)
+class MeEntry:
+    """The /me parts fetched so far for one (sub, scope set), plus rendered documents."""
+
+    parts: Mapping[str, object]
+    created_at: float = field(default_factory=time.monotonic)
+    # Memo of serialized documents per field selection. Racing writers store equal values.
+    _documents: dict[tuple[str, ...], JsonDocument] = field(default_factory=dict, compare=False)
+    _group_index: list[GroupIndex] = field(default_factory=list, compare=False)
+
+    def missing(self, fields: tuple[str, ...]) -> frozenset[str]:
+        return frozenset(fields) & UPSTREAM_FIELDS - self.parts.keys()
+
+    def merged(self, fetched: Mapping[str, object]) -> MeEntry:
+        # Keep the original creation time so merged-in parts never extend older parts' life.
+        return MeEntry(parts={**self.parts, **fetched}, created_at=self.created_at)
+
+    def document(self, fields: tuple[str, ...]) -> JsonDocument:
+        doc = self._documents.get(fields)
+        if doc is None:
+            doc = JsonDocument.build({name: self.parts[name] for name in fields})
+            self._documents[fields] = doc
+        return doc
+
+    def group_index(self) -> GroupIndex:
+        """Index over ``groupinfo``, built on first use and reused while the entry lives."""
+        if not self._group_index:
+            groupinfo = self.parts.get("groupinfo")
+            groups = cast(list[object], groupinfo) if isinstance(groupinfo, list) else []
+            self._group_index.append(GroupIndex(groups))
+        return self._group_index[0]
+
+    def size(self) -> int:
+        return len(dumps(dict(self.parts), pretty=False))
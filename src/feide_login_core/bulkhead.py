@@ -0,0 +1,179 @@
+"""Per-upstream bulkheads with adaptive (AIMD) concurrency limits.
+
+Each upstream (token endpoint, userinfo, groupinfo, ...) gets its own bounded slot
+pool, so one slow dependency can only tie up its own share of request threads.
+With a latency target set, the limit grows by one after a full window of fast
+calls and is halved when a call is slow or fails, at most once per window of
+calls started after the previous decrease.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections.abc import Callable, Generator, Mapping
+from contextlib import AbstractContextManager, contextmanager
+from dataclasses import dataclass
+
+from feide_login_core.concurrency import ConcurrencyLimiter, ConcurrencyLimitExceeded
+from feide_login_core.env import env_float, env_int
+
+_EWMA_WEIGHT = 0.2
+
+
+class BulkheadRejected(ConcurrencyLimitExceeded):
+    pass
+
+
+@dataclass(frozen=True)
+class BulkheadSettings:
+    max_concurrent: int = 0
+    min_concurrent: int = 1
+    max_queued: int = 0
+    queue_timeout_s: float = 1.0
+    # Calls slower than this shrink the limit; 0 keeps the limit fixed at max_concurrent.
+    latency_target_s: float = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrent > 0
+
+
+def load_bulkhead_settings(*, environ: Mapping[str, str] | None = None) -> BulkheadSettings:
+    env = os.environ if environ is None else environ
+    max_concurrent = env_int("BULKHEAD_MAX_CONCURRENT", 0, environ=env)
+    return BulkheadSettings(
+        max_concurrent=max_concurrent,
+        min_concurrent=env_int("BULKHEAD_MIN_CONCURRENT", 1, environ=env),
+        max_queued=env_int("BULKHEAD_MAX_QUEUED", max_concurrent, environ=env),
+        queue_timeout_s=env_float("BULKHEAD_QUEUE_TIMEOUT_S", 1.0, environ=env),
+        latency_target_s=env_float("BULKHEAD_LATENCY_TARGET_S", 0.0, environ=env),
+    )
+
+
+@dataclass(frozen=True)
+class BulkheadStats:
+    limit: int
+    active: int
+    queued: int
+    admitted: int
+    rejected: int
+    completed: int
+    failures: int
+    slow: int
+    latency_ewma_s: float | None
+
+
+class Bulkhead:
+    def __init__(
+        self,
+        name: str,
+        settings: BulkheadSettings,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.settings = settings
+        self._clock = clock
+        self._limiter = ConcurrencyLimiter(
+            settings.max_concurrent,
+            max_queue=settings.max_queued,
+            queue_timeout_s=settings.queue_timeout_s,
+        )
+        self._lock = threading.Lock()
+        self._window_successes = 0
+        self._decreased_at = float("-inf")
+        self._completed = 0
+        self._failures = 0
+        self._slow = 0
+        self._latency_ewma_s: float | None = None
+
+    @contextmanager
+    def call(self) -> Generator[None]:
+        """Hold a slot for one upstream call; raises BulkheadRejected when none is free."""
+        if not self._limiter.try_acquire():
+            raise BulkheadRejected(
+                f"Upstream {self.name!r} is saturated",
+                retry_after_s=max(1.0, self.settings.queue_timeout_s),
+            )
+        started_at = self._clock()
+        try:
+            yield
+        except Exception:
+            self._record(started_at, failed=True)
+            raise
+        else:
+            self._record(started_at, failed=False)
+        finally:
+            self._limiter.release()
+
+    def _record(self, started_at: float, *, failed: bool) -> None:
+        latency_s = self._clock() - started_at
+        target_s = self.settings.latency_target_s
+        slow = target_s > 0 and latency_s > target_s
+        with self._lock:
+            self._completed += 1
+            self._failures += int(failed)
+            self._slow += int(slow)
+            self._latency_ewma_s = (
+                latency_s
+                if self._latency_ewma_s is None
+                else (1 - _EWMA_WEIGHT) * self._latency_ewma_s + _EWMA_WEIGHT * latency_s
+            )
+            if target_s <= 0:
+                return
+            limit = self._limiter.limit
+            if failed or slow:
+                # Only calls started after the last decrease may shrink the limit again.
+                if started_at > self._decreased_at:
+                    self._limiter.set_limit(max(self.settings.min_concurrent, limit // 2))
+                    self._decreased_at = self._clock()
+                    self._window_successes = 0
+                return
+            self._window_successes += 1
+            if self._window_successes >= limit and limit < self.settings.max_concurrent:
+                self._limiter.set_limit(limit + 1)
+                self._window_successes = 0
+
+    def stats(self) -> BulkheadStats:
+        limiter = self._limiter.stats()
+        with self._lock:
+            return BulkheadStats(
+                limit=limiter.limit,
+                active=limiter.active,
+                queued=limiter.queued,
+                admitted=limiter.admitted,
+                rejected=limiter.rejected,
+                completed=self._completed,
+                failures=self._failures,
+                slow=self._slow,
+                latency_ewma_s=(
+                    round(self._latency_ewma_s, 6) if self._latency_ewma_s is not None else None
+                ),
+            )
+
+
+class Bulkheads:
+    """One bulkhead per upstream name, created on first use with shared settings."""
+
+    def __init__(self, settings: BulkheadSettings) -> None:
+        self.settings = settings
+        self._lock = threading.Lock()
+        self._bulkheads: dict[str, Bulkhead] = {}
+
+    def get(self, name: str) -> Bulkhead:
+        with self._lock:
+            bulkhead = self._bulkheads.get(name)
+            if bulkhead is None:
+                bulkhead = Bulkhead(name, self.settings)
+                self._bulkheads[name] = bulkhead
+            return bulkhead
+
+    def call(self, name: str) -> AbstractContextManager[None]:
+        return self.get(name).call()
+
+    def stats(self) -> dict[str, BulkheadStats]:
+        with self._lock:
+            bulkheads = dict(self._bulkheads)
+        return {name: bulkhead.stats() for name, bulkhead in sorted(bulkheads.items())}
@@ -0,0 +1,336 @@
+"""Cache backends that can be shared between processes.
+
+``InProcessCacheBackend`` keeps values in this process. ``RedisCacheBackend`` talks the
+Redis protocol (RESP) to any compatible server, so every node behind a load balancer
+sees the same entries; ``NearCache`` puts a short-lived local copy in front of it.
+
+``SharedCache`` is what applications use: JSON values under ``<namespace>:<sha256>``
+keys, so raw tokens never reach the backend and several apps can share one server.
+A failing backend is treated as a miss (and counted) rather than failing requests.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import queue
+import socket
+import threading
+from collections.abc import Iterable, Mapping, Sequence
+from dataclasses import dataclass
+from typing import BinaryIO, Protocol, cast
+from urllib.parse import unquote, urlsplit
+
+from feide_login_core.env import env_float, env_int
+from feide_login_core.ttl_cache import TTLCache
+
+
+class CacheBackendError(Exception):
+    pass
+
+
+class CacheBackend(Protocol):
+    def get_many(self, keys: Sequence[str]) -> list[bytes | None]:
+        """Values for ``keys`` in order, None for missing or expired entries."""
+        ...
+
+    def set_many(self, items: Sequence[tuple[str, bytes]], *, ttl_s: float) -> None: ...
+
+    def delete(self, key: str) -> None: ...
+
+
+class InProcessCacheBackend:
+    def __init__(self, *, max_entries: int = 10_000, max_bytes: int | None = None) -> None:
+        self._cache: TTLCache[bytes] = TTLCache(max_entries=max_entries, max_size=max_bytes)
+
+    def get_many(self, keys: Sequence[str]) -> list[bytes | None]:
+        return [self._cache.get(key) for key in keys]
+
+    def set_many(self, items: Sequence[tuple[str, bytes]], *, ttl_s: float) -> None:
+        for key, value in items:
+            _ = self._cache.set(key, value, ttl_s=ttl_s, size=len(value))
+
+    def delete(self, key: str) -> None:
+        _ = self._cache.pop(key)
+
+    def entries(self) -> list[tuple[str, bytes, float]]:
+        return self._cache.entries()
+
+    def restore(self, entries: Iterable[tuple[str, bytes, float]]) -> None:
+        for key, value, ttl_s in entries:
+            _ = self._cache.set(key, value, ttl_s=ttl_s, size=len(value))
+
+
+def _encode_command(args: Sequence[str | bytes]) -> bytes:
+    out = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        data = arg.encode("utf-8") if isinstance(arg, str) else arg
+        out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(out)
+
+
+def _read_reply(reader: BinaryIO) -> object:
+    line = reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise CacheBackendError("Connection closed by cache server")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest.decode("utf-8")
+    if kind == b"-":
+        return CacheBackendError(rest.decode("utf-8", "replace"))
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        length = int(rest)
+        if length < 0:
+            return None
+        data = reader.read(length + 2)
+        if len(data) != length + 2:
+            raise CacheBackendError("Connection closed by cache server")
+        return data[:-2]
+    if kind == b"*":
+        count = int(rest)
+        return None if count < 0 else [_read_reply(reader) for _ in range(count)]
+    raise CacheBackendError(f"Unexpected reply from cache server: {line!r}")
+
+
+class _Connection:
+    def __init__(self, host: str, port: int, timeout_s: float) -> None:
+        self._sock = socket.create_connection((host, port), timeout=timeout_s)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._sock.makefile("rb")
+
+    def pipeline(self, commands: Sequence[Sequence[str | bytes]]) -> list[object]:
+        """Send all commands in one write, then read one reply per command."""
+        self._sock.sendall(b"".join(_encode_command(command) for command in commands))
+        return [_read_reply(self._reader) for _ in commands]
+
+    def close(self) -> None:
+        self._reader.close()
+        self._sock.close()
+
+
+class RedisCacheBackend:
+    """Minimal RESP client: ``redis://[:password@]host[:port][/db]``, pooled connections.
+
+    Only the commands the cache needs are implemented (MGET, SET PX, DEL), so any
+    Redis-compatible server works and no client library is required.
+    """
+
+    def __init__(self, url: str, *, timeout_s: float = 0.5, pool_size: int = 8) -> None:
+        parts = urlsplit(url)
+        if parts.scheme != "redis" or not parts.hostname:
+            raise ValueError("Cache URL must look like redis://host:port/db")
+        self.host = parts.hostname
+        self.port = parts.port or 6379
+        self._password = unquote(parts.password) if parts.password else None
+        self._db = int(parts.path.lstrip("/") or 0)
+        self.timeout_s = timeout_s
+        self._idle: queue.LifoQueue[_Connection] = queue.LifoQueue(maxsize=pool_size)
+
+    def _connect(self) -> _Connection:
+        conn = _Connection(self.host, self.port, self.timeout_s)
+        setup: list[list[str]] = []
+        if self._password is not None:
+            setup.append(["AUTH", self._password])
+        if self._db:
+            setup.append(["SELECT", str(self._db)])
+        if setup:
+            for reply in conn.pipeline(setup):
+                if isinstance(reply, CacheBackendError):
+                    conn.close()
+                    raise reply
+        return conn
+
+    def execute(self, commands: Sequence[Sequence[str | bytes]]) -> list[object]:
+        """Run ``commands`` as one pipeline on a pooled connection."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+        try:
+            if conn is None:
+                conn = self._connect()
+            replies = conn.pipeline(commands)
+        except (OSError, ValueError) as exc:
+            # A broken or timed-out connection may hold half a reply; never reuse it.
+            if conn is not None:
+                conn.close()
+            raise CacheBackendError(f"Cache server error: {exc}") from exc
+        except CacheBackendError:
+            if conn is not None:
+                conn.close()
+            raise
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+        for reply in replies:
+            if isinstance(reply, CacheBackendError):
+                raise reply
+        return replies
+
+    def get_many(self, keys: Sequence[str]) -> list[bytes | None]:
+        if not keys:
+            return []
+        (values,) = self.execute([["MGET", *keys]])
+        if not isinstance(values, list):
+            raise CacheBackendError("Unexpected MGET reply")
+        return [value if isinstance(value, bytes) else None for value in cast(list[object], values)]
+
+    def set_many(self, items: Sequence[tuple[str, bytes]], *, ttl_s: float) -> None:
+        ttl_ms = int(ttl_s * 1000)
+        if not items or ttl_ms <= 0:
+            return
+        _ = self.execute([["SET", key, value, "PX", str(ttl_ms)] for key, value in items])
+
+    def delete(self, key: str) -> None:
+        _ = self.execute([["DEL", key]])
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class NearCache:
+    """Local copies of a remote backend's entries, kept for at most ``ttl_s``.
+
+    Reads served locally can be up to ``ttl_s`` stale (a delete on another node is
+    not seen until then), so keep it short.
+    """
+
+    def __init__(self, backend: CacheBackend, *, ttl_s: float, max_entries: int = 10_000) -> None:
+        self.backend = backend
+        self.ttl_s = ttl_s
+        self._local: TTLCache[bytes] = TTLCache(max_entries=max_entries)
+
+    def get_many(self, keys: Sequence[str]) -> list[bytes | None]:
+        values = [self._local.get(key) for key in keys]
+        missing = [index for index, value in enumerate(values) if value is None]
+        if missing:
+            fetched = self.backend.get_many([keys[index] for index in missing])
+            for index, value in zip(missing, fetched, strict=True):
+                values[index] = value
+                if value is not None:
+                    _ = self._local.set(keys[index], value, ttl_s=self.ttl_s, size=len(value))
+        return values
+
+    def set_many(self, items: Sequence[tuple[str, bytes]], *, ttl_s: float) -> None:
+        self.backend.set_many(items, ttl_s=ttl_s)
+        for key, value in items:
+            _ = self._local.set(key, value, ttl_s=min(ttl_s, self.ttl_s), size=len(value))
+
+    def delete(self, key: str) -> None:
+        _ = self._local.pop(key)
+        self.backend.delete(key)
+
+
+@dataclass(frozen=True)
+class SharedCacheStats:
+    hits: int
+    misses: int
+    errors: int
+
+
+class SharedCache:
+    """JSON values in a backend under hashed, namespaced keys."""
+
+    def __init__(self, backend: CacheBackend, *, namespace: str) -> None:
+        self.backend = backend
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._errors = 0
+
+    def key(self, kind: str, *parts: str) -> str:
+        """``<namespace>:<kind>:<sha256 of parts>``; parts may contain tokens."""
+        digest = hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+        return f"{self.namespace}:{kind}:{digest}"
+
+    def get_many(self, keys: Sequence[str]) -> list[object | None]:
+        try:
+            raw = self.backend.get_many(keys)
+        except CacheBackendError:
+            self._count(errors=1, misses=len(keys))
+            return [None] * len(keys)
+        values: list[object | None] = []
+        for item in raw:
+            try:
+                values.append(json.loads(item) if item is not None else None)
+            except ValueError:
+                values.append(None)
+        found = sum(value is not None for value in values)
+        self._count(hits=found, misses=len(values) - found)
+        return values
+
+    def get(self, key: str) -> object | None:
+        return self.get_many([key])[0]
+
+    def set(self, key: str, value: object, *, ttl_s: float) -> None:
+        if ttl_s <= 0:
+            return
+        data = json.dumps(value, separators=(",", ":")).encode("utf-8")
+        try:
+            self.backend.set_many([(key, data)], ttl_s=ttl_s)
+        except CacheBackendError:
+            self._count(errors=1)
+
+    def delete(self, key: str) -> None:
+        try:
+            self.backend.delete(key)
+        except CacheBackendError:
+            self._count(errors=1)
+
+    def stats(self) -> SharedCacheStats:
+        with self._lock:
+            return SharedCacheStats(hits=self._hits, misses=self._misses, errors=self._errors)
+
+    def _count(self, *, hits: int = 0, misses: int = 0, errors: int = 0) -> None:
+        with self._lock:
+            self._hits += hits
+            self._misses += misses
+            self._errors += errors
+
+
+@dataclass(frozen=True)
+class CacheSettings:
+    # redis://host:port/db for a shared cache; None keeps entries in this process.
+    url: str | None = None
+    namespace: str = "feide-oidc"
+    timeout_s: float = 0.5
+    pool_size: int = 8
+    # Local copies of shared entries; 0 always asks the shared server.
+    near_cache_ttl_s: float = 0.0
+    max_local_entries: int = 10_000
+
+
+def load_cache_settings(*, environ: Mapping[str, str] | None = None) -> CacheSettings:
+    env = os.environ if environ is None else environ
+    return CacheSettings(
+        url=env.get("CACHE_URL") or None,
+        namespace=env.get("CACHE_NAMESPACE", "feide-oidc"),
+        timeout_s=env_float("CACHE_TIMEOUT_S", 0.5, environ=env),
+        pool_size=env_int("CACHE_POOL_SIZE", 8, environ=env),
+        near_cache_ttl_s=env_float("CACHE_NEAR_TTL_S", 0.0, environ=env),
+        max_local_entries=env_int("CACHE_MAX_LOCAL_ENTRIES", 10_000, environ=env),
+    )
+
+
+def create_shared_cache(settings: CacheSettings) -> SharedCache:
+    backend: CacheBackend
+    if settings.url is None:
+        backend = InProcessCacheBackend(max_entries=settings.max_local_entries)
+    else:
+        backend = RedisCacheBackend(
+            settings.url, timeout_s=settings.timeout_s, pool_size=settings.pool_size
+        )
+        if settings.near_cache_ttl_s > 0:
+            backend = NearCache(
+                backend, ttl_s=settings.near_cache_ttl_s, max_entries=settings.max_local_entries
+            )
+    return SharedCache(backend, namespace=settings.namespace)
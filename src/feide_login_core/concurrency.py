@@ -0,0 +1,107 @@
+"""Concurrency limiting with a bounded wait queue.
+
+Requests beyond the limit wait up to ``queue_timeout_s`` for a slot; when the queue
+itself is full, or the wait times out, the caller is rejected immediately instead of
+tying up another thread behind a slow upstream.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Generator
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+
+class ConcurrencyLimitExceeded(Exception):
+    """No slot became available (queue full or wait timed out)."""
+
+    def __init__(self, message: str, *, retry_after_s: float) -> None:
+        super().__init__(message)
+        self.retry_after_s = retry_after_s
+
+
+@dataclass(frozen=True)
+class LimiterStats:
+    limit: int
+    active: int
+    queued: int
+    admitted: int
+    rejected: int
+
+
+class ConcurrencyLimiter:
+    def __init__(self, limit: int, *, max_queue: int = 0, queue_timeout_s: float = 0.0) -> None:
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        self._limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self._cond = threading.Condition()
+        self._active = 0
+        self._queued = 0
+        self._admitted = 0
+        self._rejected = 0
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    def set_limit(self, limit: int) -> None:
+        """Change the limit. In-flight calls above a lowered limit finish normally."""
+        with self._cond:
+            self._limit = max(1, limit)
+            self._cond.notify_all()
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self._active < self._limit:
+                self._active += 1
+                self._admitted += 1
+                return True
+            if self._queued >= self.max_queue or self.queue_timeout_s <= 0:
+                self._rejected += 1
+                return False
+
+            self._queued += 1
+            deadline = time.monotonic() + self.queue_timeout_s
+            try:
+                while self._active >= self._limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._rejected += 1
+                        return False
+                    _ = self._cond.wait(remaining)
+            finally:
+                self._queued -= 1
+            self._active += 1
+            self._admitted += 1
+            return True
+
+    def release(self) -> None:
+        with self._cond:
+            self._active -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self) -> Generator[None]:
+        """Hold a slot for the duration of the block; raises ConcurrencyLimitExceeded."""
+        if not self.try_acquire():
+            raise ConcurrencyLimitExceeded(
+                "Too many concurrent requests", retry_after_s=max(1.0, self.queue_timeout_s)
+            )
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> LimiterStats:
+        with self._cond:
+            return LimiterStats(
+                limit=self._limit,
+                active=self._active,
+                queued=self._queued,
+                admitted=self._admitted,
+                rejected=self._rejected,
+            )
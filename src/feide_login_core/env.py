@@ -0,0 +1,39 @@
+"""Typed helpers for reading optional settings from environment variables.
+
+Each helper reads ``os.environ`` unless given another ``environ`` mapping, so settings
+can also be loaded from a file without touching the process environment.
+"""
+
+from __future__ import annotations
+
+import os
+from collections.abc import Mapping
+
+_TRUE_VALUES = frozenset({"1", "true", "yes", "on"})
+
+
+def env_flag(name: str, default: bool = False, *, environ: Mapping[str, str] | None = None) -> bool:
+    value = (os.environ if environ is None else environ).get(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in _TRUE_VALUES
+
+
+def env_int(name: str, default: int, *, environ: Mapping[str, str] | None = None) -> int:
+    value = (os.environ if environ is None else environ).get(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return int(value)
+    except ValueError as exc:
+        raise RuntimeError(f"Invalid integer for {name}: {value!r}") from exc
+
+
+def env_float(name: str, default: float, *, environ: Mapping[str, str] | None = None) -> float:
+    value = (os.environ if environ is None else environ).get(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return float(value)
+    except ValueError as exc:
+        raise RuntimeError(f"Invalid number for {name}: {value!r}") from exc
@@ -0,0 +1,18 @@
+"""Pooled HTTP sessions for upstream calls."""
+
+from __future__ import annotations
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def create_http_session(*, pool_maxsize: int) -> requests.Session:
+    """Return a session that keeps up to ``pool_maxsize`` connections alive per host.
+
+    Size the pool to the number of request threads that may call the same host at once.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
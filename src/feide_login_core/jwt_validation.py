@@ -6,13 +6,17 @@ and must not be decoded as JWTs.
 
 from __future__ import annotations
 
+import json
+import threading
 from collections.abc import Mapping
 from dataclasses import dataclass
-from typing import cast
+from typing import Final, cast
 
-from jose import jwt
+from jose import jwk, jwt
+from jose.backends.base import Key
 
 from feide_login_core.json_utils import require_json_object
+from feide_login_core.replay_cache import ReplayCache
 
 
 class IDTokenValidationError(RuntimeError):
@@ -37,6 +41,53 @@ class IDTokenClaims:
         return str(val) if val is not None else None
 
 
+# Constructed key objects, keyed by (alg, canonical JWK). Parsing RSA keys is the expensive
+# part of validation, and a JWKS only holds a handful of keys, so a small cache suffices.
+_KEY_CACHE_MAX: Final[int] = 64
+_key_cache: dict[tuple[str, str], Key] = {}
+_key_cache_lock = threading.Lock()
+_DEFAULT_ALG_BY_KTY: Final[Mapping[str, str]] = {"RSA": "RS256", "EC": "ES256", "oct": "HS256"}
+
+
+def _construct_key(jwk_dict: Mapping[str, object], alg: str) -> Key:
+    cache_key = (alg, json.dumps(jwk_dict, sort_keys=True))
+    key = _key_cache.get(cache_key)
+    if key is not None:
+        return key
+    key = jwk.construct(dict(jwk_dict), alg)
+    with _key_cache_lock:
+        if len(_key_cache) >= _KEY_CACHE_MAX:
+            _key_cache.clear()
+        _key_cache[cache_key] = key
+    return key
+
+
+def preload_jwks_keys(jwks: Mapping[str, object]) -> int:
+    """Construct key objects for every usable JWK up front; returns how many were loaded.
+
+    Keys are prepared for their declared ``alg`` (or the usual one for their ``kty``).
+    Keys that cannot be constructed are skipped; validation reports them if used.
+    """
+    keys = jwks.get("keys")
+    if not isinstance(keys, list):
+        raise IDTokenValidationError("JWKS 'keys' is not a list")
+
+    loaded = 0
+    for key in cast(list[object], keys):
+        if not isinstance(key, dict):
+            continue
+        key_dict = cast(Mapping[str, object], key)
+        alg = key_dict.get("alg")
+        if not isinstance(alg, str):
+            alg = _DEFAULT_ALG_BY_KTY.get(str(key_dict.get("kty")), "RS256")
+        try:
+            _ = _construct_key(key_dict, alg)
+        except Exception:
+            continue
+        loaded += 1
+    return loaded
+
+
 def _select_jwk(jwks: Mapping[str, object], kid: str) -> Mapping[str, object]:
     keys = jwks.get("keys")
     if not isinstance(keys, list):
@@ -77,13 +128,19 @@ def validate_id_token(
     if not isinstance(kid_val, str) or not kid_val:
         raise IDTokenValidationError("ID token missing 'kid' header")
 
-    jwk = _select_jwk(jwks, kid_val)
+    alg = str(header_obj.get("alg", "RS256"))
+    try:
+        key = _construct_key(_select_jwk(jwks, kid_val), alg)
+    except IDTokenValidationError:
+        raise
+    except Exception as exc:
+        raise IDTokenValidationError("Unusable JWK for ID token") from exc
 
     try:
         claims = jwt.decode(
             id_token,
-            jwk,
-            algorithms=[str(header_obj.get("alg", "RS256"))],
+            key,
+            algorithms=[alg],
             issuer=issuer,
             audience=audience,
             options={
@@ -109,8 +166,12 @@ def validate_access_token(
     jwks: Mapping[str, object],
     issuer: str,
     audience: str,
+    replay_cache: ReplayCache | None = None,
 ) -> Mapping[str, object]:
-    """Validate and decode a JWT access token."""
+    """Validate and decode a JWT access token.
+
+    With ``replay_cache`` set, each ``jti`` is accepted only once (until it expires).
+    """
     try:
         header = jwt.get_unverified_header(token)
     except Exception as exc:
@@ -121,13 +182,19 @@ def validate_access_token(
     if not isinstance(kid_val, str) or not kid_val:
         raise AccessTokenValidationError("Access token missing 'kid' header")
 
-    jwk = _select_jwk(jwks, kid_val)
+    alg = str(header_obj.get("alg", "RS256"))
+    try:
+        key = _construct_key(_select_jwk(jwks, kid_val), alg)
+    except IDTokenValidationError as exc:
+        raise AccessTokenValidationError(str(exc)) from exc
+    except Exception as exc:
+        raise AccessTokenValidationError("Unusable JWK for access token") from exc
 
     try:
         claims = jwt.decode(
             token,
-            jwk,
-            algorithms=[str(header_obj.get("alg", "RS256"))],
+            key,
+            algorithms=[alg],
             issuer=issuer,
             audience=audience,
             options={
@@ -137,6 +204,32 @@ def validate_access_token(
     except Exception as exc:
         raise AccessTokenValidationError("Access token validation failed") from exc
 
-    return require_json_object(
+    claims_obj = require_json_object(
         cast(object, claims), error="Access token claims are not a JSON object"
     )
+    if replay_cache is not None:
+        check_replay(claims_obj, replay_cache)
+    return claims_obj
+
+
+def check_replay(
+    claims: Mapping[str, object], replay_cache: ReplayCache, *, record: bool = True
+) -> None:
+    """Reject validated ``claims`` whose ``jti`` was used before.
+
+    With ``record=False`` the token is only checked, so a request that is refused
+    later (rate limited, overloaded, upstream failure) does not use it up.
+    """
+    jti = claims.get("jti")
+    exp = claims.get("exp")
+    if not isinstance(jti, str) or not jti or not isinstance(exp, int | float):
+        raise AccessTokenValidationError("Access token needs 'jti' and 'exp' for replay detection")
+    try:
+        if record:
+            fresh = replay_cache.check_and_add(jti, float(exp))
+        else:
+            fresh = not replay_cache.seen(jti, float(exp))
+    except ValueError as exc:
+        raise AccessTokenValidationError(str(exc)) from exc
+    if not fresh:
+        raise AccessTokenValidationError("Access token replay detected")
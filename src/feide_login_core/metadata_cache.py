@@ -0,0 +1,213 @@
+"""Shared on-disk cache for OIDC discovery and JWKS documents.
+
+Multi-worker WSGI servers run one ``OIDCClient`` per process. Without a shared
+cache every worker fetches discovery and JWKS on its own, both at start and
+after the cached documents expire. This cache lets the workers share a single
+file instead:
+
+- Writers serialize to a temp file in the same directory and ``os.replace`` it
+  into place, so readers never observe a partially written file.
+- Readers memory-map the file and look at a fixed-size header first. The body is
+  only parsed when the header's version stamp changed since the last read.
+- Refreshes are guarded by an advisory ``flock`` on a sidecar lock file. The
+  worker that gets the lock fetches upstream; the others either keep serving the
+  stale entry or wait for the elected worker and then read its result.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections.abc import Callable, Generator, Mapping
+from contextlib import contextmanager, suppress
+from dataclasses import dataclass
+from typing import Final, cast
+
+from feide_login_core.json_utils import require_json_object
+
+_MAGIC: Final[bytes] = b"FEIDEMC1"
+# magic, version stamp, written-at (unix time)
+_HEADER: Final[struct.Struct] = struct.Struct("<8sQd")
+_LOCK_POLL_S: Final[float] = 0.05
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    fetched_at: float
+    value: Mapping[str, object]
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    version: int
+    written_at: float
+    entries: Mapping[str, CacheEntry]
+
+
+_EMPTY: Final[_Snapshot] = _Snapshot(version=0, written_at=0.0, entries={})
+
+
+class SharedMetadataCache:
+    """File-backed metadata cache shared by all worker processes on a host."""
+
+    def __init__(self, path: str, *, ttl_s: float = 3600.0, lock_timeout_s: float = 10.0) -> None:
+        self.path = path
+        self.ttl_s = ttl_s
+        self.lock_timeout_s = lock_timeout_s
+        self._lock_path = f"{path}.lock"
+        self._mutex = threading.Lock()
+        self._stat_key: tuple[int, int, int] | None = None
+        self._snapshot = _EMPTY
+
+    @property
+    def version(self) -> int:
+        """Version stamp of the file as last read by this process."""
+        return self._read().version
+
+    def entry(self, key: str) -> CacheEntry | None:
+        return self._read().entries.get(key)
+
+    def get_or_fetch(
+        self, key: str, fetch: Callable[[], Mapping[str, object]]
+    ) -> Mapping[str, object]:
+        """Return the cached document for ``key``, refreshing it if it is stale.
+
+        At most one process per host calls ``fetch`` for a given expiry. If that call
+        fails, the stale copy is returned like in the other workers; the error is only
+        raised when nothing is cached.
+        """
+        entry = self.entry(key)
+        if entry is not None and self._is_fresh(entry):
+            return entry.value
+
+        with self._refresh_lock(blocking=entry is None) as elected:
+            if not elected:
+                if entry is not None:
+                    # Another worker is refreshing; keep serving the stale copy meanwhile.
+                    return entry.value
+                # Lock wait timed out without any cached copy. Fetch, but leave the file alone.
+                return fetch()
+
+            # The previous holder of the lock may already have refreshed the entry.
+            entry = self.entry(key)
+            if entry is not None and self._is_fresh(entry):
+                return entry.value
+
+            try:
+                value = fetch()
+            except Exception:
+                if entry is None:
+                    raise
+                return entry.value
+            self._write(key, CacheEntry(fetched_at=time.time(), value=value))
+            return value
+
+    def _is_fresh(self, entry: CacheEntry) -> bool:
+        return time.time() - entry.fetched_at < self.ttl_s
+
+    def _read(self) -> _Snapshot:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return _EMPTY
+
+        stat_key = (st.st_ino, st.st_size, st.st_mtime_ns)
+        with self._mutex:
+            if stat_key == self._stat_key:
+                return self._snapshot
+
+            snapshot = self._load(self._snapshot)
+            self._stat_key = stat_key
+            self._snapshot = snapshot
+            return snapshot
+
+    def _load(self, current: _Snapshot) -> _Snapshot:
+        try:
+            with (
+                open(self.path, "rb") as fh,
+                mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm,
+            ):
+                if len(mm) < _HEADER.size:
+                    return _EMPTY
+                magic, version, written_at = cast(
+                    tuple[bytes, int, float], _HEADER.unpack_from(mm, 0)
+                )
+                if magic != _MAGIC:
+                    return _EMPTY
+                if version == current.version:
+                    # Same stamp (e.g. touched by a tool); no need to parse the body again.
+                    return current
+                body = require_json_object(
+                    cast(object, json.loads(mm[_HEADER.size :])),
+                    error="Metadata cache body is not a JSON object",
+                )
+        except (FileNotFoundError, ValueError):
+            # Missing or corrupt files are treated as empty; the next refresh rewrites them.
+            return _EMPTY
+
+        entries: dict[str, CacheEntry] = {}
+        for key, raw in body.items():
+            if not isinstance(raw, dict):
+                continue
+            raw_entry = cast(Mapping[str, object], raw)
+            fetched_at = raw_entry.get("fetched_at")
+            value = raw_entry.get("value")
+            if isinstance(fetched_at, (int, float)) and isinstance(value, dict):
+                entries[key] = CacheEntry(
+                    fetched_at=float(fetched_at), value=cast(Mapping[str, object], value)
+                )
+        return _Snapshot(version=version, written_at=written_at, entries=entries)
+
+    def _write(self, key: str, entry: CacheEntry) -> None:
+        # Only called while holding the refresh lock, so read-modify-write is safe.
+        current = self._read()
+        entries = {**current.entries, key: entry}
+        body = json.dumps(
+            {
+                name: {"fetched_at": item.fetched_at, "value": dict(item.value)}
+                for name, item in entries.items()
+            },
+            separators=(",", ":"),
+        ).encode("utf-8")
+        header = _HEADER.pack(_MAGIC, current.version + 1, time.time())
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".metadata-", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                _ = fh.write(header)
+                _ = fh.write(body)
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            with suppress(FileNotFoundError):
+                os.unlink(tmp_path)
+            raise
+
+    @contextmanager
+    def _refresh_lock(self, *, blocking: bool) -> Generator[bool]:
+        fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            deadline = time.monotonic() + (self.lock_timeout_s if blocking else 0.0)
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        yield False
+                        return
+                    time.sleep(_LOCK_POLL_S)
+            try:
+                yield True
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
@@ -5,13 +5,18 @@ This module intentionally keeps the HTTP calls explicit and typed.
 
 from __future__ import annotations
 
+import time
 from collections.abc import Mapping
-from dataclasses import dataclass
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import asdict, dataclass
 from http import HTTPStatus
+from typing import Any
 
 import requests
 
+from feide_login_core.bulkhead import Bulkheads
 from feide_login_core.json_utils import json_object_from_response
+from feide_login_core.metadata_cache import CacheEntry, SharedMetadataCache
 from feide_login_core.oidc_models import DiscoveryDocument, TokenExchangeResponse, TokenResponse
 
 
@@ -26,43 +31,179 @@ class OIDCClient:
     client_secret: str
     redirect_uri: str
     http_timeout_s: float = 5.0
+    # Optional cross-process cache; when set it replaces the per-process caches below.
+    metadata_cache: SharedMetadataCache | None = None
+    # Optional pooled session (keep-alive); when unset every call opens its own connection.
+    http: requests.Session | None = None
+    # Optional per-upstream concurrency limits (see feide_login_core.bulkhead).
+    bulkheads: Bulkheads | None = None
 
     _discovery_cache: DiscoveryDocument | None = None
+    _discovery_fetched_at: float | None = None
     _jwks_cache: Mapping[str, object] | None = None
+    _jwks_fetched_at: float | None = None
+    # Set by set_credentials(); one attribute, so a call never pairs an old id with a new secret.
+    _credentials: tuple[str, str] | None = None
 
     def discover_configuration(self) -> DiscoveryDocument:
+        if self.metadata_cache is not None:
+            return DiscoveryDocument.from_json(
+                self.metadata_cache.get_or_fetch("discovery", self._fetch_discovery)
+            )
+
         # Production note: add a TTL and refresh logic for metadata caching.
         if self._discovery_cache is not None:
             return self._discovery_cache
 
-        url = f"{self.issuer.rstrip('/')}/.well-known/openid-configuration"
-        resp = requests.get(url, timeout=self.http_timeout_s)
-        if resp.status_code != HTTPStatus.OK:
-            raise OIDCError(f"Discovery failed ({resp.status_code}): {resp.text}")
-        doc = DiscoveryDocument.from_json(
-            json_object_from_response(resp, error="Discovery response is not a JSON object")
-        )
+        doc = DiscoveryDocument.from_json(self._fetch_discovery())
         object.__setattr__(self, "_discovery_cache", doc)
+        object.__setattr__(self, "_discovery_fetched_at", time.time())
         return doc
 
     def fetch_jwks(self) -> Mapping[str, object]:
+        if self.metadata_cache is not None:
+            # Resolve discovery first so its refresh lock is never taken while holding ours.
+            jwks_uri = self.discover_configuration().jwks_uri
+            return self.metadata_cache.get_or_fetch("jwks", lambda: self._fetch_jwks(jwks_uri))
+
         # Production note: add a TTL and refresh on unknown kid for JWKS caching.
         if self._jwks_cache is not None:
             return self._jwks_cache
 
-        jwks_uri = self.discover_configuration().jwks_uri
-        resp = requests.get(jwks_uri, timeout=self.http_timeout_s)
+        jwks = self._fetch_jwks(self.discover_configuration().jwks_uri)
+        object.__setattr__(self, "_jwks_cache", jwks)
+        object.__setattr__(self, "_jwks_fetched_at", time.time())
+        return jwks
+
+    def cached_metadata(self) -> dict[str, CacheEntry]:
+        """Discovery and JWKS as currently cached, without network calls (for snapshots)."""
+        if self.metadata_cache is not None:
+            entries = {key: self.metadata_cache.entry(key) for key in ("discovery", "jwks")}
+            return {key: entry for key, entry in entries.items() if entry is not None}
+        cached: dict[str, CacheEntry] = {}
+        if self._discovery_cache is not None and self._discovery_fetched_at is not None:
+            cached["discovery"] = CacheEntry(
+                fetched_at=self._discovery_fetched_at, value=asdict(self._discovery_cache)
+            )
+        if self._jwks_cache is not None and self._jwks_fetched_at is not None:
+            cached["jwks"] = CacheEntry(fetched_at=self._jwks_fetched_at, value=self._jwks_cache)
+        return cached
+
+    def seed_metadata(self, entries: Mapping[str, CacheEntry]) -> None:
+        """Fill empty per-process caches with previously fetched discovery/JWKS documents.
+
+        Entries keep their original ``fetched_at``, so ``metadata_status`` reports their
+        real age. A shared ``metadata_cache`` persists on its own and is left alone.
+        """
+        if self.metadata_cache is not None:
+            return
+        discovery = entries.get("discovery")
+        if discovery is not None and self._discovery_cache is None:
+            object.__setattr__(
+                self, "_discovery_cache", DiscoveryDocument.from_json(discovery.value)
+            )
+            object.__setattr__(self, "_discovery_fetched_at", discovery.fetched_at)
+        jwks = entries.get("jwks")
+        if jwks is not None and self._jwks_cache is None and "keys" in jwks.value:
+            object.__setattr__(self, "_jwks_cache", jwks.value)
+            object.__setattr__(self, "_jwks_fetched_at", jwks.fetched_at)
+
+    def refresh_metadata(self) -> dict[str, CacheEntry]:
+        """Fetch discovery and JWKS from the issuer and replace the per-process copies.
+
+        Raises OIDCError, leaving the cached copies in place, if either fetch fails.
+        """
+        try:
+            discovery = self._fetch_discovery()
+            jwks = self._fetch_jwks(DiscoveryDocument.from_json(discovery).jwks_uri)
+        except (requests.RequestException, ValueError) as exc:
+            raise OIDCError(f"Metadata refresh failed: {exc}") from exc
+        fetched_at = time.time()
+        object.__setattr__(self, "_discovery_cache", DiscoveryDocument.from_json(discovery))
+        object.__setattr__(self, "_discovery_fetched_at", fetched_at)
+        object.__setattr__(self, "_jwks_cache", jwks)
+        object.__setattr__(self, "_jwks_fetched_at", fetched_at)
+        return {
+            "discovery": CacheEntry(fetched_at=fetched_at, value=discovery),
+            "jwks": CacheEntry(fetched_at=fetched_at, value=jwks),
+        }
+
+    def set_credentials(self, client_id: str, client_secret: str) -> None:
+        """Use new client credentials from the next call on; caches and pools are kept."""
+        object.__setattr__(self, "_credentials", (client_id, client_secret))
+        object.__setattr__(self, "client_id", client_id)
+        object.__setattr__(self, "client_secret", client_secret)
+
+    def _auth(self) -> tuple[str, str]:
+        return self._credentials or (self.client_id, self.client_secret)
+
+    def metadata_status(self) -> Mapping[str, Mapping[str, object]]:
+        """Report whether discovery and JWKS are cached, and how old they are.
+
+        Never performs network calls; intended for health and readiness probes.
+        """
+        now = time.time()
+        status: dict[str, Mapping[str, object]] = {}
+        for key, fetched_at, max_age_s in self._metadata_ages():
+            age_s = None if fetched_at is None else round(now - fetched_at, 3)
+            status[key] = {
+                "cached": fetched_at is not None,
+                "age_s": age_s,
+                "fresh": age_s is not None and (max_age_s is None or age_s < max_age_s),
+            }
+        return status
+
+    def _metadata_ages(self) -> list[tuple[str, float | None, float | None]]:
+        if self.metadata_cache is not None:
+            cache = self.metadata_cache
+            ages: list[tuple[str, float | None, float | None]] = []
+            for key in ("discovery", "jwks"):
+                entry = cache.entry(key)
+                ages.append((key, entry.fetched_at if entry else None, cache.ttl_s))
+            return ages
+        return [
+            ("discovery", self._discovery_fetched_at, None),
+            ("jwks", self._jwks_fetched_at, None),
+        ]
+
+    def _get(self, upstream: str, url: str, **kwargs: Any) -> requests.Response:
+        with self._bulkhead(upstream):
+            if self.http is not None:
+                return self.http.get(url, **kwargs)
+            return requests.get(url, **kwargs)
+
+    def _post(self, upstream: str, url: str, **kwargs: Any) -> requests.Response:
+        with self._bulkhead(upstream):
+            if self.http is not None:
+                return self.http.post(url, **kwargs)
+            return requests.post(url, **kwargs)
+
+    def _bulkhead(self, upstream: str) -> AbstractContextManager[None]:
+        return self.bulkheads.call(upstream) if self.bulkheads is not None else nullcontext()
+
+    def _fetch_discovery(self) -> Mapping[str, object]:
+        url = f"{self.issuer.rstrip('/')}/.well-known/openid-configuration"
+        resp = self._get("discovery", url, timeout=self.http_timeout_s)
+        if resp.status_code != HTTPStatus.OK:
+            raise OIDCError(f"Discovery failed ({resp.status_code}): {resp.text}")
+        data = json_object_from_response(resp, error="Discovery response is not a JSON object")
+        # Validate before the document can be cached (and shared with other workers).
+        _ = DiscoveryDocument.from_json(data)
+        return data
+
+    def _fetch_jwks(self, jwks_uri: str) -> Mapping[str, object]:
+        resp = self._get("jwks", jwks_uri, timeout=self.http_timeout_s)
         if resp.status_code != HTTPStatus.OK:
             raise OIDCError(f"JWKS fetch failed ({resp.status_code}): {resp.text}")
         jwks = json_object_from_response(resp, error="JWKS response is not a JSON object")
         if "keys" not in jwks:
             raise OIDCError("JWKS response missing 'keys'")
-        object.__setattr__(self, "_jwks_cache", jwks)
         return jwks
 
     def exchange_code_for_tokens(self, *, code: str, code_verifier: str) -> TokenResponse:
         doc = self.discover_configuration()
-        resp = requests.post(
+        resp = self._post(
+            "token",
             doc.token_endpoint,
             data={
                 "grant_type": "authorization_code",
@@ -70,7 +211,7 @@ class OIDCClient:
                 "redirect_uri": self.redirect_uri,
                 "code_verifier": code_verifier,
             },
-            auth=(self.client_id, self.client_secret),
+            auth=self._auth(),
             timeout=self.http_timeout_s,
         )
         if resp.status_code != HTTPStatus.OK:
@@ -82,7 +223,8 @@ class OIDCClient:
     def userinfo(self, *, access_token: str) -> Mapping[str, object]:
         """OIDC userinfo endpoint from discovery."""
         url = self.discover_configuration().userinfo_endpoint
-        resp = requests.get(
+        resp = self._get(
+            "userinfo",
             url,
             headers={"Authorization": f"Bearer {access_token}"},
             timeout=self.http_timeout_s,
@@ -95,7 +237,8 @@ class OIDCClient:
         self, *, access_token: str, extended_userinfo_url: str
     ) -> Mapping[str, object]:
         """Feide extended userinfo endpoint (directory attributes)."""
-        resp = requests.get(
+        resp = self._get(
+            "extended_userinfo",
             extended_userinfo_url,
             headers={"Authorization": f"Bearer {access_token}"},
             timeout=self.http_timeout_s,
@@ -133,10 +276,11 @@ class OIDCClient:
                 else {}
             ),
         }
-        resp = requests.post(
+        resp = self._post(
+            "token",
             doc.token_endpoint,
             data=data,
-            auth=(self.client_id, self.client_secret),
+            auth=self._auth(),
             timeout=self.http_timeout_s,
         )
         if resp.status_code != HTTPStatus.OK:
@@ -1,8 +1,16 @@
-"""Minimal OIDC client utilities for the simple example."""
+"""Minimal OIDC client utilities for the simple example.
+
+The discovery result (and the env-based client configuration) is cached per process
+for ``DISCOVERY_TTL_S``, and calls share one keep-alive session, so a login costs
+one upstream call (the token request) once the cache is warm.
+"""
 
 from __future__ import annotations
 
 import os
+import threading
+import time
+from typing import Final
 
 import requests
 
@@ -15,14 +23,41 @@ def _require_str(value: object, *, key: str) -> str:
     return value
 
 
+DISCOVERY_TTL_S: Final[float] = 3600.0
+
+# Pooled connections to Feide, shared by all requests in this process.
+http = requests.Session()
+
+_cache_lock = threading.Lock()
+_cached_config: tuple[float, dict[str, object]] | None = None
+
+
+def clear_discovery_cache() -> None:
+    global _cached_config
+    with _cache_lock:
+        _cached_config = None
+
+
 def discover_configuration() -> dict[str, object]:
+    global _cached_config
+    with _cache_lock:
+        if _cached_config is not None and time.monotonic() - _cached_config[0] < DISCOVERY_TTL_S:
+            return dict(_cached_config[1])
+
+    config = _load_configuration()
+    with _cache_lock:
+        _cached_config = (time.monotonic(), config)
+    return dict(config)
+
+
+def _load_configuration() -> dict[str, object]:
     issuer = os.getenv("FEIDE_ISSUER", "https://auth.dataporten.no")
     client_id = os.environ["OIDC_CLIENT_ID"]
     client_secret = os.environ["OIDC_CLIENT_SECRET"]
     redirect_uri = os.environ["OIDC_REDIRECT_URI"]
 
     url = f"{issuer.rstrip('/')}/.well-known/openid-configuration"
-    resp = requests.get(url, timeout=5.0)
+    resp = http.get(url, timeout=5.0)
     resp.raise_for_status()
     doc = require_json_object(resp.json(), error="Discovery response is not a JSON object")
 
@@ -41,7 +76,7 @@ def exchange_code_for_tokens(*, code: str, code_verifier: str) -> dict[str, obje
     client_id = _require_str(config["client_id"], key="client_id")
     client_secret = _require_str(config["client_secret"], key="client_secret")
     redirect_uri = _require_str(config["redirect_uri"], key="redirect_uri")
-    resp = requests.post(
+    resp = http.post(
         token_endpoint,
         data={
             "grant_type": "authorization_code",
@@ -0,0 +1,161 @@
+"""Pinned discovery and JWKS documents, refreshed from the live issuer in the background.
+
+Seeding ``OIDCClient`` from files shipped with the deployment lets an instance
+validate tokens before (or without) reaching the issuer. ``MetadataRefresher``
+then fetches the live documents on a fixed interval and replaces the cached ones
+only when a fetch succeeds, so an issuer outage leaves the last good copy in use.
+A token signed with a key the cache does not know yet can request an early refresh.
+
+Pinned files seed the per-process caches; they cannot be combined with the shared
+``metadata_cache`` file, which has its own refresh.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import cast
+
+from feide_login_core.concurrency import ConcurrencyLimitExceeded
+from feide_login_core.metadata_cache import CacheEntry
+from feide_login_core.oidc import OIDCClient, OIDCError
+from feide_login_core.oidc_models import DiscoveryDocument
+
+# After a failed refresh, try again sooner than the regular interval.
+_RETRY_S = 30.0
+
+
+def _read_document(path: str) -> CacheEntry:
+    try:
+        with open(path, "rb") as handle:
+            data: object = json.load(handle)
+        fetched_at = os.stat(path).st_mtime
+    except (OSError, ValueError) as exc:
+        raise RuntimeError(f"Cannot read pinned metadata {path}: {exc}") from exc
+    if not isinstance(data, dict):
+        raise RuntimeError(f"Pinned metadata {path} is not a JSON object")
+    # The file's modification time stands in for when the document was fetched.
+    return CacheEntry(fetched_at=fetched_at, value=cast(dict[str, object], data))
+
+
+def load_pinned_metadata(
+    *, discovery_path: str | None, jwks_path: str | None
+) -> dict[str, CacheEntry]:
+    """Read and validate the pinned documents; raises RuntimeError for unusable files."""
+    entries: dict[str, CacheEntry] = {}
+    if discovery_path:
+        entries["discovery"] = _read_document(discovery_path)
+        try:
+            _ = DiscoveryDocument.from_json(entries["discovery"].value)
+        except ValueError as exc:
+            raise RuntimeError(f"Pinned discovery document is invalid: {exc}") from exc
+    if jwks_path:
+        entries["jwks"] = _read_document(jwks_path)
+        if not isinstance(entries["jwks"].value.get("keys"), list):
+            raise RuntimeError("Pinned JWKS has no 'keys' list")
+    return entries
+
+
+@dataclass(frozen=True)
+class RefreshStatus:
+    refreshes: int
+    failures: int
+    last_refresh_at: float | None
+    last_error: str | None
+    # Whether the first live JWKS matched the pinned one (None until it was fetched).
+    pinned_jwks_current: bool | None
+
+
+class MetadataRefresher:
+    """Refreshes an ``OIDCClient``'s discovery/JWKS every ``interval_s`` on a daemon thread.
+
+    The thread starts on the first ``ensure_running`` call in each process, so a
+    pre-forking server gets one per worker rather than one in the master.
+    """
+
+    def __init__(
+        self,
+        oidc: OIDCClient,
+        *,
+        interval_s: float,
+        pinned: Mapping[str, CacheEntry],
+        min_spacing_s: float = 10.0,
+    ) -> None:
+        self.oidc = oidc
+        self.interval_s = interval_s
+        self.min_spacing_s = min_spacing_s
+        pinned_jwks = pinned.get("jwks")
+        self._pinned_jwks = pinned_jwks.value if pinned_jwks is not None else None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid: int | None = None
+        self._refreshes = 0
+        self._failures = 0
+        self._last_attempt = float("-inf")
+        self._last_refresh_at: float | None = None
+        self._last_error: str | None = None
+        self._pinned_jwks_current: bool | None = None
+
+    def ensure_running(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="metadata-refresh", daemon=True).start()
+
+    def request_refresh(self) -> None:
+        """Refresh now (e.g. on an unknown signing key), at most once per ``min_spacing_s``."""
+        self._wake.set()
+
+    def refresh(self) -> bool:
+        """Fetch the live documents once; returns False (keeping the cached copies) on failure."""
+        with self._lock:
+            self._last_attempt = time.monotonic()
+        try:
+            entries = self.oidc.refresh_metadata()
+        except (OIDCError, ConcurrencyLimitExceeded) as exc:
+            self._record_failure(exc)
+            return False
+        with self._lock:
+            self._refreshes += 1
+            self._last_refresh_at = time.time()
+            self._last_error = None
+            if self._pinned_jwks_current is None and self._pinned_jwks is not None:
+                self._pinned_jwks_current = entries["jwks"].value == self._pinned_jwks
+        return True
+
+    def _record_failure(self, exc: Exception) -> None:
+        with self._lock:
+            self._failures += 1
+            self._last_error = str(exc)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                ok = self.refresh()
+            except Exception as exc:
+                # Never let an unexpected error end the thread: refreshes would stop for good.
+                self._record_failure(exc)
+                ok = False
+            _ = self._wake.wait(self.interval_s if ok else min(self.interval_s, _RETRY_S))
+            self._wake.clear()
+            with self._lock:
+                spacing_left = self._last_attempt + self.min_spacing_s - time.monotonic()
+            if spacing_left > 0:
+                time.sleep(spacing_left)
+
+    def status(self) -> RefreshStatus:
+        with self._lock:
+            return RefreshStatus(
+                refreshes=self._refreshes,
+                failures=self._failures,
+                last_refresh_at=self._last_refresh_at,
+                last_error=self._last_error,
+                pinned_jwks_current=self._pinned_jwks_current,
+            )
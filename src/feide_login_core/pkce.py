@@ -4,7 +4,11 @@ from __future__ import annotations
 
 import base64
 import hashlib
+import os
+import queue
 import secrets
+import threading
+from dataclasses import dataclass
 from typing import Final
 
 _VERIFIER_BYTES: Final[int] = 32
@@ -19,3 +23,94 @@ def generate_pkce() -> tuple[str, str]:
     verifier = _b64url(secrets.token_bytes(_VERIFIER_BYTES))
     challenge = _b64url(hashlib.sha256(verifier.encode("ascii")).digest())
     return verifier, challenge
+
+
+@dataclass(frozen=True)
+class LoginSecrets:
+    """Per-login random values: PKCE pair plus OAuth state and OIDC nonce."""
+
+    verifier: str
+    challenge: str
+    state: str
+    nonce: str
+
+
+def generate_login_secrets() -> LoginSecrets:
+    verifier, challenge = generate_pkce()
+    return LoginSecrets(
+        verifier=verifier,
+        challenge=challenge,
+        state=secrets.token_urlsafe(16),
+        nonce=secrets.token_urlsafe(16),
+    )
+
+
+@dataclass(frozen=True)
+class PoolStats:
+    depth: int
+    capacity: int
+    served: int
+    fallbacks: int
+
+
+class LoginSecretsPool:
+    """Bounded pool of pre-generated ``LoginSecrets``, refilled by a background thread.
+
+    Every entry is handed out once (``queue.Queue.get`` removes it). When the pool is
+    empty, ``take`` generates inline instead of waiting. Entries generated before a
+    fork are discarded in the child, so pre-forking servers never share values.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._served = 0
+        self._fallbacks = 0
+        self._start()
+
+    def _start(self) -> None:
+        self._pid = os.getpid()
+        self._queue: queue.Queue[LoginSecrets] = queue.Queue(maxsize=self.capacity)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._fill, name="login-secrets-pool", daemon=True)
+        self._thread.start()
+
+    def _fill(self) -> None:
+        pending = generate_login_secrets()
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(pending, timeout=0.5)
+            except queue.Full:
+                continue
+            pending = generate_login_secrets()
+
+    def take(self) -> LoginSecrets:
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked: the inherited queue is a copy of the parent's and has no filler.
+                self._start()
+        try:
+            item = self._queue.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                self._fallbacks += 1
+            return generate_login_secrets()
+        with self._lock:
+            self._served += 1
+        return item
+
+    def close(self) -> None:
+        """Stop refilling; entries already in the pool can still be taken."""
+        self._stopped.set()
+        self._thread.join()
+
+    def stats(self) -> PoolStats:
+        with self._lock:
+            return PoolStats(
+                depth=self._queue.qsize(),
+                capacity=self.capacity,
+                served=self._served,
+                fallbacks=self._fallbacks,
+            )
@@ -0,0 +1,76 @@
+"""Token-bucket rate limiting with a pluggable bucket store.
+
+``InMemoryRateLimitBackend``, the only store shipped here, keeps buckets per process:
+with several workers or nodes each one admits up to the full limit, so the effective
+limit is the configured one times the number of processes. A shared store can
+implement ``RateLimitBackend``; it must check and consume all of a request's buckets
+in one atomic step (for Redis, a Lua script run with EVAL).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from typing import Protocol
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """Sustained ``rate_per_s`` with bursts of up to ``burst`` requests."""
+
+    rate_per_s: float
+    burst: float
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate_per_s > 0 and self.burst > 0
+
+
+class RateLimitBackend(Protocol):
+    def take_all(self, buckets: Sequence[tuple[str, RateLimit]], *, cost: float = 1.0) -> float:
+        """Consume ``cost`` tokens from every ``(key, limit)`` bucket, or from none.
+
+        Returns 0 if the request is allowed, otherwise the number of seconds until
+        every bucket has enough tokens (nothing is consumed in that case).
+        """
+        ...
+
+
+class InMemoryRateLimitBackend:
+    """Per-process buckets; the least recently used buckets are dropped beyond ``max_keys``.
+
+    A dropped bucket starts full again, which only errs on the side of admitting.
+    """
+
+    def __init__(self, *, max_keys: int = 100_000, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (tokens, updated_at)
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def take(self, key: str, limit: RateLimit, *, cost: float = 1.0) -> float:
+        return self.take_all([(key, limit)], cost=cost)
+
+    def take_all(self, buckets: Sequence[tuple[str, RateLimit]], *, cost: float = 1.0) -> float:
+        with self._lock:
+            now = self._clock()
+            refilled: list[tuple[str, float]] = []
+            wait_s = 0.0
+            for key, limit in buckets:
+                tokens, updated_at = self._buckets.pop(key, (limit.burst, now))
+                tokens = min(limit.burst, tokens + (now - updated_at) * limit.rate_per_s)
+                if tokens < cost:
+                    wait_s = max(wait_s, (cost - tokens) / limit.rate_per_s)
+                refilled.append((key, tokens))
+            for key, tokens in refilled:
+                self._buckets[key] = (tokens - cost if wait_s == 0 else tokens, now)
+            while len(self._buckets) > self.max_keys:
+                _ = self._buckets.popitem(last=False)
+            return wait_s
+
+    def __len__(self) -> int:
+        return len(self._buckets)
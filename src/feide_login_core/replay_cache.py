@@ -0,0 +1,158 @@
+"""Memory-bounded ``jti`` replay detection.
+
+Tokens are tracked in Bloom filters partitioned by expiry time: a token whose
+``exp`` falls in time slice *b* is recorded in (and only looked up in) the filter
+for slice *b*. Once a slice is in the past, every token in it has expired and
+the whole filter is dropped, so at most ``max_lifetime_s / slice_s + 1`` filters
+exist and memory is fixed regardless of the token rate.
+
+Each filter is sized for ``tokens_per_slice`` insertions at the configured
+false-positive rate. A false positive rejects a fresh token as a replay; beyond
+the sized capacity the rate degrades gracefully instead of memory growing.
+
+The filters live in this process only. A token replayed against another worker
+or node is not detected.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import threading
+import time
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+
+
+class _BloomFilter:
+    def __init__(self, bits: int, hashes: int) -> None:
+        self.bits = bits
+        self.hashes = hashes
+        self._array = bytearray((bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: bytes) -> Iterator[tuple[int, int]]:
+        digest = hashlib.blake2b(item, digest_size=16).digest()
+        # Kirsch-Mitzenmacher double hashing: k positions from two 64-bit hashes.
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            pos = (h1 + i * h2) % self.bits
+            yield pos >> 3, 1 << (pos & 7)
+
+    def contains(self, item: bytes) -> bool:
+        array = self._array
+        return all(array[byte] & mask for byte, mask in self._positions(item))
+
+    def add_if_absent(self, item: bytes) -> bool:
+        """Insert ``item``; returns False if it was (probably) present already."""
+        present = True
+        array = self._array
+        for byte, mask in self._positions(item):
+            if not array[byte] & mask:
+                present = False
+                array[byte] |= mask
+        if not present:
+            self.count += 1
+        return not present
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._array)
+
+
+@dataclass(frozen=True)
+class ReplayCacheStats:
+    filters: int
+    bytes: int
+    tracked: int
+    replays: int
+
+
+class ReplayCache:
+    def __init__(
+        self,
+        *,
+        max_lifetime_s: float = 8 * 3600,
+        slice_s: float = 600,
+        tokens_per_slice: int = 100_000,
+        false_positive_rate: float = 1e-6,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        if not 0 < false_positive_rate < 1:
+            raise ValueError("false_positive_rate must be between 0 and 1")
+        self.max_lifetime_s = max_lifetime_s
+        self.slice_s = slice_s
+        # Optimal Bloom parameters: m = -n ln p / (ln 2)^2 bits, k = (m / n) ln 2 hashes.
+        self._bits = max(
+            8, math.ceil(-tokens_per_slice * math.log(false_positive_rate) / math.log(2) ** 2)
+        )
+        self._hashes = max(1, round(self._bits / tokens_per_slice * math.log(2)))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._filters: dict[int, _BloomFilter] = {}
+        self._oldest_slice = 0
+        self._replays = 0
+
+    @property
+    def max_bytes(self) -> int:
+        """Upper bound on filter memory: one filter per live slice."""
+        slices = math.ceil(self.max_lifetime_s / self.slice_s) + 1
+        return slices * ((self._bits + 7) // 8)
+
+    def seen(self, jti: str, exp: float) -> bool:
+        """Whether ``jti`` was (probably) recorded already; records nothing.
+
+        Lets a caller turn replays away before doing any work, and record the token
+        with ``check_and_add`` only once the request has succeeded. Raises ValueError
+        like ``check_and_add``.
+        """
+        now = self._clock()
+        if exp > now + self.max_lifetime_s:
+            raise ValueError("Token lifetime exceeds the replay detection window")
+        if exp <= now:
+            return False
+        with self._lock:
+            bloom = self._filters.get(int(exp // self.slice_s))
+            if bloom is None or not bloom.contains(jti.encode("utf-8")):
+                return False
+            self._replays += 1
+            return True
+
+    def check_and_add(self, jti: str, exp: float) -> bool:
+        """Record a token; returns False if ``jti`` was (probably) seen before.
+
+        Raises ValueError if ``exp`` is further out than ``max_lifetime_s``, since such
+        a token would outlive the filters that remember it.
+        """
+        now = self._clock()
+        if exp > now + self.max_lifetime_s:
+            raise ValueError("Token lifetime exceeds the replay detection window")
+        if exp <= now:
+            # Already expired; signature validation rejects these anyway.
+            return True
+
+        current = int(now // self.slice_s)
+        bucket = int(exp // self.slice_s)
+        with self._lock:
+            if current > self._oldest_slice:
+                for stale in [key for key in self._filters if key < current]:
+                    del self._filters[stale]
+                self._oldest_slice = current
+            bloom = self._filters.get(bucket)
+            if bloom is None:
+                bloom = _BloomFilter(self._bits, self._hashes)
+                self._filters[bucket] = bloom
+            fresh = bloom.add_if_absent(jti.encode("utf-8"))
+            if not fresh:
+                self._replays += 1
+            return fresh
+
+    def stats(self) -> ReplayCacheStats:
+        with self._lock:
+            return ReplayCacheStats(
+                filters=len(self._filters),
+                bytes=sum(bloom.nbytes for bloom in self._filters.values()),
+                tracked=sum(bloom.count for bloom in self._filters.values()),
+                replays=self._replays,
+            )
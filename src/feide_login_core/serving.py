@@ -0,0 +1,112 @@
+"""Production serving for the example apps (gunicorn, multi-worker).
+
+``app.run()`` starts Flask's development server: one process, not meant for
+production traffic. ``run_server`` runs the same Flask app under gunicorn with
+a configurable number of worker processes and threads per worker.
+
+gunicorn is an optional dependency: ``pip install -e ".[serve]"``.
+"""
+
+from __future__ import annotations
+
+import os
+import signal
+import sys
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from typing import override
+
+from flask import Flask
+
+from feide_login_core.env import env_flag, env_int
+
+
+@dataclass(frozen=True)
+class ServerSettings:
+    port: int = 8000
+    host: str = "0.0.0.0"
+    workers: int = 2
+    threads: int = 4
+    # Import and build the app once in the master, then fork workers (copy-on-write memory).
+    # Off by default: apps that open upstream connections while being built (warm-up, the
+    # pooled HTTP session) would hand the same sockets to every worker. Each worker then
+    # builds and warms its own app, and HUP reloads application code.
+    preload_app: bool = False
+    keepalive_s: int = 5
+    timeout_s: int = 30
+    graceful_timeout_s: int = 30
+    # Recycle a worker after this many requests (0 disables); jitter avoids synchronized restarts.
+    max_requests: int = 0
+    max_requests_jitter: int = 0
+
+    def gunicorn_options(self) -> dict[str, object]:
+        return {
+            "bind": f"{self.host}:{self.port}",
+            "workers": self.workers,
+            "threads": self.threads,
+            "worker_class": "gthread",
+            "preload_app": self.preload_app,
+            "keepalive": self.keepalive_s,
+            "timeout": self.timeout_s,
+            "graceful_timeout": self.graceful_timeout_s,
+            "max_requests": self.max_requests,
+            "max_requests_jitter": self.max_requests_jitter,
+            "accesslog": "-",
+        }
+
+
+def load_server_settings(
+    *,
+    default_port: int,
+    default_preload_app: bool = False,
+    environ: Mapping[str, str] | None = None,
+) -> ServerSettings:
+    env = os.environ if environ is None else environ
+    return ServerSettings(
+        port=env_int("PORT", default_port, environ=env),
+        host="0.0.0.0",
+        workers=env_int("SERVER_WORKERS", 2, environ=env),
+        threads=env_int("SERVER_THREADS", 4, environ=env),
+        preload_app=env_flag("SERVER_PRELOAD_APP", default_preload_app, environ=env),
+        keepalive_s=env_int("SERVER_KEEPALIVE_S", 5, environ=env),
+        timeout_s=env_int("SERVER_TIMEOUT_S", 30, environ=env),
+        graceful_timeout_s=env_int("SERVER_GRACEFUL_TIMEOUT_S", 30, environ=env),
+        max_requests=env_int("SERVER_MAX_REQUESTS", 0, environ=env),
+        max_requests_jitter=env_int("SERVER_MAX_REQUESTS_JITTER", 0, environ=env),
+    )
+
+
+def exit_on_sigterm() -> None:
+    """Make SIGTERM exit the development server like Ctrl-C, so ``atexit`` handlers run.
+
+    By default SIGTERM kills the process without running them (and a container's
+    PID 1 ignores it until it is killed), so e.g. no cache snapshot would be written
+    on ``docker stop``. gunicorn installs its own handlers and does not need this.
+    """
+    _ = signal.signal(signal.SIGTERM, lambda _signum, _frame: sys.exit(0))
+
+
+def run_server(app_factory: Callable[[], Flask], server: ServerSettings) -> None:
+    """Serve ``app_factory()`` under gunicorn until the master process is stopped.
+
+    Signals follow gunicorn: TERM shuts down gracefully (in-flight requests get
+    ``graceful_timeout_s``), HUP replaces the workers without dropping the socket.
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError as exc:
+        raise RuntimeError(
+            'gunicorn is not installed. Install the serving extra: pip install -e ".[serve]"'
+        ) from exc
+
+    class _Application(BaseApplication):
+        @override
+        def load_config(self) -> None:
+            for key, value in server.gunicorn_options().items():
+                self.cfg.set(key, value)
+
+        @override
+        def load(self) -> Flask:  # pyright: ignore[reportIncompatibleMethodOverride]
+            return app_factory()
+
+    _Application().run()
@@ -0,0 +1,230 @@
+"""Settings that can be reloaded while the process keeps running.
+
+``SettingsProvider`` holds the current (frozen) settings object and replaces it as a
+whole, so code that reads ``current`` once per request sees either the old or the new
+settings, never a mix. A reload runs the app's ``load_settings`` again on a copy of
+the process environment with the ``KEY=VALUE`` lines of an optional settings file
+applied over it; ``os.environ`` itself is never modified.
+
+Reloads are triggered by a change of that file's modification time (checked on the
+request path, at most once per ``check_interval_s``) or by ``request_reload``, e.g.
+from a SIGHUP handler. Only fields listed as reloadable take their new value: other
+fields configure objects built once at startup (connection pools, caches, worker
+counts), so a change to them keeps the running value and is reported as
+``restart_required``.
+"""
+
+from __future__ import annotations
+
+import os
+import signal
+import threading
+import time
+from collections.abc import Callable, Collection, Mapping
+from dataclasses import dataclass, fields, replace
+from os import getenv
+from typing import TYPE_CHECKING, Generic, TypeVar
+
+from feide_login_core.env import env_flag, env_float
+
+if TYPE_CHECKING:
+    from _typeshed import DataclassInstance
+
+S = TypeVar("S", bound="DataclassInstance")
+
+
+def read_env_file(path: str) -> dict[str, str]:
+    """Parse ``KEY=VALUE`` lines; blank lines, ``#`` comments and ``export`` are allowed."""
+    values: dict[str, str] = {}
+    with open(path, encoding="utf-8") as handle:
+        for number, raw in enumerate(handle, start=1):
+            line = raw.strip()
+            if not line or line.startswith("#"):
+                continue
+            line = line.removeprefix("export ").lstrip()
+            key, sep, value = line.partition("=")
+            key, value = key.strip(), value.strip()
+            if not sep or not key:
+                raise RuntimeError(f"{path}:{number}: expected KEY=VALUE")
+            if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+                value = value[1:-1]
+            values[key] = value
+    return values
+
+
+@dataclass(frozen=True)
+class ReloadSettings:
+    # KEY=VALUE file applied over the environment; the settings reload when it changes.
+    env_file: str | None = None
+    check_interval_s: float = 1.0
+    # Reload on SIGHUP. Only for the development server: gunicorn uses HUP to replace workers.
+    on_sighup: bool = False
+
+
+def load_reload_settings() -> ReloadSettings:
+    return ReloadSettings(
+        env_file=getenv("SETTINGS_FILE") or None,
+        check_interval_s=env_float("SETTINGS_CHECK_INTERVAL_S", 1.0),
+        on_sighup=env_flag("SETTINGS_RELOAD_ON_SIGHUP"),
+    )
+
+
+@dataclass(frozen=True)
+class ReloadStatus:
+    version: int
+    loaded_at: float
+    reloads: int
+    failures: int
+    last_reload_latency_s: float | None
+    last_error: str | None
+    # Fields applied by the last successful reload.
+    last_changed: tuple[str, ...]
+    # Fields whose new value only takes effect after a restart.
+    restart_required: tuple[str, ...]
+
+
+class SettingsProvider(Generic[S]):
+    """The settings returned by ``load(environ)``, replaced atomically by ``reload``."""
+
+    def __init__(
+        self,
+        load: Callable[[Mapping[str, str]], S],
+        *,
+        reloadable: Collection[str] = (),
+        env_file: str | None = None,
+        check_interval_s: float = 1.0,
+    ) -> None:
+        self._load = load
+        self.reloadable = frozenset(reloadable)
+        self.env_file = env_file
+        self.check_interval_s = check_interval_s
+        self._callbacks: list[Callable[[S, S], None]] = []
+        self._lock = threading.Lock()
+        self._requested = threading.Event()
+        self._next_check = time.monotonic() + check_interval_s
+        self._file_mtime = self._stat_env_file()
+        self._current = load(self._environ())
+        self._version = 1
+        self._loaded_at = time.time()
+        self._reloads = 0
+        self._failures = 0
+        self._latency_s: float | None = None
+        self._last_error: str | None = None
+        self._last_changed: tuple[str, ...] = ()
+        self._restart_required: tuple[str, ...] = ()
+
+    @property
+    def current(self) -> S:
+        return self._current
+
+    def on_reload(self, callback: Callable[[S, S], None]) -> None:
+        """Call ``callback(old, new)`` before a new version is published."""
+        self._callbacks.append(callback)
+
+    def request_reload(self) -> None:
+        """Reload on the next ``maybe_reload``; safe to call from a signal handler."""
+        self._requested.set()
+
+    def maybe_reload(self) -> bool:
+        """Reload if requested or the settings file changed; cheap enough for every request."""
+        if not self._requested.is_set():
+            now = time.monotonic()
+            if self.env_file is None or now < self._next_check:
+                return False
+            self._next_check = now + self.check_interval_s
+            if self._stat_env_file() == self._file_mtime:
+                return False
+        # Another thread is already reloading; it will pick up the same change.
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            return self._reload()
+        finally:
+            self._lock.release()
+
+    def reload(self) -> bool:
+        """Load the settings again; returns True if a new version was published."""
+        with self._lock:
+            return self._reload()
+
+    def _environ(self) -> dict[str, str]:
+        """The process environment with the settings file applied over it."""
+        environ = dict(os.environ)
+        if self.env_file is not None:
+            environ.update(read_env_file(self.env_file))
+        return environ
+
+    def _reload(self) -> bool:
+        started = time.perf_counter()
+        self._requested.clear()
+        # Record the version of the file being read, so a broken file is retried only
+        # once it changes again.
+        self._file_mtime = self._stat_env_file()
+        try:
+            loaded = self._load(self._environ())
+            old = self._current
+            changed = [
+                f.name for f in fields(old) if getattr(loaded, f.name) != getattr(old, f.name)
+            ]
+            applied = tuple(name for name in changed if name in self.reloadable)
+            new = replace(old, **{name: getattr(loaded, name) for name in applied})
+            if applied:
+                for callback in self._callbacks:
+                    callback(old, new)
+        except (OSError, RuntimeError, ValueError, KeyError) as exc:
+            self._failures += 1
+            self._last_error = str(exc)
+            self._latency_s = time.perf_counter() - started
+            return False
+        self._restart_required = tuple(name for name in changed if name not in self.reloadable)
+        self._last_error = None
+        self._latency_s = time.perf_counter() - started
+        if not applied:
+            return False
+        self._current = new
+        self._version += 1
+        self._loaded_at = time.time()
+        self._reloads += 1
+        self._last_changed = applied
+        return True
+
+    def _stat_env_file(self) -> int | None:
+        if self.env_file is None:
+            return None
+        try:
+            return os.stat(self.env_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def status(self) -> ReloadStatus:
+        return ReloadStatus(
+            version=self._version,
+            loaded_at=self._loaded_at,
+            reloads=self._reloads,
+            failures=self._failures,
+            last_reload_latency_s=(
+                round(self._latency_s, 6) if self._latency_s is not None else None
+            ),
+            last_error=self._last_error,
+            last_changed=self._last_changed,
+            restart_required=self._restart_required,
+        )
+
+
+def fixed_settings(settings: S) -> SettingsProvider[S]:
+    """A provider whose settings never change."""
+    return SettingsProvider(lambda _environ: settings)
+
+
+def create_settings_provider(
+    load: Callable[[Mapping[str, str]], S], *, reloadable: Collection[str], settings: ReloadSettings
+) -> SettingsProvider[S]:
+    provider = SettingsProvider(
+        load,
+        reloadable=reloadable,
+        env_file=settings.env_file,
+        check_interval_s=settings.check_interval_s,
+    )
+    if settings.on_sighup:
+        _ = signal.signal(signal.SIGHUP, lambda _signum, _frame: provider.request_reload())
+    return provider
@@ -0,0 +1,198 @@
+"""Encrypted snapshots of warm caches, so a restarted process does not start cold.
+
+A snapshot holds discovery, JWKS and unexpired cache entries. It is written when the
+process exits and read by ``create_app`` on the next start, where every entry's
+expiry is checked again. Entries are stored with wall-clock expiry times, so time
+spent between shutdown and restart counts against them.
+
+The file is a JWE (``dir`` + ``A256GCM``) under a key derived from the app secret:
+cached userinfo never lands on disk in clear text, and a file written with another
+secret (or tampered with) is ignored. Cache keys that contain tokens are already
+hashed by the caches themselves. AES-GCM needs python-jose's ``cryptography``
+backend: ``pip install -e ".[snapshot]"``.
+"""
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import hmac
+import json
+import os
+import tempfile
+import time
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from dataclasses import dataclass
+from typing import cast
+
+from jose import jwe
+from jose.exceptions import JOSEError
+
+from feide_login_core.env import env_float
+from feide_login_core.metadata_cache import CacheEntry
+
+_FORMAT_VERSION = 1
+
+
+class SnapshotError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class SnapshotSettings:
+    # File to write on exit and read on start; None disables snapshots.
+    path: str | None = None
+    # Discovery/JWKS older than this are not restored (they are refetched instead).
+    max_age_s: float = 3600.0
+    # Encryption secret; None uses the app's own secret.
+    secret: str | None = None
+
+
+def load_snapshot_settings(*, environ: Mapping[str, str] | None = None) -> SnapshotSettings:
+    env = os.environ if environ is None else environ
+    return SnapshotSettings(
+        path=env.get("CACHE_SNAPSHOT_PATH") or None,
+        max_age_s=env_float("CACHE_SNAPSHOT_MAX_AGE_S", 3600.0, environ=env),
+        secret=env.get("CACHE_SNAPSHOT_SECRET") or None,
+    )
+
+
+def open_snapshot(settings: SnapshotSettings, *, default_secret: str) -> CacheSnapshot | None:
+    if not settings.path:
+        return None
+    return CacheSnapshot(
+        settings.path, secret=settings.secret or default_secret, max_age_s=settings.max_age_s
+    )
+
+
+class CacheSnapshot:
+    def __init__(self, path: str, *, secret: str, max_age_s: float = 3600.0) -> None:
+        if not secret:
+            raise SnapshotError("A secret is required to encrypt cache snapshots")
+        self.path = path
+        self.max_age_s = max_age_s
+        self._key = hmac.new(secret.encode("utf-8"), b"cache snapshot", hashlib.sha256).digest()
+        try:
+            _ = jwe.encrypt(b"{}", self._key, algorithm="dir", encryption="A256GCM")
+        except JOSEError as exc:
+            raise SnapshotError(
+                'Cache snapshots need AES-GCM support: pip install -e ".[snapshot]"'
+            ) from exc
+
+    def save(self, data: Mapping[str, object]) -> None:
+        """Encrypt ``data`` and atomically replace the snapshot file (mode 0600)."""
+        plaintext = json.dumps(
+            {"version": _FORMAT_VERSION, "written_at": time.time(), **data},
+            separators=(",", ":"),
+        ).encode("utf-8")
+        token = jwe.encrypt(plaintext, self._key, algorithm="dir", encryption="A256GCM", zip="DEF")
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                _ = handle.write(token)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def load(self) -> dict[str, object] | None:
+        """The snapshot's contents, or None if it is missing, unreadable or too old."""
+        try:
+            with open(self.path, "rb") as handle:
+                token = handle.read()
+        except FileNotFoundError:
+            return None
+        try:
+            plaintext = jwe.decrypt(token, self._key)
+            data: object = json.loads(plaintext) if plaintext is not None else None
+        except (JOSEError, ValueError):
+            # Written with another secret, corrupted or tampered with: start cold.
+            return None
+        if not isinstance(data, dict):
+            return None
+        snapshot = cast(dict[str, object], data)
+        written_at = snapshot.get("written_at")
+        if snapshot.get("version") != _FORMAT_VERSION or not isinstance(written_at, int | float):
+            return None
+        if time.time() - written_at > self.max_age_s:
+            return None
+        return snapshot
+
+
+def metadata_to_json(entries: Mapping[str, CacheEntry]) -> dict[str, object]:
+    return {
+        key: {"fetched_at": entry.fetched_at, "value": dict(entry.value)}
+        for key, entry in entries.items()
+    }
+
+
+def metadata_from_json(value: object, *, max_age_s: float) -> dict[str, CacheEntry]:
+    """Discovery/JWKS entries from a snapshot that are younger than ``max_age_s``."""
+    if not isinstance(value, dict):
+        return {}
+    now = time.time()
+    entries: dict[str, CacheEntry] = {}
+    for key, item in cast(dict[str, object], value).items():
+        if not isinstance(item, dict):
+            continue
+        fetched_at = cast(dict[str, object], item).get("fetched_at")
+        document = cast(dict[str, object], item).get("value")
+        if (
+            isinstance(fetched_at, int | float)
+            and isinstance(document, dict)
+            and now - fetched_at < max_age_s
+        ):
+            entries[key] = CacheEntry(
+                fetched_at=float(fetched_at), value=cast(dict[str, object], document)
+            )
+    return entries
+
+
+def entries_to_json(entries: Iterable[tuple[str, object, float]]) -> list[object]:
+    """Cache entries given as (key, JSON value, remaining TTL) with absolute expiry times."""
+    now = time.time()
+    return [[key, value, now + ttl_s] for key, value, ttl_s in entries]
+
+
+def entries_from_json(value: object) -> Iterator[tuple[str, object, float]]:
+    """(key, value, remaining TTL) for the snapshot entries that have not expired yet."""
+    if not isinstance(value, list):
+        return
+    now = time.time()
+    for item in cast(list[object], value):
+        if not isinstance(item, list) or len(cast(list[object], item)) != 3:
+            continue
+        key, data, expires_at = cast(list[object], item)
+        if isinstance(key, str) and isinstance(expires_at, int | float) and expires_at > now:
+            yield key, data, expires_at - now
+
+
+def save_at_exit(save: Callable[[], None]) -> None:
+    """Call ``save`` when the interpreter exits, unless this process has forked since.
+
+    A pre-forking server (gunicorn with ``preload_app``) builds the app in the master
+    and serves from forked workers; only the workers hold warm caches, so the master
+    must not overwrite their snapshot with its own when it exits last.
+    """
+    forked = False
+
+    def mark_forked() -> None:
+        nonlocal forked
+        forked = True
+
+    def mark_child() -> None:
+        nonlocal forked
+        forked = False
+
+    os.register_at_fork(after_in_parent=mark_forked, after_in_child=mark_child)
+
+    def on_exit() -> None:
+        if forked:
+            return
+        try:
+            save()
+        except (OSError, SnapshotError, JOSEError):
+            pass  # Best effort: the next start is merely cold.
+
+    _ = atexit.register(on_exit)
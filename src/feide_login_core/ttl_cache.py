@@ -0,0 +1,165 @@
+"""Thread-safe in-process cache with per-entry expiry, LRU eviction and a size budget."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Generic, TypeVar
+
+V = TypeVar("V")
+
+
+@dataclass(frozen=True)
+class _Entry(Generic[V]):
+    value: V
+    expires_at: float
+    size: int
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    entries: int
+    size: int
+    hits: int
+    misses: int
+    evictions: int
+
+
+class TTLCache(Generic[V]):
+    """LRU cache bounded by entry count and by the sum of caller-supplied entry sizes.
+
+    ``size`` is whatever unit the caller budgets in (typically serialized bytes).
+    Expired entries are dropped lazily on access and when making room, or eagerly by
+    ``purge_expired``. ``on_evict(key, value)`` is called, outside the lock, for every
+    entry that expires or is evicted, but not for entries removed by ``pop``, ``set``
+    or ``clear``.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int,
+        max_size: int | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        on_evict: Callable[[str, V], None] | None = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self._clock = clock
+        self._on_evict = on_evict
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, _Entry[V]] = OrderedDict()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: str) -> V | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            if entry.expires_at > self._clock():
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry.value
+            self._remove(key)
+            self._misses += 1
+        self._notify([(key, entry.value)])
+        return None
+
+    def set(self, key: str, value: V, *, ttl_s: float, size: int = 1) -> bool:
+        """Store ``value``; returns False if it can never fit in the size budget."""
+        if ttl_s <= 0 or self.max_entries <= 0:
+            return False
+        if self.max_size is not None and size > self.max_size:
+            return False
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(value=value, expires_at=self._clock() + ttl_s, size=size)
+            self._size += size
+            evicted = self._make_room()
+        self._notify(evicted)
+        return True
+
+    def pop(self, key: str) -> V | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._remove(key)
+            return entry.value
+
+    def entries(self) -> list[tuple[str, V, float]]:
+        """Live entries as (key, value, remaining TTL in seconds), least recently used first."""
+        with self._lock:
+            now = self._clock()
+            return [
+                (key, entry.value, entry.expires_at - now)
+                for key, entry in self._entries.items()
+                if entry.expires_at > now
+            ]
+
+    def purge_expired(self) -> int:
+        """Drop every expired entry now; returns how many were dropped."""
+        with self._lock:
+            evicted = self._remove_expired()
+        self._notify(evicted)
+        return len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                entries=len(self._entries),
+                size=self._size,
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+            )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._size -= entry.size
+
+    def _evict(self, key: str) -> tuple[str, V]:
+        value = self._entries[key].value
+        self._remove(key)
+        return key, value
+
+    def _remove_expired(self) -> list[tuple[str, V]]:
+        now = self._clock()
+        expired = [key for key, entry in self._entries.items() if entry.expires_at <= now]
+        return [self._evict(key) for key in expired]
+
+    def _notify(self, evicted: list[tuple[str, V]]) -> None:
+        if self._on_evict is not None:
+            for key, value in evicted:
+                self._on_evict(key, value)
+
+    def _over_budget(self) -> bool:
+        return len(self._entries) > self.max_entries or (
+            self.max_size is not None and self._size > self.max_size
+        )
+
+    def _make_room(self) -> list[tuple[str, V]]:
+        if not self._over_budget():
+            return []
+        # Reclaim expired entries before evicting live ones.
+        evicted = self._remove_expired()
+        while self._over_budget():
+            evicted.append(self._evict(next(iter(self._entries))))
+            self._evictions += 1
+        return evicted
@@ -0,0 +1,79 @@
+"""Startup warm-up and readiness checks.
+
+Without warm-up the first user request pays for discovery, JWKS and the TLS
+handshakes to every upstream host. ``warm_up`` does that work ahead of time so
+an instance can report itself ready before the load balancer sends it traffic.
+"""
+
+from __future__ import annotations
+
+import time
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+
+import requests
+
+from feide_login_core.jwt_validation import IDTokenValidationError, preload_jwks_keys
+from feide_login_core.oidc import OIDCClient, OIDCError
+
+
+@dataclass(frozen=True)
+class WarmupReport:
+    ok: bool
+    duration_s: float
+    keys_loaded: int
+    connections_opened: int
+    errors: tuple[str, ...]
+
+
+def warm_up(oidc: OIDCClient, *, connect_urls: Sequence[str] = ()) -> WarmupReport:
+    """Prefetch discovery and JWKS, construct JWK key objects and open pooled connections.
+
+    Failures are collected in the report instead of raised, so a Feide blip at
+    startup does not prevent the app from booting; readiness stays false instead.
+    """
+    started = time.monotonic()
+    errors: list[str] = []
+    keys_loaded = 0
+    connections_opened = 0
+
+    try:
+        doc = oidc.discover_configuration()
+        keys_loaded = preload_jwks_keys(oidc.fetch_jwks())
+        connect_urls = [doc.token_endpoint, *connect_urls]
+    except (OIDCError, IDTokenValidationError, ValueError) as exc:
+        errors.append(f"metadata: {exc}")
+
+    if oidc.http is not None:
+        for url in dict.fromkeys(connect_urls):
+            try:
+                # The status does not matter (most endpoints answer 401 without a token);
+                # the point is to leave an established keep-alive connection in the pool.
+                _ = oidc.http.head(url, timeout=oidc.http_timeout_s, allow_redirects=False)
+                connections_opened += 1
+            except requests.RequestException as exc:
+                errors.append(f"connect {url}: {exc}")
+
+    return WarmupReport(
+        ok=not errors,
+        duration_s=round(time.monotonic() - started, 3),
+        keys_loaded=keys_loaded,
+        connections_opened=connections_opened,
+        errors=tuple(errors),
+    )
+
+
+def readiness(oidc: OIDCClient) -> tuple[bool, Mapping[str, object]]:
+    """Return (ready, details) based on discovery/JWKS cache freshness.
+
+    If the caches are cold or stale, one metadata warm-up is attempted first, so
+    an instance whose startup warm-up failed recovers once Feide is reachable.
+    """
+    status = oidc.metadata_status()
+    details: dict[str, object] = {"metadata": status}
+    if not all(item.get("fresh") for item in status.values()):
+        report = warm_up(oidc)
+        status = oidc.metadata_status()
+        details = {"metadata": status, "errors": list(report.errors)}
+    ready = all(item.get("fresh") for item in status.values())
+    return ready, details
@@ -2,12 +2,16 @@
 
 Routes:
 - /              Home (shows session status)
-- /login         Starts OIDC Authorization Code + PKCE
+- /login         Starts OIDC Authorization Code + PKCE (``?next=/path`` with the pending-login store)
 - /callback      Handles redirect, validates ID token, fetches userinfo
 - /logout        Clears session and redirects to the Feide logout endpoint (if available)
 - /post-logout   Landing endpoint after Feide logout
 - /exchange      Demonstrates token exchange (requires env vars for audience/scope)
-- /datasource    Calls the data source API with the exchanged token
+- /datasource    Calls the data source API with the exchanged token (``?target=<profile>``,
+                 ``?raw=1`` relays the response unmodified)
+- /healthz       Liveness probe (reports discovery/JWKS cache state)
+- /metrics       Bulkhead, page cache and login secrets pool counters (JSON)
+- /readyz        Readiness probe (503 until discovery and JWKS are cached and fresh)
 
 This sample is intentionally explicit. No third-party OIDC libraries are used.
 """
@@ -16,18 +20,55 @@ This sample is intentionally explicit. No third-party OIDC libraries are used.
 
 from __future__ import annotations
 
+import codecs
+import hashlib
+import json
+import math
 import secrets
+import time
+from collections.abc import Iterable, Iterator, Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import nullcontext
+from dataclasses import asdict
 from http import HTTPStatus
-from typing import cast
+from typing import Any, Final, cast
 from urllib.parse import urlencode
 
 import requests
 from flask import Flask, Response, redirect, request, session, url_for
 
+from feide_login_core.bulkhead import Bulkheads
+from feide_login_core.concurrency import ConcurrencyLimitExceeded
+from feide_login_core.http_pool import create_http_session
 from feide_login_core.jwt_validation import IDTokenValidationError, validate_id_token
+from feide_login_core.metadata_cache import SharedMetadataCache
 from feide_login_core.oidc import OIDCClient, OIDCError
-from feide_login_core.pkce import generate_pkce
-from feide_login_full.config import Settings, load_settings
+from feide_login_core.pinned_metadata import MetadataRefresher, load_pinned_metadata
+from feide_login_core.pkce import LoginSecretsPool, generate_login_secrets
+from feide_login_core.serving import exit_on_sigterm, run_server
+from feide_login_core.settings_reload import (
+    SettingsProvider,
+    create_settings_provider,
+    fixed_settings,
+    load_reload_settings,
+)
+from feide_login_core.snapshot import (
+    metadata_from_json,
+    metadata_to_json,
+    open_snapshot,
+    save_at_exit,
+)
+from feide_login_core.ttl_cache import TTLCache
+from feide_login_core.warmup import WarmupReport, readiness, warm_up
+from feide_login_full.background import (
+    Counters,
+    ExchangedToken,
+    RefreshScheduler,
+    SingleFlight,
+    token_key,
+)
+from feide_login_full.config import RELOADABLE_FIELDS, Settings, load_settings
 from feide_login_full.login_flow import (
     build_authorization_url,
     exchange_access_token_for_jwt,
@@ -35,7 +76,43 @@ from feide_login_full.login_flow import (
     fetch_extended_userinfo,
     fetch_userinfo,
 )
-from feide_login_full.ui import as_mapping, html_page, render_index_page, render_json_page
+from feide_login_full.pending_auth import (
+    PendingAuthorization,
+    PendingAuthorizationStore,
+    safe_return_to,
+)
+from feide_login_full.ui import (
+    as_mapping,
+    html_page,
+    render_index_page,
+    render_json_page,
+    render_user_details,
+    stream_text_page,
+)
+
+_BACKGROUND_WORKERS: Final[int] = 8
+_BACKGROUND_RESULT_TTL_S: Final[float] = 300.0
+_BACKGROUND_MAX_ENTRIES: Final[int] = 10_000
+# A prefetched exchanged token must stay valid at least this long to be handed out.
+_EXCHANGE_MIN_REMAINING_S: Final[float] = 30.0
+# Rendered index page fragments per session content version.
+_INDEX_FRAGMENT_TTL_S: Final[float] = 600.0
+_INDEX_FRAGMENT_MAX_ENTRIES: Final[int] = 1_000
+_INDEX_FRAGMENT_MAX_BYTES: Final[int] = 16 * 1024 * 1024
+_DATASOURCE_ETAG_TTL_S: Final[float] = 600.0
+_DATASOURCE_ETAG_MAX_ENTRIES: Final[int] = 1_000
+_DATASOURCE_ETAG_MAX_BYTES: Final[int] = 16 * 1024 * 1024
+_DATASOURCE_CHUNK_BYTES: Final[int] = 64 * 1024
+# Response headers forwarded as-is by /datasource?raw=1.
+_PASSTHROUGH_HEADERS: Final[tuple[str, ...]] = (
+    "Cache-Control",
+    "Content-Encoding",
+    "Content-Length",
+    "Content-Type",
+    "ETag",
+    "Last-Modified",
+    "Vary",
+)
 
 
 def _require_logged_in_user() -> dict[str, object] | Response:
@@ -67,57 +144,441 @@ def _require_token(
     return value
 
 
-def create_app(settings: Settings) -> Flask:
+def _decode_chunks(chunks: Iterable[bytes], encoding: str) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def create_app(
+    settings: Settings, *, settings_provider: SettingsProvider[Settings] | None = None
+) -> Flask:
+    """Build the app; with a ``settings_provider``, ``settings`` is its initial version."""
     app = Flask(__name__)
+    live = settings_provider or fixed_settings(settings)
     app.secret_key = settings.app_secret_key
 
+    http = (
+        create_http_session(pool_maxsize=settings.http_pool_maxsize)
+        if settings.http_pool_maxsize > 0
+        else None
+    )
+    bulkheads = Bulkheads(settings.bulkheads) if settings.bulkheads.enabled else None
     oidc = OIDCClient(
         issuer=settings.issuer,
         client_id=settings.client_id,
         client_secret=settings.client_secret,
         redirect_uri=settings.redirect_uri,
+        metadata_cache=(
+            SharedMetadataCache(settings.metadata_cache_path, ttl_s=settings.metadata_cache_ttl_s)
+            if settings.metadata_cache_path
+            else None
+        ),
+        http=http,
+        bulkheads=bulkheads,
+    )
+
+    def apply_credentials(old: Settings, new: Settings) -> None:
+        if (new.client_id, new.client_secret) != (old.client_id, old.client_secret):
+            oidc.set_credentials(new.client_id, new.client_secret)
+
+    live.on_reload(apply_credentials)
+
+    @app.before_request
+    def reload_settings() -> None:
+        _ = live.maybe_reload()
+
+    # Upstream calls that run off the request path (see feide_login_full.background).
+    background = ThreadPoolExecutor(
+        max_workers=_BACKGROUND_WORKERS, thread_name_prefix="login-background"
+    )
+    extended_userinfo_calls: SingleFlight[Mapping[str, object] | None] = SingleFlight(
+        background, ttl_s=_BACKGROUND_RESULT_TTL_S, max_entries=_BACKGROUND_MAX_ENTRIES
+    )
+
+    exchange_prefetch = Counters("started", "hits", "misses", "expired", "discarded", "unclaimed")
+    # A prefetch dropped from here before anyone claimed it was a wasted exchange.
+    exchange_calls: SingleFlight[ExchangedToken] = SingleFlight(
+        background,
+        ttl_s=_BACKGROUND_RESULT_TTL_S,
+        max_entries=_BACKGROUND_MAX_ENTRIES,
+        on_evict=lambda _key, _future: exchange_prefetch.record("unclaimed"),
+    )
+    # Re-exchanges of tokens that are about to expire, coalesced per login.
+    refresh_calls: SingleFlight[ExchangedToken] = SingleFlight(
+        background, ttl_s=_BACKGROUND_RESULT_TTL_S, max_entries=_BACKGROUND_MAX_ENTRIES
     )
+    refresh_counts = Counters("refreshed", "failed")
+    refresh_scheduler = RefreshScheduler() if settings.exchange_refresh_scheduler else None
+
+    index_fragments: TTLCache[str] = TTLCache(
+        max_entries=_INDEX_FRAGMENT_MAX_ENTRIES, max_size=_INDEX_FRAGMENT_MAX_BYTES
+    )
+
+    # Last data source response (ETag, payload) per exchanged token, keyed by token hash.
+    datasource_responses: TTLCache[tuple[str, Any]] = TTLCache(
+        max_entries=_DATASOURCE_ETAG_MAX_ENTRIES, max_size=_DATASOURCE_ETAG_MAX_BYTES
+    )
+
+    pending_logins = (
+        PendingAuthorizationStore(
+            ttl_s=settings.pending_login_ttl_s, max_entries=settings.pending_login_max_entries
+        )
+        if settings.pending_login_store
+        else None
+    )
+
+    login_secrets_pool = (
+        LoginSecretsPool(settings.login_secrets_pool_size)
+        if settings.login_secrets_pool_size > 0
+        else None
+    )
+
+    # Discovery and JWKS survive restarts; session data already lives in the cookie.
+    snapshot = open_snapshot(settings.snapshot, default_secret=settings.app_secret_key)
+    snapshot_restored: int | None = None
+    if snapshot is not None:
+        contents = snapshot.load()
+        if contents is not None:
+            metadata = metadata_from_json(
+                contents.get("metadata"), max_age_s=settings.snapshot.max_age_s
+            )
+            oidc.seed_metadata(metadata)
+            snapshot_restored = len(metadata)
+
+        def save_snapshot() -> None:
+            snapshot.save({"metadata": metadata_to_json(oidc.cached_metadata())})
+
+        save_at_exit(save_snapshot)
+        app.extensions["save_cache_snapshot"] = save_snapshot
+
+    # Pinned documents only fill what the snapshot did not restore.
+    pinned = load_pinned_metadata(
+        discovery_path=settings.pinned_discovery_path, jwks_path=settings.pinned_jwks_path
+    )
+    metadata_refresher: MetadataRefresher | None = None
+    if pinned:
+        oidc.seed_metadata(pinned)
+        metadata_refresher = MetadataRefresher(
+            oidc, interval_s=settings.metadata_refresh_interval_s, pinned=pinned
+        )
+
+    if metadata_refresher is not None:
+
+        @app.before_request
+        def start_metadata_refresh() -> None:
+            metadata_refresher.ensure_running()
+
+    warmup_report: WarmupReport | None = None
+    if settings.warmup_on_start:
+        connect_urls = [settings.extended_userinfo_url]
+        if settings.datasource_api_url:
+            connect_urls.append(settings.datasource_api_url)
+        connect_urls.extend(
+            profile.api_url
+            for profile in settings.token_exchange_profiles.values()
+            if profile.api_url
+        )
+        warmup_report = warm_up(oidc, connect_urls=connect_urls)
+
+    def run_token_exchange(
+        settings: Settings, access_token: str, audience: str, scope: str | None = None
+    ) -> ExchangedToken:
+        # If scope is empty, all available scopes will be requested.
+        response = exchange_access_token_for_jwt(
+            oidc=oidc,
+            access_token=access_token,
+            audience=audience,
+            scope=scope if scope is not None else settings.token_exchange_scope or "",
+        )
+        return ExchangedToken(response=response, obtained_at=time.time())
+
+    def start_profile_exchanges(
+        settings: Settings, access_token: str, names: list[str]
+    ) -> dict[str, Future[ExchangedToken]]:
+        profiles = settings.token_exchange_profiles
+        return {
+            name: background.submit(
+                run_token_exchange,
+                settings,
+                access_token,
+                profiles[name].audience,
+                profiles[name].scope or "",
+            )
+            for name in names
+        }
+
+    def with_profile_tokens(
+        user_dict: dict[str, object], exchanged: Mapping[str, ExchangedToken]
+    ) -> dict[str, object]:
+        # Only what /datasource needs is kept, since the session lives in a cookie.
+        tokens = {
+            **as_mapping(user_dict.get("exchanged_tokens")),
+            **{
+                name: {
+                    "access_token": token.response.access_token,
+                    "expires_at": token.expires_at,
+                }
+                for name, token in exchanged.items()
+            },
+        }
+        user = {
+            **user_dict,
+            "exchanged_tokens": tokens,
+            "render_version": secrets.token_urlsafe(12),
+        }
+        session["user"] = user
+        return user
+
+    def profile_token(
+        settings: Settings, user_dict: dict[str, object], name: str
+    ) -> str | Response:
+        """The session's token for profile ``name``, exchanged now if missing or expiring."""
+        stored = as_mapping(as_mapping(user_dict.get("exchanged_tokens")).get(name))
+        token, expires_at = stored.get("access_token"), stored.get("expires_at")
+        min_remaining_s = max(settings.exchange_refresh_window_s, _EXCHANGE_MIN_REMAINING_S)
+        if (
+            isinstance(token, str)
+            and isinstance(expires_at, int | float)
+            and expires_at - time.time() > min_remaining_s
+        ):
+            return token
+        access_token = _require_token(
+            user_dict,
+            key="feide_access_token",
+            title="Missing access token",
+            message="Missing Feide access token in session.",
+        )
+        if isinstance(access_token, Response):
+            return access_token
+        profile = settings.token_exchange_profiles[name]
+        # A single exchange runs inline; the background pool would only add queueing.
+        try:
+            exchanged = run_token_exchange(
+                settings, access_token, profile.audience, profile.scope or ""
+            )
+        except (OIDCError, requests.RequestException, ConcurrencyLimitExceeded) as exc:
+            return html_page(
+                "Token exchange error",
+                f"<p>{exc}</p><p><a href='/'>Return home</a></p>",
+                status=HTTPStatus.BAD_GATEWAY,
+            )
+        _ = with_profile_tokens(user_dict, {name: exchanged})
+        return exchanged.response.access_token
+
+    def take_prefetched_exchange(settings: Settings, access_token: str) -> ExchangedToken | None:
+        """Claim the exchange started after login, waiting for it if it is still running."""
+        if not settings.prefetch_token_exchange:
+            return None
+        future = exchange_calls.discard(token_key(access_token))
+        try:
+            exchanged = future.result() if future is not None else None
+        except (OIDCError, requests.RequestException, ConcurrencyLimitExceeded):
+            exchanged = None
+        if exchanged is None:
+            exchange_prefetch.record("misses")
+            return None
+        if exchanged.expires_within(_EXCHANGE_MIN_REMAINING_S):
+            exchange_prefetch.record("expired")
+            return None
+        exchange_prefetch.record("hits")
+        return exchanged
+
+    def with_exchanged_token(
+        settings: Settings, user_dict: dict[str, object], exchanged: ExchangedToken
+    ) -> dict[str, object]:
+        user = {
+            **user_dict,
+            "exchanged_access_token": exchanged.response.access_token,
+            "exchanged_token_type": exchanged.response.token_type,
+            "exchanged_expires_in": exchanged.response.expires_in,
+            "exchanged_expires_at": exchanged.expires_at,
+            "exchanged_scope": exchanged.response.scope,
+            "render_version": secrets.token_urlsafe(12),
+        }
+        session["user"] = user
+        schedule_refresh(settings, user, exchanged.expires_at)
+        return user
+
+    def start_refresh(settings: Settings, access_token: str) -> Future[ExchangedToken] | None:
+        audience = settings.token_exchange_audience
+        if not audience:
+            return None
+        window_s = settings.exchange_refresh_window_s
+        return refresh_calls.submit(
+            token_key(access_token),
+            lambda: run_token_exchange(settings, access_token, audience),
+            # A result still inside the refresh window is not worth reusing.
+            stale=lambda exchanged: exchanged.expires_within(window_s),
+        )
+
+    def schedule_refresh(
+        settings: Settings, user_dict: Mapping[str, object], expires_at: float
+    ) -> None:
+        access_token = user_dict.get("feide_access_token")
+        feide_expires_at = user_dict.get("feide_access_token_expires_at")
+        if refresh_scheduler is None or not isinstance(access_token, str):
+            return
+        due_at = expires_at - settings.exchange_refresh_window_s
+        # The Feide access token is the subject token; it must outlive the refresh.
+        if isinstance(feide_expires_at, int | float) and due_at >= feide_expires_at:
+            return
+        _ = refresh_scheduler.schedule(
+            token_key(access_token), due_at, lambda: start_refresh(live.current, access_token)
+        )
+
+    def refreshed_if_expiring(
+        settings: Settings, user_dict: dict[str, object]
+    ) -> dict[str, object]:
+        """Re-exchange the session's token when it is inside the refresh window."""
+        window_s = settings.exchange_refresh_window_s
+        expires_at = user_dict.get("exchanged_expires_at")
+        access_token = user_dict.get("feide_access_token")
+        feide_expires_at = user_dict.get("feide_access_token_expires_at")
+        now = time.time()
+        if (
+            window_s <= 0
+            or not isinstance(expires_at, int | float)
+            or expires_at - now > window_s
+            or not isinstance(access_token, str)
+            or (isinstance(feide_expires_at, int | float) and feide_expires_at <= now)
+        ):
+            return user_dict
+        future = start_refresh(settings, access_token)
+        try:
+            exchanged = future.result() if future is not None else None
+        except (OIDCError, requests.RequestException, ConcurrencyLimitExceeded):
+            exchanged = None
+        if exchanged is None or exchanged.expires_at <= expires_at:
+            # Keep the current token; it may still be valid for the remaining window.
+            refresh_counts.record("failed")
+            return user_dict
+        refresh_counts.record("refreshed")
+        return with_exchanged_token(settings, user_dict, exchanged)
+
+    def start_extended_userinfo(
+        settings: Settings, access_token: str
+    ) -> Future[Mapping[str, object] | None]:
+        return extended_userinfo_calls.submit(
+            token_key(access_token),
+            lambda: fetch_extended_userinfo(
+                oidc=oidc,
+                access_token=access_token,
+                extended_userinfo_url=settings.extended_userinfo_url,
+            ),
+        )
+
+    def resolve_extended_userinfo(
+        settings: Settings, user_dict: dict[str, object]
+    ) -> dict[str, object] | None:
+        """Session user data with extended userinfo filled in, or None while still loading."""
+        access_token = user_dict.get("feide_access_token")
+        extended: Mapping[str, object] | None = None
+        if isinstance(access_token, str) and access_token:
+            future = start_extended_userinfo(settings, access_token)
+            try:
+                extended = future.result(timeout=settings.extended_userinfo_timeout_s)
+            except FutureTimeoutError:
+                return None
+            except requests.RequestException:
+                extended = None
+            _ = extended_userinfo_calls.discard(token_key(access_token))
+        return {
+            **user_dict,
+            "extended_userinfo": dict(extended) if extended is not None else None,
+            "extended_userinfo_pending": False,
+            "render_version": secrets.token_urlsafe(12),
+        }
+
+    def render_user(user_dict: dict[str, object], *, loading: bool = False) -> str:
+        # The version is restamped whenever the user data in the session is rewritten.
+        # Only the token-free part of the page is cached; the tokens are rendered per request.
+        version = user_dict.get("render_version") if not loading else None
+        details = index_fragments.get(version) if isinstance(version, str) else None
+        if details is None:
+            details = render_user_details(
+                id_token_claims=as_mapping(user_dict.get("id_token_claims")),
+                oidc_userinfo=as_mapping(user_dict.get("oidc_userinfo")),
+                extended_userinfo=(
+                    {"status": "loading, reload the page to see extended userinfo"}
+                    if loading
+                    else as_mapping(user_dict.get("extended_userinfo"))
+                ),
+            )
+            if isinstance(version, str):
+                _ = index_fragments.set(
+                    version, details, ttl_s=_INDEX_FRAGMENT_TTL_S, size=len(details)
+                )
+        sub_value = user_dict.get("sub")
+        sub = sub_value if isinstance(sub_value, str) else "unknown"
+        access_token_value = user_dict.get("feide_access_token")
+        access_token = access_token_value if isinstance(access_token_value, str) else ""
+        access_expires = user_dict.get("feide_access_token_expires_in")
+        exchanged_access_token = user_dict.get("exchanged_access_token") or ""
+        exchanged_expires = user_dict.get("exchanged_expires_in")
+        return render_index_page(
+            sub=sub,
+            access_token=access_token,
+            access_expires=access_expires,
+            exchanged_access_token=(
+                exchanged_access_token if isinstance(exchanged_access_token, str) else ""
+            ),
+            exchanged_expires=exchanged_expires,
+            user_details=details,
+        )
 
     @app.get("/")
     def index() -> str:
         # Step 6 (post-login): landing page shows current session info and demo actions.
+        settings = live.current
         user = session.get("user")
         if isinstance(user, dict):
             user_dict = cast(dict[str, object], user)
-            sub_value = user_dict.get("sub")
-            sub = sub_value if isinstance(sub_value, str) else "unknown"
-            id_token_claims = as_mapping(user_dict.get("id_token_claims"))
-            oidc_userinfo = as_mapping(user_dict.get("oidc_userinfo"))
-            extended_userinfo = as_mapping(user_dict.get("extended_userinfo"))
-            access_token_value = user_dict.get("feide_access_token")
-            access_token = access_token_value if isinstance(access_token_value, str) else ""
-            access_expires = user_dict.get("feide_access_token_expires_in")
-            exchanged_access_token = user_dict.get("exchanged_access_token") or ""
-            exchanged_expires = user_dict.get("exchanged_expires_in")
-            return render_index_page(
-                sub=sub,
-                id_token_claims=id_token_claims,
-                oidc_userinfo=oidc_userinfo,
-                extended_userinfo=extended_userinfo,
-                access_token=access_token,
-                access_expires=access_expires,
-                exchanged_access_token=(
-                    exchanged_access_token if isinstance(exchanged_access_token, str) else ""
-                ),
-                exchanged_expires=exchanged_expires,
-            )
+            if user_dict.get("extended_userinfo_pending"):
+                # Deferred extended userinfo (background or lazy mode): use it once ready.
+                resolved = resolve_extended_userinfo(settings, user_dict)
+                if resolved is None:
+                    return render_user(user_dict, loading=True)
+                session["user"] = user_dict = resolved
+            return render_user(user_dict)
         return "<a href='/login'>Log in with Feide</a>"
 
     @app.get("/login")
     def login():
         # Step 1: start authorization code + PKCE by redirecting to Feide.
-        verifier, challenge = generate_pkce()
-        state = secrets.token_urlsafe(16)
-        nonce = secrets.token_urlsafe(16)
+        settings = live.current
+        login_secrets = (
+            login_secrets_pool.take()
+            if login_secrets_pool is not None
+            else generate_login_secrets()
+        )
+        verifier, challenge = login_secrets.verifier, login_secrets.challenge
+        state, nonce = login_secrets.state, login_secrets.nonce
 
-        session["pkce_verifier"] = verifier
-        session["state"] = state
-        session["nonce"] = nonce
+        if pending_logins is not None:
+            # Only the first login from a browser writes the session; later ones reuse its id.
+            browser = session.get("auth_browser")
+            if not isinstance(browser, str):
+                browser = secrets.token_urlsafe(16)
+                session["auth_browser"] = browser
+            pending_logins.put(
+                state,
+                PendingAuthorization(
+                    verifier=verifier,
+                    nonce=nonce,
+                    browser=browser,
+                    return_to=safe_return_to(request.args.get("next")),
+                ),
+            )
+        else:
+            session["pkce_verifier"] = verifier
+            session["state"] = state
+            session["nonce"] = nonce
 
         try:
             request_url = build_authorization_url(
@@ -141,7 +602,21 @@ def create_app(settings: Settings) -> Flask:
     @app.get("/callback")
     def callback():
         # Step 2: handle Feide redirect, exchange code for tokens, validate ID token.
-        if request.args.get("state") != session.get("state"):
+        settings = live.current
+        return_to: str | None = None
+        if pending_logins is not None:
+            state = request.args.get("state")
+            pending = pending_logins.consume(state) if state else None
+            if pending is None or pending.browser != session.get("auth_browser"):
+                return html_page(
+                    "Invalid state",
+                    "<p>Unknown or expired login attempt.</p><p><a href='/'>Return home</a></p>",
+                    status=HTTPStatus.BAD_REQUEST,
+                )
+            stored_verifier: object = pending.verifier
+            stored_nonce: object = pending.nonce
+            return_to = pending.return_to
+        elif request.args.get("state") != session.get("state"):
             print(
                 "state mismatch",
                 {
@@ -154,6 +629,9 @@ def create_app(settings: Settings) -> Flask:
                 "<p>Invalid state in callback.</p><p><a href='/'>Return home</a></p>",
                 status=HTTPStatus.BAD_REQUEST,
             )
+        else:
+            stored_verifier = session.get("pkce_verifier")
+            stored_nonce = session.get("nonce")
 
         code = request.args.get("code")
         if not code:
@@ -163,7 +641,7 @@ def create_app(settings: Settings) -> Flask:
                 status=HTTPStatus.BAD_REQUEST,
             )
 
-        verifier = session.get("pkce_verifier")
+        verifier = stored_verifier
         if not isinstance(verifier, str) or not verifier:
             return html_page(
                 "Missing PKCE verifier",
@@ -171,7 +649,7 @@ def create_app(settings: Settings) -> Flask:
                 status=HTTPStatus.BAD_REQUEST,
             )
 
-        expected_nonce = session.get("nonce")
+        expected_nonce = stored_nonce
         if not isinstance(expected_nonce, str) or not expected_nonce:
             return html_page(
                 "Missing nonce",
@@ -205,6 +683,9 @@ def create_app(settings: Settings) -> Flask:
                 expected_nonce=expected_nonce,
             )
         except (OIDCError, IDTokenValidationError) as exc:
+            if metadata_refresher is not None:
+                # Possibly signed with a key newer than the cached JWKS.
+                metadata_refresher.request_refresh()
             return html_page(
                 "Invalid ID token",
                 f"<p>{exc}</p><p><a href='/'>Return home</a></p>",
@@ -221,26 +702,50 @@ def create_app(settings: Settings) -> Flask:
                 status=HTTPStatus.BAD_GATEWAY,
             )
 
-        # Fetch extended userinfo (user directory attributes).
-        extended = fetch_extended_userinfo(
-            oidc=oidc,
-            access_token=token_response.access_token,
-            extended_userinfo_url=settings.extended_userinfo_url,
-        )
+        # Fetch extended userinfo (user directory attributes), unless it is deferred until
+        # the index page needs it (optionally started in the background right away).
+        extended: Mapping[str, object] | None = None
+        if settings.extended_userinfo_mode == "eager":
+            extended = fetch_extended_userinfo(
+                oidc=oidc,
+                access_token=token_response.access_token,
+                extended_userinfo_url=settings.extended_userinfo_url,
+            )
+        elif settings.extended_userinfo_mode == "background":
+            _ = start_extended_userinfo(settings, token_response.access_token)
 
+        browser = session.get("auth_browser")
         session.clear()
+        if browser is not None:
+            # Keep the browser binding so logins started in other tabs can still complete.
+            session["auth_browser"] = browser
         session["user"] = {
             "sub": id_claims.sub,
             "id_token_claims": dict(id_claims.raw),
             "oidc_userinfo": dict(oidc_userinfo),
             "extended_userinfo": dict(extended) if extended is not None else None,
+            "extended_userinfo_pending": settings.extended_userinfo_mode != "eager",
             # Keep the access token available for demo routes.
             # In a real application, store it securely.
             "feide_access_token": token_response.access_token,
             "feide_access_token_expires_in": token_response.expires_in,
+            "feide_access_token_expires_at": time.time() + token_response.expires_in,
+            "render_version": secrets.token_urlsafe(12),
         }
         session["id_token_hint"] = token_response.id_token
 
+        if settings.prefetch_token_exchange and settings.token_exchange_audience:
+            # Speculatively exchange now so /exchange and /datasource find a token ready.
+            audience = settings.token_exchange_audience
+            access_token = token_response.access_token
+            _ = exchange_calls.submit(
+                token_key(access_token),
+                lambda: run_token_exchange(settings, access_token, audience),
+            )
+            exchange_prefetch.record("started")
+
+        if return_to is not None:
+            return redirect(return_to)
         return html_page(
             "Login complete",
             "<p>You are logged in.</p>",
@@ -249,6 +754,7 @@ def create_app(settings: Settings) -> Flask:
     @app.get("/exchange")
     def exchange():
         # Optional step: exchange the opaque access token for a JWT access token.
+        settings = live.current
         user_dict_or_response = _require_logged_in_user()
         if isinstance(user_dict_or_response, Response):
             return user_dict_or_response
@@ -264,78 +770,185 @@ def create_app(settings: Settings) -> Flask:
         access_token = access_token_or_response
 
         exchange_audience = settings.token_exchange_audience
-        if not exchange_audience:
+        profile_names = list(settings.token_exchange_profiles)
+        if not exchange_audience and not profile_names:
             return html_page(
                 "Token exchange not configured",
-                "<p>Set FEIDE_TOKEN_EXCHANGE_AUDIENCE.</p>" "<p><a href='/'>Return home</a></p>",
+                "<p>Set FEIDE_TOKEN_EXCHANGE_AUDIENCE or FEIDE_TOKEN_EXCHANGE_PROFILES.</p>"
+                "<p><a href='/'>Return home</a></p>",
                 status=HTTPStatus.BAD_REQUEST,
             )
-        # If scope is empty, all available scopes will be requested.
-        exchange_scope = settings.token_exchange_scope or ""
+        # Profile exchanges run concurrently with each other and with the default one.
+        profile_calls = start_profile_exchanges(settings, access_token, profile_names)
 
-        try:
-            exchanged = exchange_access_token_for_jwt(
-                oidc=oidc,
-                access_token=access_token,
-                audience=exchange_audience,
-                scope=exchange_scope,
-            )
-        except OIDCError as exc:
+        exchanged: ExchangedToken | None = None
+        error: Exception | None = None
+        if exchange_audience:
+            exchanged = take_prefetched_exchange(settings, access_token)
+            if exchanged is None:
+                try:
+                    exchanged = run_token_exchange(settings, access_token, exchange_audience)
+                except (OIDCError, requests.RequestException, ConcurrencyLimitExceeded) as exc:
+                    error = exc
+
+        profile_results: dict[str, ExchangedToken] = {}
+        profile_errors: dict[str, str] = {}
+        for name, future in profile_calls.items():
+            try:
+                profile_results[name] = future.result()
+            except (OIDCError, requests.RequestException, ConcurrencyLimitExceeded) as exc:
+                profile_errors[name] = str(exc)
+
+        if profile_results:
+            user_dict = with_profile_tokens(user_dict, profile_results)
+        if error is not None and not profile_results:
             return html_page(
                 "Token exchange error",
-                f"<p>{exc}</p><p><a href='/'>Return home</a></p>",
+                f"<p>{error}</p><p><a href='/'>Return home</a></p>",
                 status=HTTPStatus.BAD_GATEWAY,
             )
 
-        session["user"] = {
-            **user_dict,
-            "exchanged_access_token": exchanged.access_token,
-            "exchanged_token_type": exchanged.token_type,
-            "exchanged_expires_in": exchanged.expires_in,
-            "exchanged_scope": exchanged.scope,
-        }
-
+        result: dict[str, object] = {}
+        if exchanged is not None:
+            _ = with_exchanged_token(settings, user_dict, exchanged)
+            result = {
+                "access_token": exchanged.response.access_token,
+                "token_type": exchanged.response.token_type,
+                "expires_in": exchanged.response.expires_in,
+                "scope": exchanged.response.scope,
+            }
+        elif error is not None:
+            # Still show the profile tokens that were obtained.
+            result["error"] = str(error)
+        if profile_calls:
+            result["profiles"] = {
+                **{
+                    name: {
+                        "access_token": token.response.access_token,
+                        "token_type": token.response.token_type,
+                        "expires_in": token.response.expires_in,
+                        "scope": token.response.scope,
+                    }
+                    for name, token in profile_results.items()
+                },
+                **{name: {"error": message} for name, message in profile_errors.items()},
+            }
+        result["note"] = "This access token is expected to be JWT-based (after token exchange)."
         return render_json_page(
             "Token exchange result",
-            {
-                "access_token": exchanged.access_token,
-                "token_type": exchanged.token_type,
-                "expires_in": exchanged.expires_in,
-                "scope": exchanged.scope,
-                "note": "This access token is expected to be JWT-based (after token exchange).",
-            },
+            result,
+            status=(
+                HTTPStatus.BAD_GATEWAY
+                if exchanged is None and not profile_results
+                else HTTPStatus.OK
+            ),
         )
 
+    def datasource_get(url: str, **kwargs: Any) -> requests.Response:
+        # Pooled connections when HTTP_POOL_MAXSIZE is set, as for the OIDC client.
+        return http.get(url, **kwargs) if http is not None else requests.get(url, **kwargs)
+
+    def stream_datasource(
+        settings: Settings, url: str, exchanged_token: str, *, raw: bool
+    ) -> Response:
+        """Relay the data source response without buffering or parsing it.
+
+        ``raw`` forwards the status, selected headers and the still-encoded body; otherwise
+        the decoded body is streamed into an HTML page.
+        """
+        headers = {"Authorization": f"Bearer {exchanged_token}"}
+        if raw:
+            # Let the client negotiate, so compressed bodies pass through untouched.
+            headers["Accept-Encoding"] = request.headers.get("Accept-Encoding", "identity")
+            if_none_match = request.headers.get("If-None-Match")
+            if if_none_match:
+                headers["If-None-Match"] = if_none_match
+        # The bulkhead slot covers the request up to the response headers.
+        with bulkheads.call("datasource") if bulkheads is not None else nullcontext():
+            resp = datasource_get(
+                url, headers=headers, timeout=settings.datasource_timeout_s, stream=True
+            )
+        if raw:
+            forwarded = {
+                name: resp.headers[name] for name in _PASSTHROUGH_HEADERS if name in resp.headers
+            }
+            response = Response(
+                resp.raw.stream(_DATASOURCE_CHUNK_BYTES, decode_content=False),
+                status=resp.status_code,
+                headers=forwarded,
+            )
+        else:
+            ok = resp.status_code == HTTPStatus.OK
+            response = stream_text_page(
+                "Data source response" if ok else f"Data source error (status {resp.status_code})",
+                _decode_chunks(
+                    resp.iter_content(_DATASOURCE_CHUNK_BYTES), resp.encoding or "utf-8"
+                ),
+                status=HTTPStatus.OK if ok else HTTPStatus.BAD_GATEWAY,
+            )
+        _ = response.call_on_close(resp.close)
+        return response
+
     @app.get("/datasource")
     def datasource():
         # Optional step: call the data source API with the exchanged JWT access token.
+        settings = live.current
         user_dict_or_response = _require_logged_in_user()
         if isinstance(user_dict_or_response, Response):
             return user_dict_or_response
         user_dict = user_dict_or_response
-        exchanged_token_or_response = _require_token(
-            user_dict,
-            key="exchanged_access_token",
-            title="Missing exchanged token",
-            message="Missing exchanged access token. Call /exchange first.",
-        )
+        target = request.args.get("target")
+        api_url = settings.datasource_api_url
+        if target is not None:
+            profile = settings.token_exchange_profiles.get(target)
+            if profile is None:
+                return html_page(
+                    "Unknown data source",
+                    "<p>No token exchange profile with that name.</p>"
+                    "<p><a href='/'>Return home</a></p>",
+                    status=HTTPStatus.NOT_FOUND,
+                )
+            api_url = profile.api_url or api_url
+            exchanged_token_or_response = profile_token(settings, user_dict, target)
+        else:
+            feide_access_token = user_dict.get("feide_access_token")
+            if "exchanged_access_token" not in user_dict and isinstance(feide_access_token, str):
+                prefetched = take_prefetched_exchange(settings, feide_access_token)
+                if prefetched is not None:
+                    user_dict = with_exchanged_token(settings, user_dict, prefetched)
+            user_dict = refreshed_if_expiring(settings, user_dict)
+            exchanged_token_or_response = _require_token(
+                user_dict,
+                key="exchanged_access_token",
+                title="Missing exchanged token",
+                message="Missing exchanged access token. Call /exchange first.",
+            )
         if isinstance(exchanged_token_or_response, Response):
             return exchanged_token_or_response
         exchanged_token = exchanged_token_or_response
 
-        if not settings.datasource_api_url:
+        if not api_url:
             return html_page(
                 "Data source URL not configured",
                 "<p>DATASOURCE_API_URL is not configured.</p>",
                 status=HTTPStatus.INTERNAL_SERVER_ERROR,
             )
 
-        url = settings.datasource_api_url.rstrip("/") + "/me"
-        resp = requests.get(
-            url,
-            headers={"Authorization": f"Bearer {exchanged_token}"},
-            timeout=5.0,
-        )
+        url = api_url.rstrip("/") + "/me"
+        if request.args.get("raw") == "1" or settings.datasource_passthrough:
+            return stream_datasource(
+                settings, url, exchanged_token, raw=request.args.get("raw") == "1"
+            )
+        headers = {"Authorization": f"Bearer {exchanged_token}"}
+        # Revalidate the previous response for this token instead of downloading it again.
+        etag_key = hashlib.sha256(exchanged_token.encode("utf-8")).hexdigest()
+        previous = datasource_responses.get(etag_key)
+        if previous is not None:
+            headers["If-None-Match"] = previous[0]
+        with bulkheads.call("datasource") if bulkheads is not None else nullcontext():
+            resp = datasource_get(url, headers=headers, timeout=settings.datasource_timeout_s)
+        if resp.status_code == HTTPStatus.NOT_MODIFIED and previous is not None:
+            return render_json_page("Data source response", previous[1])
         if resp.status_code != HTTPStatus.OK:
             return html_page(
                 "Data source error",
@@ -353,11 +966,17 @@ def create_app(settings: Settings) -> Flask:
                 status=HTTPStatus.BAD_GATEWAY,
             )
 
+        etag = resp.headers.get("ETag")
+        if etag:
+            _ = datasource_responses.set(
+                etag_key, (etag, payload), ttl_s=_DATASOURCE_ETAG_TTL_S, size=len(resp.content)
+            )
         return render_json_page("Data source response", payload)
 
     @app.get("/logout")
     def logout():
         # Optional step: end session locally and initiate Feide logout.
+        settings = live.current
         try:
             end_session_endpoint = oidc.discover_configuration().end_session_endpoint
         except OIDCError as exc:
@@ -367,6 +986,16 @@ def create_app(settings: Settings) -> Flask:
                 status=HTTPStatus.INTERNAL_SERVER_ERROR,
             )
         id_token_hint = session.get("id_token_hint")
+        user = session.get("user")
+        if isinstance(user, dict):
+            user_dict = cast(dict[str, object], user)
+            feide_access_token = user_dict.get("feide_access_token")
+            if isinstance(feide_access_token, str):
+                if exchange_calls.discard(token_key(feide_access_token)) is not None:
+                    exchange_prefetch.record("discarded")
+            render_version = user_dict.get("render_version")
+            if isinstance(render_version, str):
+                _ = index_fragments.pop(render_version)
         session.clear()
         if not end_session_endpoint:
             return html_page(
@@ -386,6 +1015,63 @@ def create_app(settings: Settings) -> Flask:
         logout_url = f"{end_session_endpoint}?{urlencode(params)}"
         return redirect(logout_url)
 
+    @app.get("/healthz")
+    def healthz() -> Response:
+        payload = {
+            "status": "ok",
+            "metadata": oidc.metadata_status(),
+            "warmup": asdict(warmup_report) if warmup_report is not None else None,
+            "metadata_refresh": (
+                asdict(metadata_refresher.status()) if metadata_refresher is not None else None
+            ),
+        }
+        return Response(json.dumps(payload, sort_keys=True), mimetype="application/json")
+
+    @app.get("/metrics")
+    def metrics() -> Response:
+        settings = live.current
+        stats = bulkheads.stats() if bulkheads is not None else {}
+        # Expiry is otherwise lazy: count prefetches that timed out unclaimed.
+        _ = exchange_calls.purge_expired()
+        payload = {
+            "bulkheads": {name: asdict(item) for name, item in stats.items()},
+            "index_fragments": asdict(index_fragments.stats()),
+            "token_exchange_prefetch": (
+                exchange_prefetch.stats() if settings.prefetch_token_exchange else None
+            ),
+            "token_refresh": {
+                **refresh_counts.stats(),
+                "scheduler": (
+                    asdict(refresh_scheduler.stats()) if refresh_scheduler is not None else None
+                ),
+            },
+            "login_secrets_pool": (
+                asdict(login_secrets_pool.stats()) if login_secrets_pool is not None else None
+            ),
+            "snapshot_restored": snapshot_restored,
+            "settings": asdict(live.status()),
+        }
+        return Response(json.dumps(payload, sort_keys=True), mimetype="application/json")
+
+    @app.errorhandler(ConcurrencyLimitExceeded)
+    def upstream_saturated(exc: ConcurrencyLimitExceeded) -> Response:
+        resp = html_page(
+            "Service busy",
+            f"<p>{exc}. Please try again shortly.</p><p><a href='/'>Return home</a></p>",
+            status=HTTPStatus.SERVICE_UNAVAILABLE,
+        )
+        resp.headers["Retry-After"] = str(max(1, math.ceil(exc.retry_after_s)))
+        return resp
+
+    @app.get("/readyz")
+    def readyz() -> Response:
+        ready, details = readiness(oidc)
+        return Response(
+            json.dumps({"ready": ready, **details}, sort_keys=True),
+            status=HTTPStatus.OK if ready else HTTPStatus.SERVICE_UNAVAILABLE,
+            mimetype="application/json",
+        )
+
     @app.get("/post-logout")
     def post_logout():
         # Final step: user returns here after Feide logout.
@@ -398,11 +1084,34 @@ def create_app(settings: Settings) -> Flask:
     return app
 
 
+def _settings_provider() -> SettingsProvider[Settings]:
+    return create_settings_provider(
+        lambda environ: load_settings(environ=environ),
+        reloadable=RELOADABLE_FIELDS,
+        settings=load_reload_settings(),
+    )
+
+
 def main() -> None:
-    settings = load_settings()
-    app = create_app(settings)
+    # Flask development server; use serve() (or the console script) in production.
+    exit_on_sigterm()
+    provider = _settings_provider()
+    app = create_app(provider.current, settings_provider=provider)
     app.run(host="0.0.0.0", port=8000, debug=False)
 
 
+def serve() -> None:
+    provider = _settings_provider()
+    if provider.current.pending_login_store and provider.current.server.workers > 1:
+        # A callback served by another worker would not find its pending login.
+        raise RuntimeError(
+            "LOGIN_PENDING_STORE keeps pending logins in one process; "
+            "serving it requires SERVER_WORKERS=1"
+        )
+    run_server(
+        lambda: create_app(provider.current, settings_provider=provider), provider.current.server
+    )
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,169 @@
+"""Background upstream calls for the login flow, with single-flight coalescing.
+
+Work is keyed (typically by a hash of the user's Feide access token): submitting a
+key that already has a pending or usable result returns the existing future instead
+of starting another upstream call. Results are kept for a bounded time and count.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import heapq
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Executor, Future
+from dataclasses import dataclass
+from typing import Generic, TypeVar
+
+from feide_login_core.oidc_models import TokenExchangeResponse
+from feide_login_core.ttl_cache import TTLCache
+
+T = TypeVar("T")
+
+
+def token_key(token: str) -> str:
+    """Stable, non-reversible key for per-login background work."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class SingleFlight(Generic[T]):
+    def __init__(
+        self,
+        executor: Executor,
+        *,
+        ttl_s: float,
+        max_entries: int,
+        on_evict: Callable[[str, Future[T]], None] | None = None,
+    ) -> None:
+        """``on_evict`` sees futures dropped for age or space before anyone discarded them."""
+        self._executor = executor
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._futures: TTLCache[Future[T]] = TTLCache(max_entries=max_entries, on_evict=on_evict)
+
+    def submit(
+        self, key: str, fn: Callable[[], T], *, stale: Callable[[T], bool] | None = None
+    ) -> Future[T]:
+        """Return the future for ``key``, starting ``fn`` only if there is none to reuse.
+
+        Failed results, and finished results for which ``stale`` returns True, are
+        replaced by a new call; callers racing on the same key share that call.
+        """
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None and not self._reusable(future, stale):
+                future = None
+            if future is None:
+                future = self._executor.submit(fn)
+                _ = self._futures.set(key, future, ttl_s=self.ttl_s)
+            return future
+
+    def peek(self, key: str) -> Future[T] | None:
+        return self._futures.get(key)
+
+    def discard(self, key: str) -> Future[T] | None:
+        with self._lock:
+            return self._futures.pop(key)
+
+    def purge_expired(self) -> int:
+        return self._futures.purge_expired()
+
+    @staticmethod
+    def _reusable(future: Future[T], stale: Callable[[T], bool] | None) -> bool:
+        if not future.done():
+            return True
+        if future.exception() is not None:
+            return False
+        return stale is None or not stale(future.result())
+
+
+@dataclass(frozen=True)
+class ExchangedToken:
+    """A token exchange result with the wall-clock time it was obtained."""
+
+    response: TokenExchangeResponse
+    obtained_at: float
+
+    @property
+    def expires_at(self) -> float:
+        return self.obtained_at + self.response.expires_in
+
+    def expires_within(self, seconds: float) -> bool:
+        return time.time() + seconds >= self.expires_at
+
+
+class Counters:
+    """Thread-safe named event counters, reported as a plain mapping."""
+
+    def __init__(self, *names: str) -> None:
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(names, 0)
+
+    def record(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+@dataclass(frozen=True)
+class SchedulerStats:
+    pending: int
+    fired: int
+    dropped: int
+
+
+class RefreshScheduler:
+    """Runs one callback per key at a given wall-clock time, on a single daemon thread.
+
+    Scheduling a key again replaces its earlier callback. Beyond ``max_pending`` keys
+    new entries are dropped (and counted), so a burst of sessions cannot grow it.
+    """
+
+    def __init__(self, *, max_pending: int = 10_000) -> None:
+        self.max_pending = max_pending
+        self._cond = threading.Condition()
+        self._heap: list[tuple[float, int, str]] = []
+        self._due: dict[str, tuple[int, Callable[[], object]]] = {}
+        self._seq = 0
+        self._fired = 0
+        self._dropped = 0
+        self._thread: threading.Thread | None = None
+
+    def schedule(self, key: str, due_at: float, fn: Callable[[], object]) -> bool:
+        with self._cond:
+            if key not in self._due and len(self._due) >= self.max_pending:
+                self._dropped += 1
+                return False
+            self._seq += 1
+            self._due[key] = (self._seq, fn)
+            heapq.heappush(self._heap, (due_at, self._seq, key))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="token-refresh", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+            return True
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.time():
+                    timeout = self._heap[0][0] - time.time() if self._heap else None
+                    _ = self._cond.wait(timeout)
+                _, seq, key = heapq.heappop(self._heap)
+                current = self._due.get(key)
+                if current is None or current[0] != seq:
+                    continue  # Replaced by a later schedule() for the same key.
+                del self._due[key]
+                self._fired += 1
+            try:
+                _ = current[1]()
+            except Exception:  # pragma: no cover - callbacks report their own failures
+                pass
+
+    def stats(self) -> SchedulerStats:
+        with self._cond:
+            return SchedulerStats(pending=len(self._due), fired=self._fired, dropped=self._dropped)
@@ -6,8 +6,50 @@ these should be supplied by your runtime (Kubernetes secrets, vault, etc.).
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from os import getenv
+import json
+import os
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from typing import cast
+
+from feide_login_core.bulkhead import BulkheadSettings, load_bulkhead_settings
+from feide_login_core.env import env_flag, env_float, env_int
+from feide_login_core.serving import ServerSettings, load_server_settings
+from feide_login_core.snapshot import SnapshotSettings, load_snapshot_settings
+
+_EXTENDED_USERINFO_MODES = frozenset({"eager", "background", "lazy"})
+
+
+@dataclass(frozen=True)
+class ExchangeProfile:
+    """A token exchange target, and the data source API its token is meant for."""
+
+    audience: str
+    # None (or empty) requests all scopes allowed for the audience.
+    scope: str | None = None
+    api_url: str | None = None
+
+
+def parse_exchange_profiles(raw: str) -> dict[str, ExchangeProfile]:
+    """Parse ``{"name": {"audience": ..., "scope": ..., "api_url": ...}, ...}``."""
+    try:
+        data: object = json.loads(raw)
+    except ValueError as exc:
+        raise RuntimeError(f"FEIDE_TOKEN_EXCHANGE_PROFILES is not valid JSON: {exc}") from exc
+    if not isinstance(data, dict):
+        raise RuntimeError("FEIDE_TOKEN_EXCHANGE_PROFILES must be a JSON object")
+    profiles: dict[str, ExchangeProfile] = {}
+    for name, value in cast(dict[str, object], data).items():
+        if not isinstance(value, dict):
+            raise RuntimeError(f"Token exchange profile {name!r} must be a JSON object")
+        entry = cast(dict[str, object], value)
+        audience, scope, api_url = entry.get("audience"), entry.get("scope"), entry.get("api_url")
+        if not isinstance(audience, str) or not audience:
+            raise RuntimeError(f"Token exchange profile {name!r} needs an audience")
+        if not isinstance(scope, str | None) or not isinstance(api_url, str | None):
+            raise RuntimeError(f"Token exchange profile {name!r}: scope and api_url are strings")
+        profiles[name] = ExchangeProfile(audience=audience, scope=scope, api_url=api_url)
+    return profiles
 
 
 @dataclass(frozen=True)
@@ -22,23 +64,113 @@ class Settings:
     token_exchange_scope: str | None
     post_logout_redirect_uri: str | None
     datasource_api_url: str | None
+    # Read timeout for data source API calls (time to connect, and between received bytes).
+    datasource_timeout_s: float = 5.0
+    # Stream the data source response into the page instead of parsing and re-rendering it.
+    datasource_passthrough: bool = False
+    metadata_cache_path: str | None = None
+    metadata_cache_ttl_s: float = 3600.0
+    # Discovery/JWKS files that seed the caches at startup; the live documents then
+    # replace them every metadata_refresh_interval_s (see feide_login_core.pinned_metadata).
+    pinned_discovery_path: str | None = None
+    pinned_jwks_path: str | None = None
+    metadata_refresh_interval_s: float = 300.0
+    warmup_on_start: bool = False
+    http_pool_maxsize: int = 0
+    # "eager" fetches extended userinfo during /callback; "background" starts it there
+    # without waiting, and "lazy" only when the index page first needs it.
+    extended_userinfo_mode: str = "eager"
+    extended_userinfo_timeout_s: float = 2.0
+    # Additional named exchange targets, exchanged concurrently by /exchange and
+    # selected with /datasource?target=<name>.
+    token_exchange_profiles: Mapping[str, ExchangeProfile] = field(
+        default_factory=dict[str, ExchangeProfile]
+    )
+    # Start the token exchange right after login so /exchange and /datasource find it ready.
+    prefetch_token_exchange: bool = False
+    # Re-exchange the JWT access token when it expires within this many seconds (0: never),
+    # on the next /datasource request or, with the scheduler, in the background.
+    exchange_refresh_window_s: float = 0.0
+    exchange_refresh_scheduler: bool = False
+    # Server-side pending logins keyed by state (see feide_login_full.pending_auth).
+    pending_login_store: bool = False
+    pending_login_ttl_s: float = 600.0
+    pending_login_max_entries: int = 10_000
+    # Pre-generated PKCE/state/nonce tuples for login spikes; 0 generates inline.
+    login_secrets_pool_size: int = 0
+    # Encrypted cache snapshot written on exit and restored on start (see feide_login_core.snapshot).
+    snapshot: SnapshotSettings = SnapshotSettings()
+    bulkheads: BulkheadSettings = BulkheadSettings()
+    server: ServerSettings = field(default_factory=lambda: ServerSettings(port=8000))
 
 
-def load_settings() -> Settings:
-    issuer = getenv("FEIDE_ISSUER", "https://auth.dataporten.no")
-    client_id = getenv("OIDC_CLIENT_ID", "")
-    client_secret = getenv("OIDC_CLIENT_SECRET", "")
-    redirect_uri = getenv("OIDC_REDIRECT_URI", "")
-    app_secret_key = getenv("APP_SECRET_KEY", "")
+# Fields read per request, which a settings reload can change in a running process
+# (see feide_login_core.settings_reload). The rest configure objects built at startup.
+RELOADABLE_FIELDS = frozenset(
+    {
+        "client_id",
+        "client_secret",
+        "extended_userinfo_url",
+        "token_exchange_audience",
+        "token_exchange_scope",
+        "post_logout_redirect_uri",
+        "datasource_api_url",
+        "datasource_timeout_s",
+        "datasource_passthrough",
+        "extended_userinfo_mode",
+        "extended_userinfo_timeout_s",
+        "token_exchange_profiles",
+        "prefetch_token_exchange",
+        "exchange_refresh_window_s",
+    }
+)
 
-    extended_userinfo_url = getenv(
+
+def load_settings(*, environ: Mapping[str, str] | None = None) -> Settings:
+    env = os.environ if environ is None else environ
+    issuer = env.get("FEIDE_ISSUER", "https://auth.dataporten.no")
+    client_id = env.get("OIDC_CLIENT_ID", "")
+    client_secret = env.get("OIDC_CLIENT_SECRET", "")
+    redirect_uri = env.get("OIDC_REDIRECT_URI", "")
+    app_secret_key = env.get("APP_SECRET_KEY", "")
+
+    extended_userinfo_url = env.get(
         "FEIDE_EXTENDED_USERINFO_URL", "https://api.dataporten.no/userinfo/v1/userinfo"
     )
 
-    token_exchange_audience = getenv("FEIDE_TOKEN_EXCHANGE_AUDIENCE") or None
-    token_exchange_scope = getenv("FEIDE_TOKEN_EXCHANGE_SCOPE") or None
-    post_logout_redirect_uri = getenv("POST_LOGOUT_REDIRECT_URI") or None
-    datasource_api_url = getenv("DATASOURCE_API_URL") or None
+    token_exchange_audience = env.get("FEIDE_TOKEN_EXCHANGE_AUDIENCE") or None
+    token_exchange_scope = env.get("FEIDE_TOKEN_EXCHANGE_SCOPE") or None
+    raw_profiles = env.get("FEIDE_TOKEN_EXCHANGE_PROFILES", "").strip()
+    token_exchange_profiles = parse_exchange_profiles(raw_profiles) if raw_profiles else {}
+    post_logout_redirect_uri = env.get("POST_LOGOUT_REDIRECT_URI") or None
+    datasource_api_url = env.get("DATASOURCE_API_URL") or None
+    datasource_timeout_s = env_float("DATASOURCE_API_TIMEOUT_S", 5.0, environ=env)
+    datasource_passthrough = env_flag("DATASOURCE_API_PASSTHROUGH", environ=env)
+
+    metadata_cache_path = env.get("OIDC_METADATA_CACHE_PATH") or None
+    metadata_cache_ttl_s = env_float("OIDC_METADATA_CACHE_TTL_S", 3600.0, environ=env)
+    pinned_discovery_path = env.get("OIDC_PINNED_DISCOVERY_PATH") or None
+    pinned_jwks_path = env.get("OIDC_PINNED_JWKS_PATH") or None
+    metadata_refresh_interval_s = env_float("OIDC_METADATA_REFRESH_INTERVAL_S", 300.0, environ=env)
+    if metadata_cache_path and (pinned_discovery_path or pinned_jwks_path):
+        raise RuntimeError(
+            "OIDC_PINNED_DISCOVERY_PATH/OIDC_PINNED_JWKS_PATH cannot be combined with "
+            "OIDC_METADATA_CACHE_PATH"
+        )
+    warmup_on_start = env_flag("OIDC_WARMUP_ON_START", environ=env)
+    http_pool_maxsize = env_int("HTTP_POOL_MAXSIZE", 0, environ=env)
+    extended_userinfo_mode = env.get("LOGIN_EXTENDED_USERINFO_MODE", "eager").strip().lower()
+    if extended_userinfo_mode not in _EXTENDED_USERINFO_MODES:
+        allowed = ", ".join(sorted(_EXTENDED_USERINFO_MODES))
+        raise RuntimeError(f"LOGIN_EXTENDED_USERINFO_MODE must be one of: {allowed}")
+    extended_userinfo_timeout_s = env_float("LOGIN_EXTENDED_USERINFO_TIMEOUT_S", 2.0, environ=env)
+    prefetch_token_exchange = env_flag("LOGIN_PREFETCH_TOKEN_EXCHANGE", environ=env)
+    exchange_refresh_window_s = env_float("LOGIN_EXCHANGE_REFRESH_WINDOW_S", 0.0, environ=env)
+    exchange_refresh_scheduler = env_flag("LOGIN_EXCHANGE_REFRESH_SCHEDULER", environ=env)
+    pending_login_store = env_flag("LOGIN_PENDING_STORE", environ=env)
+    pending_login_ttl_s = env_float("LOGIN_PENDING_TTL_S", 600.0, environ=env)
+    pending_login_max_entries = env_int("LOGIN_PENDING_MAX_ENTRIES", 10_000, environ=env)
+    login_secrets_pool_size = env_int("LOGIN_SECRETS_POOL_SIZE", 0, environ=env)
 
     # Fail early with clear errors. These are required to run the sample.
     missing: list[str] = []
@@ -66,4 +198,26 @@ def load_settings() -> Settings:
         token_exchange_scope=token_exchange_scope,
         post_logout_redirect_uri=post_logout_redirect_uri,
         datasource_api_url=datasource_api_url,
+        datasource_timeout_s=datasource_timeout_s,
+        datasource_passthrough=datasource_passthrough,
+        metadata_cache_path=metadata_cache_path,
+        metadata_cache_ttl_s=metadata_cache_ttl_s,
+        pinned_discovery_path=pinned_discovery_path,
+        pinned_jwks_path=pinned_jwks_path,
+        metadata_refresh_interval_s=metadata_refresh_interval_s,
+        warmup_on_start=warmup_on_start,
+        http_pool_maxsize=http_pool_maxsize,
+        extended_userinfo_mode=extended_userinfo_mode,
+        extended_userinfo_timeout_s=extended_userinfo_timeout_s,
+        token_exchange_profiles=token_exchange_profiles,
+        prefetch_token_exchange=prefetch_token_exchange,
+        exchange_refresh_window_s=exchange_refresh_window_s,
+        exchange_refresh_scheduler=exchange_refresh_scheduler,
+        pending_login_store=pending_login_store,
+        pending_login_ttl_s=pending_login_ttl_s,
+        pending_login_max_entries=pending_login_max_entries,
+        login_secrets_pool_size=login_secrets_pool_size,
+        snapshot=load_snapshot_settings(environ=env),
+        bulkheads=load_bulkhead_settings(environ=env),
+        server=load_server_settings(default_port=8000, environ=env),
     )
@@ -2,13 +2,79 @@
 
 from __future__ import annotations
 
+import functools
 from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Final
+from urllib.parse import quote_plus
 
 import requests
 
+from feide_login_core.concurrency import ConcurrencyLimitExceeded
 from feide_login_core.oidc import OIDCClient, OIDCError
 from feide_login_core.oidc_models import TokenExchangeResponse, TokenResponse
 
+# Placeholders for the per-request values; they only contain URL-safe characters,
+# so encoding leaves them intact and they can be located in the prepared URL.
+_STATE_SLOT: Final[str] = "STATE0PLACEHOLDER"
+_NONCE_SLOT: Final[str] = "NONCE0PLACEHOLDER"
+_CHALLENGE_SLOT: Final[str] = "CHALLENGE0PLACEHOLDER"
+
+
+@dataclass(frozen=True)
+class AuthorizationUrlTemplate:
+    """A prepared authorization URL with slots for state, nonce and code challenge.
+
+    The static parameters are encoded once; ``render`` only concatenates. The output
+    is byte-for-byte what ``requests`` produces for the same parameters.
+    """
+
+    prefix: str
+    after_state: str
+    after_nonce: str
+    suffix: str
+
+    @staticmethod
+    def build(
+        *, authorization_endpoint: str, client_id: str, redirect_uri: str, scope: str
+    ) -> AuthorizationUrlTemplate:
+        params = {
+            "response_type": "code",
+            "client_id": client_id,
+            "redirect_uri": redirect_uri,
+            "scope": scope,
+            "state": _STATE_SLOT,
+            "nonce": _NONCE_SLOT,
+            "code_challenge": _CHALLENGE_SLOT,
+            "code_challenge_method": "S256",
+        }
+        request_url = requests.Request("GET", authorization_endpoint, params=params).prepare().url
+        if not request_url:
+            raise OIDCError("Failed to construct authorization request URL")
+        prefix, rest = request_url.split(_STATE_SLOT)
+        after_state, rest = rest.split(_NONCE_SLOT)
+        after_nonce, suffix = rest.split(_CHALLENGE_SLOT)
+        return AuthorizationUrlTemplate(prefix, after_state, after_nonce, suffix)
+
+    def render(self, *, state: str, nonce: str, challenge: str) -> str:
+        return (
+            f"{self.prefix}{quote_plus(state)}{self.after_state}{quote_plus(nonce)}"
+            f"{self.after_nonce}{quote_plus(challenge)}{self.suffix}"
+        )
+
+
+@functools.lru_cache(maxsize=16)
+def authorization_url_template(
+    authorization_endpoint: str, client_id: str, redirect_uri: str, scope: str
+) -> AuthorizationUrlTemplate:
+    # Keyed by the endpoint from discovery, so a changed endpoint gets a new template.
+    return AuthorizationUrlTemplate.build(
+        authorization_endpoint=authorization_endpoint,
+        client_id=client_id,
+        redirect_uri=redirect_uri,
+        scope=scope,
+    )
+
 
 def build_authorization_url(
     *,
@@ -21,20 +87,8 @@ def build_authorization_url(
     challenge: str,
 ) -> str:
     authz_endpoint = oidc.discover_configuration().authorization_endpoint
-    params = {
-        "response_type": "code",
-        "client_id": client_id,
-        "redirect_uri": redirect_uri,
-        "scope": scope,
-        "state": state,
-        "nonce": nonce,
-        "code_challenge": challenge,
-        "code_challenge_method": "S256",
-    }
-    request_url = requests.Request("GET", authz_endpoint, params=params).prepare().url
-    if not request_url:
-        raise OIDCError("Failed to construct authorization request URL")
-    return request_url
+    template = authorization_url_template(authz_endpoint, client_id, redirect_uri, scope)
+    return template.render(state=state, nonce=nonce, challenge=challenge)
 
 
 def exchange_code_for_tokens(*, oidc: OIDCClient, code: str, code_verifier: str) -> TokenResponse:
@@ -48,12 +102,13 @@ def fetch_userinfo(*, oidc: OIDCClient, access_token: str) -> Mapping[str, objec
 def fetch_extended_userinfo(
     *, oidc: OIDCClient, access_token: str, extended_userinfo_url: str
 ) -> Mapping[str, object] | None:
+    # Optional data: an error or a saturated bulkhead must not fail the login.
     try:
         return oidc.extended_userinfo(
             access_token=access_token,
             extended_userinfo_url=extended_userinfo_url,
         )
-    except OIDCError:
+    except (OIDCError, ConcurrencyLimitExceeded):
         return None
 
 
@@ -0,0 +1,53 @@
+"""Server-side store for authorization requests that are waiting for their callback.
+
+Keyed by ``state``, so several logins from the same browser (tabs, retries) can be
+in flight at once without overwriting each other, and starting a login does not
+rewrite the session cookie. Each entry is bound to a random browser id kept in
+the session, so a ``state`` is only accepted from the browser that started it.
+
+The store is per process: with several server workers it needs sticky sessions,
+or a single worker.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+
+from feide_login_core.ttl_cache import TTLCache
+
+
+@dataclass(frozen=True)
+class PendingAuthorization:
+    verifier: str
+    nonce: str
+    browser: str
+    return_to: str | None = None
+    created_at: float = field(default_factory=time.monotonic)
+
+
+class PendingAuthorizationStore:
+    def __init__(self, *, ttl_s: float = 600.0, max_entries: int = 10_000) -> None:
+        self.ttl_s = ttl_s
+        # Oldest entries are evicted first when the cap is reached.
+        self._pending: TTLCache[PendingAuthorization] = TTLCache(max_entries=max_entries)
+
+    def put(self, state: str, pending: PendingAuthorization) -> None:
+        _ = self._pending.set(state, pending, ttl_s=self.ttl_s)
+
+    def consume(self, state: str) -> PendingAuthorization | None:
+        """Remove and return the entry for ``state``; each state can be used once."""
+        pending = self._pending.pop(state)
+        if pending is None or time.monotonic() - pending.created_at > self.ttl_s:
+            return None
+        return pending
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+
+def safe_return_to(value: str | None) -> str | None:
+    """Accept only local absolute paths as post-login targets (no open redirects)."""
+    if not value or not value.startswith("/") or value.startswith("//") or "\\" in value:
+        return None
+    return value
@@ -4,16 +4,16 @@ from __future__ import annotations
 
 import html
 import json
-from collections.abc import Mapping
+from collections.abc import Iterable, Iterator, Mapping
 from http import HTTPStatus
 from typing import cast
 
 from flask import Response
 
 
-def html_page(title: str, body: str, *, status: int = HTTPStatus.OK) -> Response:
+def _page_head(title: str) -> str:
     home_link = "<p><a href='/'>Return home</a></p>"
-    html = (
+    return (
         "<!doctype html>"
         "<html lang='en'>"
         "<head>"
@@ -22,13 +22,30 @@ def html_page(title: str, body: str, *, status: int = HTTPStatus.OK) -> Response
         "</head>"
         "<body>"
         f"<h1>{title}</h1>"
-        f"{home_link}{body}"
-        "</body>"
-        "</html>"
+        f"{home_link}"
     )
+
+
+_PAGE_TAIL = "</body></html>"
+
+
+def html_page(title: str, body: str, *, status: int = HTTPStatus.OK) -> Response:
+    html = f"{_page_head(title)}{body}{_PAGE_TAIL}"
     return Response(html, status=status, mimetype="text/html")
 
 
+def stream_text_page(title: str, chunks: Iterable[str], *, status: int = HTTPStatus.OK) -> Response:
+    """Like ``html_page`` with a ``<pre>`` body, escaped and sent as the chunks arrive."""
+
+    def generate() -> Iterator[str]:
+        yield f"{_page_head(title)}<pre>"
+        for chunk in chunks:
+            yield html.escape(chunk)
+        yield f"</pre>{_PAGE_TAIL}"
+
+    return Response(generate(), status=status, mimetype="text/html")
+
+
 def render_json_page(
     title: str, data: Mapping[str, object], *, status: int = HTTPStatus.OK
 ) -> Response:
@@ -48,16 +65,28 @@ def as_mapping(value: object) -> Mapping[str, object]:
     return {}
 
 
-def render_index_page(
+def render_user_details(
     *,
-    sub: str,
     id_token_claims: Mapping[str, object],
     oidc_userinfo: Mapping[str, object],
     extended_userinfo: Mapping[str, object],
+) -> str:
+    """The claim and userinfo blocks of the index page; they never contain tokens."""
+    return (
+        render_json_block("ID token claims", id_token_claims)
+        + render_json_block("OIDC userinfo", oidc_userinfo)
+        + render_json_block("Extended userinfo", extended_userinfo)
+    )
+
+
+def render_index_page(
+    *,
+    sub: str,
     access_token: str,
     access_expires: object,
     exchanged_access_token: str,
     exchanged_expires: object,
+    user_details: str,
 ) -> str:
     datasource_link = (
         "<a href='/datasource'>Call datasource</a> "
@@ -76,7 +105,5 @@ def render_index_page(
         f"{datasource_link}"
         "<a href='/logout'>Log out from Feide and app</a> </p>"
         + render_json_block("Access tokens", token_info)
-        + render_json_block("ID token claims", id_token_claims)
-        + render_json_block("OIDC userinfo", oidc_userinfo)
-        + render_json_block("Extended userinfo", extended_userinfo)
+        + user_details
     )
@@ -18,6 +18,7 @@ from jose import jwt
 
 from feide_login_core.oidc_simple import discover_configuration, exchange_code_for_tokens
 from feide_login_core.pkce import generate_pkce
+from feide_login_core.serving import load_server_settings, run_server
 
 
 def create_app() -> Flask:
@@ -114,5 +115,11 @@ def main() -> None:
     app.run(host="0.0.0.0", port=8000, debug=False)
 
 
+def serve() -> None:
+    # The session key is generated in create_app, so workers must share one built app.
+    # Building it opens no connections, which makes preloading safe here.
+    run_server(create_app, load_server_settings(default_port=8000, default_preload_app=True))
+
+
 if __name__ == "__main__":
     main()
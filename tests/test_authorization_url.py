@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import secrets
+
+import pytest
+import requests
+
+from feide_login_core.pkce import generate_pkce
+from feide_login_full.login_flow import AuthorizationUrlTemplate, authorization_url_template
+
+
+def _prepared_url(endpoint: str, *, state: str, nonce: str, challenge: str) -> str | None:
+    # The pre-template implementation of build_authorization_url.
+    params = {
+        "response_type": "code",
+        "client_id": "client id+/",
+        "redirect_uri": "http://localhost:8000/callback",
+        "scope": "openid profile",
+        "state": state,
+        "nonce": nonce,
+        "code_challenge": challenge,
+        "code_challenge_method": "S256",
+    }
+    return requests.Request("GET", endpoint, params=params).prepare().url
+
+
+@pytest.mark.parametrize(
+    "endpoint",
+    [
+        "https://auth.dataporten.no/oauth/authorization",
+        "https://issuer/auth?tenant=a%20b",
+        "http://localhost:9000/påtegning/auth",
+    ],
+)
+@pytest.mark.parametrize(
+    "values",
+    [
+        (secrets.token_urlsafe(16), secrets.token_urlsafe(16), generate_pkce()[1]),
+        ("a b+c/=~", "æøå !*'()", "%41&x=1"),
+    ],
+)
+def test_template_matches_prepared_request_byte_for_byte(
+    endpoint: str, values: tuple[str, str, str]
+) -> None:
+    state, nonce, challenge = values
+    template = AuthorizationUrlTemplate.build(
+        authorization_endpoint=endpoint,
+        client_id="client id+/",
+        redirect_uri="http://localhost:8000/callback",
+        scope="openid profile",
+    )
+    rendered = template.render(state=state, nonce=nonce, challenge=challenge)
+    assert rendered == _prepared_url(endpoint, state=state, nonce=nonce, challenge=challenge)
+
+
+def test_template_is_cached_per_endpoint() -> None:
+    first = authorization_url_template("https://issuer/auth", "cid", "https://app/cb", "openid")
+    again = authorization_url_template("https://issuer/auth", "cid", "https://app/cb", "openid")
+    moved = authorization_url_template("https://issuer/v2/auth", "cid", "https://app/cb", "openid")
+    assert first is again
+    assert moved.prefix.startswith("https://issuer/v2/auth?")
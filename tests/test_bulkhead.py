@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+
+import pytest
+import requests
+
+from feide_login_core.bulkhead import Bulkhead, BulkheadRejected, Bulkheads, BulkheadSettings
+from feide_login_core.oidc import OIDCClient
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _timed_call(bulkhead: Bulkhead, clock: _Clock, duration_s: float) -> None:
+    with bulkhead.call():
+        clock.now += duration_s
+
+
+def test_slow_calls_halve_the_limit_once_per_window() -> None:
+    clock = _Clock()
+    settings = BulkheadSettings(max_concurrent=8, latency_target_s=0.5)
+    bulkhead = Bulkhead("groupinfo", settings, clock=clock)
+
+    _timed_call(bulkhead, clock, 1.0)
+    assert bulkhead.stats().limit == 4
+
+    # A slow call that started before the decrease does not shrink the limit again.
+    with bulkhead.call():
+        clock.now += 1.0
+        _timed_call(bulkhead, clock, 1.0)
+    assert bulkhead.stats().limit == 2
+
+    stats = bulkhead.stats()
+    assert (stats.completed, stats.slow, stats.failures) == (3, 3, 0)
+
+
+def test_fast_calls_grow_the_limit_additively() -> None:
+    clock = _Clock()
+    settings = BulkheadSettings(max_concurrent=4, latency_target_s=0.5)
+    bulkhead = Bulkhead("token", settings, clock=clock)
+    _timed_call(bulkhead, clock, 1.0)
+    assert bulkhead.stats().limit == 2
+
+    for _ in range(2):
+        _timed_call(bulkhead, clock, 0.1)
+    assert bulkhead.stats().limit == 3
+    for _ in range(10):
+        _timed_call(bulkhead, clock, 0.1)
+    assert bulkhead.stats().limit == 4
+
+
+def test_failures_shrink_the_limit_and_are_counted() -> None:
+    settings = BulkheadSettings(max_concurrent=4, min_concurrent=2, latency_target_s=10.0)
+    bulkhead = Bulkhead("jwks", settings)
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            with bulkhead.call():
+                raise requests.ConnectionError("down")
+    stats = bulkhead.stats()
+    assert stats.limit == 2
+    assert stats.failures == 2
+
+
+def test_saturated_bulkhead_rejects_without_affecting_others() -> None:
+    bulkheads = Bulkheads(BulkheadSettings(max_concurrent=1))
+    with bulkheads.call("groupinfo"):
+        with pytest.raises(BulkheadRejected):
+            with bulkheads.call("groupinfo"):
+                pass
+        with bulkheads.call("token"):
+            pass
+    stats = bulkheads.stats()
+    assert stats["groupinfo"].rejected == 1
+    assert stats["token"].completed == 1
+
+
+def test_oidc_client_routes_calls_through_named_bulkheads(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def fake_get(url: str, timeout: float):
+        _ = timeout
+
+        class _Resp:
+            status_code = 200
+            text = "ok"
+
+            def json(self) -> Mapping[str, object]:
+                if url.endswith("/jwks"):
+                    return {"keys": []}
+                return {
+                    "authorization_endpoint": "https://issuer/auth",
+                    "token_endpoint": "https://issuer/token",
+                    "jwks_uri": "https://issuer/jwks",
+                    "userinfo_endpoint": "https://issuer/userinfo",
+                }
+
+        return _Resp()
+
+    monkeypatch.setattr(requests, "get", fake_get)
+    bulkheads = Bulkheads(BulkheadSettings(max_concurrent=2))
+    client = OIDCClient(
+        issuer="https://issuer",
+        client_id="cid",
+        client_secret="secret",
+        redirect_uri="https://app/callback",
+        bulkheads=bulkheads,
+    )
+
+    _ = client.fetch_jwks()
+
+    assert {name: stats.completed for name, stats in bulkheads.stats().items()} == {
+        "discovery": 1,
+        "jwks": 1,
+    }
@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import socketserver
+import threading
+import time
+from collections.abc import Iterator, Mapping
+from typing import BinaryIO
+
+import pytest
+import requests
+
+import feide_data_source_api.app as app_module
+from feide_data_source_api.config import Settings
+from feide_login_core.cache_backend import (
+    CacheBackendError,
+    CacheSettings,
+    InProcessCacheBackend,
+    NearCache,
+    RedisCacheBackend,
+    SharedCache,
+)
+from feide_login_core.oidc_models import TokenExchangeResponse
+
+# A small in-memory server speaking the Redis protocol stands in for Redis.
+
+
+def _read_command(reader: BinaryIO) -> list[bytes] | None:
+    line = reader.readline()
+    if not line:
+        return None
+    assert line.startswith(b"*"), line
+    args: list[bytes] = []
+    for _ in range(int(line[1:-2])):
+        length = int(reader.readline()[1:-2])
+        args.append(reader.read(length + 2)[:-2])
+    return args
+
+
+def _bulk(value: bytes | None) -> bytes:
+    return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, password: str | None = None) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.password = password
+        self.data: dict[bytes, tuple[bytes, float]] = {}
+        self.commands: list[list[bytes]] = []
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        auth = f":{self.password}@" if self.password else ""
+        return f"redis://{auth}{host!s}:{port}/2"
+
+    def execute(self, args: list[bytes], state: dict[str, bool]) -> bytes:
+        name = args[0].upper()
+        with self.lock:
+            self.commands.append(args)
+            if name == b"AUTH":
+                state["authed"] = args[1].decode() == self.password
+                return b"+OK\r\n" if state["authed"] else b"-WRONGPASS invalid password\r\n"
+            if self.password and not state.get("authed"):
+                return b"-NOAUTH Authentication required.\r\n"
+            now = time.monotonic()
+            if name == b"SELECT":
+                return b"+OK\r\n"
+            if name == b"SET":
+                ttl_s = int(args[4]) / 1000 if len(args) > 4 else float("inf")
+                self.data[args[1]] = (args[2], now + ttl_s)
+                return b"+OK\r\n"
+            if name == b"MGET":
+                values = [self.data.get(key) for key in args[1:]]
+                live = [v[0] if v is not None and v[1] > now else None for v in values]
+                return b"*%d\r\n" % len(live) + b"".join(_bulk(v) for v in live)
+            if name == b"DEL":
+                return b":%d\r\n" % int(self.data.pop(args[1], None) is not None)
+        return b"-ERR unknown command\r\n"
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: RespServer
+
+    def handle(self) -> None:
+        with self.server.lock:
+            self.server.connections += 1
+        state: dict[str, bool] = {}
+        while (args := _read_command(self.rfile)) is not None:
+            self.wfile.write(self.server.execute(args, state))
+
+
+def start_resp_server(password: str | None = None) -> RespServer:
+    server = RespServer(password)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def resp_server() -> Iterator[RespServer]:
+    server = start_resp_server()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_redis_backend_round_trip_with_ttl(resp_server: RespServer) -> None:
+    backend = RedisCacheBackend(resp_server.url)
+
+    backend.set_many([("a", b"1"), ("b", b"2")], ttl_s=0.05)
+    assert backend.get_many(["a", "missing", "b"]) == [b"1", None, b"2"]
+    time.sleep(0.1)
+    assert backend.get_many(["a", "b"]) == [None, None]
+
+
+def test_redis_backend_pipelines_and_reuses_connections(resp_server: RespServer) -> None:
+    backend = RedisCacheBackend(resp_server.url)
+
+    backend.set_many([("a", b"1"), ("b", b"2"), ("c", b"3")], ttl_s=60)
+    _ = backend.get_many(["a", "b", "c"])
+    backend.delete("a")
+
+    assert resp_server.connections == 1
+    names = [command[0] for command in resp_server.commands]
+    # SELECT for the /2 database, then one SET per item, one MGET for all keys.
+    assert names == [b"SELECT", b"SET", b"SET", b"SET", b"MGET", b"DEL"]
+
+
+def test_redis_backend_authenticates() -> None:
+    server = start_resp_server(password="s3cret")
+    try:
+        backend = RedisCacheBackend(server.url)
+        backend.set_many([("k", b"v")], ttl_s=60)
+        assert backend.get_many(["k"]) == [b"v"]
+
+        wrong = RedisCacheBackend(server.url.replace("s3cret", "nope"))
+        with pytest.raises(CacheBackendError):
+            _ = wrong.get_many(["k"])
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_shared_cache_hashes_keys_and_degrades_to_misses() -> None:
+    cache = SharedCache(RedisCacheBackend("redis://127.0.0.1:1", timeout_s=0.1), namespace="ns")
+
+    key = cache.key("token-exchange", "secret-token")
+    assert key.startswith("ns:token-exchange:")
+    assert "secret-token" not in key
+    assert cache.get(key) is None
+    cache.set(key, {"a": 1}, ttl_s=60)
+    assert cache.stats().errors == 2
+
+
+def test_near_cache_serves_local_copy_within_ttl(resp_server: RespServer) -> None:
+    remote = RedisCacheBackend(resp_server.url)
+    near = NearCache(remote, ttl_s=60)
+    remote.set_many([("k", b"v1")], ttl_s=60)
+
+    assert near.get_many(["k"]) == [b"v1"]
+    remote.set_many([("k", b"v2")], ttl_s=60)
+    mgets = sum(command[0] == b"MGET" for command in resp_server.commands)
+
+    assert near.get_many(["k"]) == [b"v1"]
+    assert sum(command[0] == b"MGET" for command in resp_server.commands) == mgets
+
+
+def test_in_process_backend() -> None:
+    backend = InProcessCacheBackend()
+    backend.set_many([("k", b"v")], ttl_s=60)
+    assert backend.get_many(["k", "x"]) == [b"v", None]
+    backend.delete("k")
+    assert backend.get_many(["k"]) == [None]
+
+
+class _CountingOIDCClient:
+    def __init__(self) -> None:
+        self.exchanges = 0
+
+    def fetch_jwks(self) -> Mapping[str, object]:
+        return {"keys": []}
+
+    def token_exchange(self, **kwargs: object) -> TokenExchangeResponse:
+        self.exchanges += 1
+        return TokenExchangeResponse(
+            access_token="exchanged", token_type="Bearer", expires_in=3600, scope="readUser"
+        )
+
+    def extended_userinfo(
+        self, *, access_token: str, extended_userinfo_url: str
+    ) -> Mapping[str, object]:
+        return {"sub": "user-1"}
+
+
+def _datasource_settings(url: str, *, me_cache_ttl_s: float) -> Settings:
+    return Settings(
+        issuer="https://issuer",
+        client_id="cid",
+        client_secret="c_sec",
+        datasource_audience="aud",
+        required_scope="readUser",
+        token_exchange_audience="ex-aud",
+        token_exchange_scope="readUser",
+        extended_userinfo_url="https://example/userinfo",
+        groupinfo_url="https://example/groups",
+        me_cache_ttl_s=me_cache_ttl_s,
+        exchange_cache=True,
+        cache=CacheSettings(url=url),
+    )
+
+
+def _patch_upstream(monkeypatch: pytest.MonkeyPatch) -> _CountingOIDCClient:
+    oidc = _CountingOIDCClient()
+    monkeypatch.setattr(app_module, "OIDCClient", lambda **kwargs: oidc)
+    monkeypatch.setattr(
+        app_module,
+        "validate_access_token",
+        lambda **kwargs: {"sub": "user-1", "scope": "readUser", "exp": time.time() + 600},
+    )
+
+    class _Resp:
+        status_code = 200
+        text = "[]"
+
+        def json(self) -> object:
+            return [{"id": "g1"}]
+
+    monkeypatch.setattr(requests, "get", lambda url, headers, timeout: _Resp())
+    return oidc
+
+
+def test_nodes_share_token_exchange_results(
+    monkeypatch: pytest.MonkeyPatch, resp_server: RespServer
+) -> None:
+    oidc = _patch_upstream(monkeypatch)
+    settings = _datasource_settings(resp_server.url, me_cache_ttl_s=0.0)
+    node_a = app_module.create_app(settings).test_client()
+    node_b = app_module.create_app(settings).test_client()
+    headers = {"Authorization": "Bearer subject-token"}
+
+    assert node_a.get("/me", headers=headers).status_code == 200
+    assert node_b.get("/me", headers=headers).status_code == 200
+
+    assert oidc.exchanges == 1
+    stored = [command for command in resp_server.commands if command[0] == b"SET"]
+    assert all(b"subject-token" not in arg for command in stored for arg in command)
+
+
+def test_nodes_share_me_entries(monkeypatch: pytest.MonkeyPatch, resp_server: RespServer) -> None:
+    _ = _patch_upstream(monkeypatch)
+    settings = _datasource_settings(resp_server.url, me_cache_ttl_s=60.0)
+    node_a = app_module.create_app(settings).test_client()
+    node_b = app_module.create_app(settings).test_client()
+    headers = {"Authorization": "Bearer subject-token"}
+
+    first = node_a.get("/me", headers=headers)
+    second = node_b.get("/me", headers=headers)
+
+    assert first.headers["X-Cache"] == "miss"
+    assert second.headers["X-Cache"] == "hit"
+    assert second.get_json() == first.get_json()
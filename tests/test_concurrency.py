@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from feide_login_core.concurrency import ConcurrencyLimiter, ConcurrencyLimitExceeded
+
+
+def test_limiter_rejects_when_full_without_queue() -> None:
+    limiter = ConcurrencyLimiter(1)
+    with limiter.slot():
+        with pytest.raises(ConcurrencyLimitExceeded):
+            with limiter.slot():
+                pass
+    stats = limiter.stats()
+    assert (stats.active, stats.admitted, stats.rejected) == (0, 1, 1)
+
+
+def test_queued_caller_gets_released_slot() -> None:
+    limiter = ConcurrencyLimiter(1, max_queue=1, queue_timeout_s=5.0)
+    assert limiter.try_acquire()
+    results: list[bool] = []
+    waiter = threading.Thread(target=lambda: results.append(limiter.try_acquire()))
+    waiter.start()
+    while limiter.stats().queued == 0:
+        time.sleep(0.001)
+
+    # The queue holds one waiter; the next caller is shed immediately.
+    assert not limiter.try_acquire()
+    limiter.release()
+    waiter.join()
+    assert results == [True]
+
+
+def test_queued_caller_times_out() -> None:
+    limiter = ConcurrencyLimiter(1, max_queue=1, queue_timeout_s=0.01)
+    assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+    assert limiter.stats().rejected == 1
+
+
+def test_raising_limit_wakes_waiters() -> None:
+    limiter = ConcurrencyLimiter(1, max_queue=1, queue_timeout_s=5.0)
+    assert limiter.try_acquire()
+    results: list[bool] = []
+    waiter = threading.Thread(target=lambda: results.append(limiter.try_acquire()))
+    waiter.start()
+    while limiter.stats().queued == 0:
+        time.sleep(0.001)
+    limiter.set_limit(2)
+    waiter.join()
+    assert results == [True]
+    assert limiter.stats().active == 2
@@ -1,6 +1,10 @@
 from __future__ import annotations
 
+import dataclasses
+import gzip
+import time
 from collections.abc import Mapping
+from http import HTTPStatus
 
 import pytest
 import requests
@@ -8,6 +12,9 @@ import requests
 import feide_data_source_api.app as app_module
 from feide_data_source_api.app import create_app
 from feide_data_source_api.config import Settings
+from feide_login_core.bulkhead import BulkheadSettings
+from feide_login_core.concurrency import ConcurrencyLimiter
+from feide_login_core.rate_limit import RateLimit
 
 
 class _FakeOIDCClient:
@@ -122,3 +129,320 @@ def test_me_requires_scope(monkeypatch: pytest.MonkeyPatch) -> None:
     client = app.test_client()
     resp = client.get("/me", headers={"Authorization": "Bearer token"})
     assert resp.status_code == 403
+
+
+def _cached_settings() -> Settings:
+    return Settings(
+        issuer="https://issuer",
+        client_id="cid",
+        client_secret="c_sec",
+        datasource_audience="aud",
+        required_scope="readUser",
+        token_exchange_audience="ex-aud",
+        token_exchange_scope="readUser",
+        extended_userinfo_url="https://example/userinfo",
+        groupinfo_url="https://example/groups",
+        me_cache_ttl_s=60.0,
+    )
+
+
+def _install_counting_upstream(
+    monkeypatch: pytest.MonkeyPatch, claims: dict[str, object]
+) -> list[str]:
+    calls: list[str] = []
+
+    class _CountingOIDCClient(_FakeOIDCClient):
+        def token_exchange(self, **kwargs: object):
+            calls.append("token_exchange")
+            return super().token_exchange(**kwargs)
+
+        def extended_userinfo(
+            self, *, access_token: str, extended_userinfo_url: str
+        ) -> Mapping[str, object]:
+            calls.append("extended_userinfo")
+            return {"sub": "user-1"}
+
+    def fake_get(url: str, headers: Mapping[str, str], timeout: float):
+        calls.append("groupinfo")
+
+        class _Resp:
+            status_code = 200
+            text = "ok"
+
+            def json(self):
+                return [{"id": "g1"}]
+
+        return _Resp()
+
+    monkeypatch.setattr(app_module, "OIDCClient", lambda **kwargs: _CountingOIDCClient())
+    monkeypatch.setattr(app_module, "validate_access_token", lambda **kwargs: claims)
+    monkeypatch.setattr(requests, "get", fake_get)
+    return calls
+
+
+def test_me_cache_serves_repeated_calls_without_upstream(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls = _install_counting_upstream(monkeypatch, {"sub": "user-1", "scope": "readUser"})
+    client = create_app(_cached_settings()).test_client()
+
+    first = client.get("/me", headers={"Authorization": "Bearer token"})
+    second = client.get("/me", headers={"Authorization": "Bearer token"})
+
+    assert first.headers["X-Cache"] == "miss"
+    assert second.headers["X-Cache"] == "hit"
+    assert second.get_json() == first.get_json()
+    assert calls == ["token_exchange", "extended_userinfo", "groupinfo"]
+
+
+def test_me_cache_bypass_header_forces_refresh(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls = _install_counting_upstream(monkeypatch, {"sub": "user-1", "scope": "readUser"})
+    client = create_app(_cached_settings()).test_client()
+
+    _ = client.get("/me", headers={"Authorization": "Bearer token"})
+    resp = client.get("/me", headers={"Authorization": "Bearer token", "Cache-Control": "no-cache"})
+
+    assert resp.headers["X-Cache"] == "bypass"
+    assert calls == ["token_exchange", "extended_userinfo", "groupinfo"] * 2
+
+
+def test_partial_bypass_keeps_the_other_cached_parts(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls = _install_counting_upstream(monkeypatch, {"sub": "user-1", "scope": "readUser"})
+    client = create_app(_cached_settings()).test_client()
+    headers = {"Authorization": "Bearer token"}
+
+    _ = client.get("/me", headers=headers)
+    bypass = client.get("/me?fields=groupinfo", headers={**headers, "Cache-Control": "no-cache"})
+    full = client.get("/me", headers=headers)
+
+    assert bypass.headers["X-Cache"] == "bypass"
+    assert full.headers["X-Cache"] == "hit"
+    assert calls == [
+        "token_exchange",
+        "extended_userinfo",
+        "groupinfo",
+        "token_exchange",
+        "groupinfo",
+    ]
+
+
+def test_me_cache_is_keyed_by_scope_set(monkeypatch: pytest.MonkeyPatch) -> None:
+    claims: dict[str, object] = {"sub": "user-1", "scope": "readUser"}
+    calls = _install_counting_upstream(monkeypatch, claims)
+    client = create_app(_cached_settings()).test_client()
+
+    _ = client.get("/me", headers={"Authorization": "Bearer token"})
+    claims["scope"] = "readUser email"
+    resp = client.get("/me", headers={"Authorization": "Bearer token"})
+
+    assert resp.headers["X-Cache"] == "miss"
+    assert len(calls) == 6
+
+
+def test_me_returns_compact_json_with_etag_and_honors_if_none_match(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    _ = _install_counting_upstream(monkeypatch, {"sub": "user-1", "scope": "readUser"})
+    client = create_app(_cached_settings()).test_client()
+
+    first = client.get("/me", headers={"Authorization": "Bearer token"})
+    etag = first.headers["ETag"]
+    assert b"\n" not in first.data
+    assert b'":' in first.data and b'": ' not in first.data
+
+    pretty = client.get("/me?pretty=1", headers={"Authorization": "Bearer token"})
+    assert b"\n  " in pretty.data
+    assert pretty.headers["ETag"] == etag
+
+    not_modified = client.get(
+        "/me", headers={"Authorization": "Bearer token", "If-None-Match": etag}
+    )
+    assert not_modified.status_code == 304
+    assert not_modified.data == b""
+    assert not_modified.headers["ETag"] == etag
+
+
+def test_me_if_none_match_still_requires_valid_token() -> None:
+    client = create_app(_cached_settings()).test_client()
+    resp = client.get("/me", headers={"If-None-Match": 'W/"anything"'})
+    assert resp.status_code == 401
+
+
+def test_me_subject_only_skips_token_exchange(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls = _install_counting_upstream(monkeypatch, {"sub": "user-1", "scope": "readUser"})
+    client = create_app(_cached_settings()).test_client()
+
+    resp = client.get("/me?fields=subject", headers={"Authorization": "Bearer token"})
+
+    assert resp.status_code == 200
+    assert resp.get_json() == {"subject": "user-1"}
+    assert calls == []
+
+
+def test_me_groups_only_skips_extended_userinfo(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls = _install_counting_upstream(monkeypatch, {"sub": "user-1", "scope": "readUser"})
+    client = create_app(_cached_settings()).test_client()
+
+    resp = client.get("/me?fields=groupinfo", headers={"Authorization": "Bearer token"})
+    assert resp.get_json() == {"groupinfo": [{"id": "g1"}]}
+    assert calls == ["token_exchange", "groupinfo"]
+
+    # A later full request only fetches what the cache does not hold yet.
+    full = client.get("/me", headers={"Authorization": "Bearer token"})
+    assert set(full.get_json()) == {"subject", "extended_userinfo", "groupinfo"}
+    assert calls == ["token_exchange", "groupinfo", "token_exchange", "extended_userinfo"]
+
+
+def test_me_rejects_unknown_fields(monkeypatch: pytest.MonkeyPatch) -> None:
+    _ = _install_counting_upstream(monkeypatch, {"sub": "user-1", "scope": "readUser"})
+    client = create_app(_cached_settings()).test_client()
+
+    resp = client.get("/me?fields=password", headers={"Authorization": "Bearer token"})
+    assert resp.status_code == 400
+
+
+def test_me_groups_filters_and_reuses_cached_groupinfo(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls = _install_counting_upstream(monkeypatch, {"sub": "user-1", "scope": "readUser"})
+    client = create_app(_cached_settings()).test_client()
+
+    first = client.get("/me/groups?id_prefix=g", headers={"Authorization": "Bearer token"})
+    second = client.get("/me/groups?id_prefix=x", headers={"Authorization": "Bearer token"})
+
+    assert first.get_json() == {"total": 1, "offset": 0, "limit": 100, "groups": [{"id": "g1"}]}
+    assert second.get_json()["total"] == 0
+    assert second.headers["X-Cache"] == "hit"
+    assert calls == ["token_exchange", "groupinfo"]
+
+
+def test_me_stream_matches_buffered_body(monkeypatch: pytest.MonkeyPatch) -> None:
+    _ = _install_counting_upstream(monkeypatch, {"sub": "user-1", "scope": "readUser"})
+    client = create_app(_cached_settings()).test_client()
+
+    buffered = client.get("/me", headers={"Authorization": "Bearer token"})
+    streamed = client.get("/me?stream=1", headers={"Authorization": "Bearer token"})
+
+    assert streamed.status_code == 200
+    assert streamed.is_streamed
+    assert streamed.data == buffered.data
+    assert "ETag" not in streamed.headers
+
+
+def test_me_compresses_large_responses(monkeypatch: pytest.MonkeyPatch) -> None:
+    _ = _install_counting_upstream(monkeypatch, {"sub": "user-1", "scope": "readUser"})
+    settings = dataclasses.replace(_cached_settings(), compression_min_bytes=10)
+    client = create_app(settings).test_client()
+    headers = {"Authorization": "Bearer token", "Accept-Encoding": "gzip"}
+
+    plain = client.get("/me", headers={"Authorization": "Bearer token"})
+    buffered = client.get("/me", headers=headers)
+    streamed = client.get("/me?stream=1", headers=headers)
+
+    assert "Content-Encoding" not in plain.headers
+    for resp in (buffered, streamed):
+        assert resp.headers["Content-Encoding"] == "gzip"
+        assert resp.headers["Vary"] == "Accept-Encoding"
+        assert gzip.decompress(resp.data) == plain.data
+
+
+def test_me_rate_limits_per_client(monkeypatch: pytest.MonkeyPatch) -> None:
+    claims: dict[str, object] = {"sub": "user-1", "azp": "client-a", "scope": "readUser"}
+    _ = _install_counting_upstream(monkeypatch, claims)
+    settings = dataclasses.replace(
+        _cached_settings(), client_rate_limit=RateLimit(rate_per_s=0.5, burst=1.0)
+    )
+    client = create_app(settings).test_client()
+
+    first = client.get("/me", headers={"Authorization": "Bearer token"})
+    second = client.get("/me", headers={"Authorization": "Bearer token"})
+    claims["azp"] = "client-b"
+    other = client.get("/me", headers={"Authorization": "Bearer token"})
+
+    assert first.status_code == 200
+    assert second.status_code == 429
+    assert second.headers["Retry-After"] == "2"
+    assert other.status_code == 200
+
+
+def test_subject_limited_request_does_not_use_the_client_bucket(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    claims: dict[str, object] = {"sub": "user-1", "azp": "client-a", "scope": "readUser"}
+    _ = _install_counting_upstream(monkeypatch, claims)
+    settings = dataclasses.replace(
+        _cached_settings(),
+        client_rate_limit=RateLimit(rate_per_s=0.5, burst=2.0),
+        subject_rate_limit=RateLimit(rate_per_s=0.5, burst=1.0),
+    )
+    client = create_app(settings).test_client()
+    headers = {"Authorization": "Bearer token"}
+
+    assert client.get("/me", headers=headers).status_code == 200
+    assert [client.get("/me", headers=headers).status_code for _ in range(3)] == [429] * 3
+    claims["sub"] = "user-2"
+
+    assert client.get("/me", headers=headers).status_code == 200
+
+
+def test_refused_request_does_not_use_up_a_single_use_token(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    claims: dict[str, object] = {
+        "sub": "user-1",
+        "scope": "readUser",
+        "jti": "jti-1",
+        "exp": int(time.time()) + 300,
+    }
+    _ = _install_counting_upstream(monkeypatch, claims)
+    statuses = iter([HTTPStatus.BAD_GATEWAY, HTTPStatus.OK])
+
+    class _Resp:
+        text = "upstream"
+
+        def __init__(self) -> None:
+            self.status_code = next(statuses)
+
+        def json(self) -> object:
+            return [{"id": "g1"}]
+
+    monkeypatch.setattr(requests, "get", lambda url, headers, timeout: _Resp())
+    settings = dataclasses.replace(_cached_settings(), replay_detection=True)
+    client = create_app(settings).test_client()
+    headers = {"Authorization": "Bearer token"}
+
+    failed = client.get("/me?fields=groupinfo", headers=headers)
+    retried = client.get("/me?fields=groupinfo", headers=headers)
+    replayed = client.get("/me?fields=groupinfo", headers=headers)
+
+    assert failed.status_code == 502
+    assert retried.status_code == 200
+    assert replayed.status_code == 401
+    assert b"replay" in replayed.data
+
+
+def test_me_sheds_load_when_upstream_slots_are_busy(monkeypatch: pytest.MonkeyPatch) -> None:
+    _ = _install_counting_upstream(monkeypatch, {"sub": "user-1", "scope": "readUser"})
+    held = ConcurrencyLimiter(1)
+    assert held.try_acquire()
+    monkeypatch.setattr(app_module, "ConcurrencyLimiter", lambda *args, **kwargs: held)
+    settings = dataclasses.replace(_cached_settings(), max_concurrent=1)
+    client = create_app(settings).test_client()
+
+    resp = client.get("/me", headers={"Authorization": "Bearer token"})
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "1"
+
+    # Requests that need no upstream call are not limited.
+    subject_only = client.get("/me?fields=subject", headers={"Authorization": "Bearer token"})
+    assert subject_only.status_code == 200
+
+
+def test_metrics_reports_groupinfo_bulkhead(monkeypatch: pytest.MonkeyPatch) -> None:
+    _ = _install_counting_upstream(monkeypatch, {"sub": "user-1", "scope": "readUser"})
+    settings = dataclasses.replace(_cached_settings(), bulkheads=BulkheadSettings(max_concurrent=4))
+    client = create_app(settings).test_client()
+
+    _ = client.get("/me?fields=groupinfo", headers={"Authorization": "Bearer token"})
+    metrics = client.get("/metrics").get_json()
+
+    assert metrics["bulkheads"]["groupinfo"]["completed"] == 1
+    assert metrics["bulkheads"]["groupinfo"]["limit"] == 4
+    assert metrics["me_cache"]["entries"] == 1
+    assert metrics["admission"] is None
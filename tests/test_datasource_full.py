@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import dataclasses
+import gzip
+from collections.abc import Iterator, Mapping
+
+import pytest
+import requests
+from flask.testing import FlaskClient
+
+import feide_login_full.app as app_module
+from feide_login_full.config import Settings
+
+
+def _settings() -> Settings:
+    return Settings(
+        issuer="https://issuer",
+        client_id="cid",
+        client_secret="csec",
+        redirect_uri="http://localhost/callback",
+        app_secret_key="secret",
+        extended_userinfo_url="https://example/userinfo",
+        token_exchange_audience="aud",
+        token_exchange_scope=None,
+        post_logout_redirect_uri=None,
+        datasource_api_url="http://datasource",
+    )
+
+
+class _FakeResponse:
+    def __init__(self, status_code: int, payload: object, etag: str | None = None) -> None:
+        self.status_code = status_code
+        self._payload = payload
+        self.text = str(payload)
+        self.content = self.text.encode("utf-8")
+        self.headers = {"ETag": etag} if etag else {}
+
+    def json(self) -> object:
+        return self._payload
+
+
+def test_datasource_revalidates_with_if_none_match(monkeypatch: pytest.MonkeyPatch) -> None:
+    sent: list[Mapping[str, str]] = []
+
+    def fake_get(url: str, headers: Mapping[str, str], timeout: float) -> _FakeResponse:
+        _ = url
+        _ = timeout
+        sent.append(dict(headers))
+        if headers.get("If-None-Match") == 'W/"v1"':
+            return _FakeResponse(304, None, etag='W/"v1"')
+        return _FakeResponse(200, {"subject": "user-1", "marker": "cached"}, etag='W/"v1"')
+
+    monkeypatch.setattr(requests, "get", fake_get)
+    client = app_module.create_app(_settings()).test_client()
+    with client.session_transaction() as session:
+        session["user"] = {"sub": "user-1", "exchanged_access_token": "jwt"}
+
+    first = client.get("/datasource")
+    second = client.get("/datasource")
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert b"cached" in second.data
+    assert "If-None-Match" not in sent[0]
+    assert sent[1]["If-None-Match"] == 'W/"v1"'
+
+
+class _FakeRaw:
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+
+    def stream(self, amt: int, decode_content: bool) -> Iterator[bytes]:
+        assert decode_content is False
+        for start in range(0, len(self.body), 4):
+            yield self.body[start : start + 4]
+
+
+class _FakeStreamingResponse:
+    def __init__(self, status_code: int, body: bytes, headers: Mapping[str, str]) -> None:
+        self.status_code = status_code
+        self.headers = dict(headers)
+        self.encoding = "utf-8"
+        self.raw = _FakeRaw(body)
+        self.closed = False
+
+    def iter_content(self, chunk_size: int) -> Iterator[bytes]:
+        return self.raw.stream(chunk_size, decode_content=False)
+
+    def json(self) -> object:
+        raise AssertionError("pass-through must not parse the body")
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def _streaming_client(
+    monkeypatch: pytest.MonkeyPatch,
+    upstream: _FakeStreamingResponse,
+    sent: list[Mapping[str, object]],
+    settings: Settings,
+) -> FlaskClient:
+    def fake_get(
+        url: str, headers: Mapping[str, str], timeout: float, stream: bool
+    ) -> _FakeStreamingResponse:
+        sent.append({"url": url, "headers": dict(headers), "timeout": timeout, "stream": stream})
+        return upstream
+
+    monkeypatch.setattr(requests, "get", fake_get)
+    client = app_module.create_app(settings).test_client()
+    with client.session_transaction() as session:
+        session["user"] = {"sub": "user-1", "exchanged_access_token": "jwt"}
+    return client
+
+
+def test_raw_datasource_relays_status_headers_and_encoded_body(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    body = gzip.compress(b'{"groups": []}')
+    upstream = _FakeStreamingResponse(
+        200,
+        body,
+        {"Content-Type": "application/json", "Content-Encoding": "gzip", "ETag": '"v1"'},
+    )
+    sent: list[Mapping[str, object]] = []
+    settings = dataclasses.replace(_settings(), datasource_timeout_s=12.5)
+    client = _streaming_client(monkeypatch, upstream, sent, settings)
+
+    resp = client.get(
+        "/datasource?raw=1", headers={"Accept-Encoding": "gzip", "If-None-Match": '"v0"'}
+    )
+
+    assert resp.status_code == 200
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert resp.headers["ETag"] == '"v1"'
+    assert resp.content_type == "application/json"
+    assert resp.data == body
+    resp.close()
+    assert upstream.closed
+    assert sent == [
+        {
+            "url": "http://datasource/me",
+            "headers": {
+                "Authorization": "Bearer jwt",
+                "Accept-Encoding": "gzip",
+                "If-None-Match": '"v0"',
+            },
+            "timeout": 12.5,
+            "stream": True,
+        }
+    ]
+
+
+def test_passthrough_streams_escaped_body_into_page(monkeypatch: pytest.MonkeyPatch) -> None:
+    upstream = _FakeStreamingResponse(
+        200, '{"name": "Åse <admin>"}'.encode(), {"Content-Type": "application/json"}
+    )
+    sent: list[Mapping[str, object]] = []
+    settings = dataclasses.replace(_settings(), datasource_passthrough=True)
+    client = _streaming_client(monkeypatch, upstream, sent, settings)
+
+    resp = client.get("/datasource")
+
+    assert resp.status_code == 200
+    assert resp.content_type.startswith("text/html")
+    text = resp.get_data(as_text=True)
+    assert "<pre>{&quot;name&quot;: &quot;Åse &lt;admin&gt;&quot;}</pre>" in text
+    resp.close()
+    assert upstream.closed
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import gzip
+import json
+
+import pytest
+
+from feide_data_source_api.encoding import (
+    available_encodings,
+    compress,
+    compress_stream,
+    iter_json,
+    peek,
+)
+from feide_data_source_api.payload import dumps
+
+_PAYLOAD: dict[str, object] = {
+    "subject": "user-1",
+    "groupinfo": [{"id": f"fc:gogroup:example.org:{i}", "name": "Gruppe ø"} for i in range(500)],
+}
+
+
+@pytest.mark.parametrize("pretty", [False, True])
+def test_iter_json_is_byte_identical_to_dumps(pretty: bool) -> None:
+    chunks = list(iter_json(_PAYLOAD, pretty=pretty, chunk_size=1024))
+    assert len(chunks) > 1
+    assert b"".join(chunks) == dumps(_PAYLOAD, pretty=pretty).encode("utf-8")
+
+
+def test_peek_keeps_the_full_stream() -> None:
+    reached, stream = peek(iter([b"ab", b"cd", b"ef"]), 3)
+    assert reached
+    assert b"".join(stream) == b"abcdef"
+
+    reached, stream = peek(iter([b"ab"]), 3)
+    assert not reached
+    assert b"".join(stream) == b"ab"
+
+
+@pytest.mark.parametrize("encoding", available_encodings())
+def test_compress_stream_round_trips(encoding: str) -> None:
+    body = dumps(_PAYLOAD, pretty=False).encode("utf-8")
+    streamed = b"".join(compress_stream(iter_json(_PAYLOAD, chunk_size=1024), encoding))
+    if encoding == "gzip":
+        assert gzip.decompress(streamed) == body
+    else:
+        brotli = pytest.importorskip("brotli")
+        assert brotli.decompress(streamed) == body
+    assert len(compress(body, encoding)) < len(body)
+    assert json.loads(body) == _PAYLOAD
+
+
+def test_compress_rejects_unknown_encoding() -> None:
+    with pytest.raises(ValueError):
+        _ = compress(b"x", "deflate")
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import dataclasses
+import threading
+from collections.abc import Mapping
+
+import pytest
+import requests
+from flask.testing import FlaskClient
+
+import feide_login_full.app as app_module
+from feide_login_core.oidc import OIDCError
+from feide_login_core.oidc_models import TokenExchangeResponse
+from feide_login_full.config import ExchangeProfile, Settings, parse_exchange_profiles
+
+
+class _FakeOIDCClient:
+    def __init__(self, parties: int) -> None:
+        # Every exchange waits for the others, so this only completes if they run concurrently.
+        self.barrier = threading.Barrier(parties, timeout=5)
+        self.audiences: list[str] = []
+        self.threads: list[str] = []
+
+    def token_exchange(
+        self, *, subject_token: str, audience: str, scope: str
+    ) -> TokenExchangeResponse:
+        self.audiences.append(audience)
+        self.threads.append(threading.current_thread().name)
+        _ = self.barrier.wait()
+        if audience == "aud-broken":
+            raise OIDCError("exchange refused")
+        if audience == "aud-unreachable":
+            raise requests.ConnectionError("connection refused")
+        return TokenExchangeResponse(
+            access_token=f"jwt-for-{audience}", token_type="Bearer", expires_in=3600, scope=scope
+        )
+
+
+def _settings(profiles: Mapping[str, ExchangeProfile], **overrides: object) -> Settings:
+    settings = Settings(
+        issuer="https://issuer",
+        client_id="cid",
+        client_secret="csec",
+        redirect_uri="http://localhost/callback",
+        app_secret_key="secret",
+        extended_userinfo_url="https://example/userinfo",
+        token_exchange_audience=None,
+        token_exchange_scope=None,
+        post_logout_redirect_uri=None,
+        datasource_api_url="http://default-datasource",
+        token_exchange_profiles=profiles,
+    )
+    return dataclasses.replace(settings, **overrides)  # pyright: ignore[reportArgumentType]
+
+
+def _client(
+    monkeypatch: pytest.MonkeyPatch, fake: _FakeOIDCClient, settings: Settings
+) -> FlaskClient:
+    monkeypatch.setattr(app_module, "OIDCClient", lambda **kwargs: fake)
+    client = app_module.create_app(settings).test_client()
+    with client.session_transaction() as session:
+        session["user"] = {"sub": "user-1", "feide_access_token": "opaque"}
+    return client
+
+
+def test_parse_exchange_profiles() -> None:
+    profiles = parse_exchange_profiles(
+        '{"groups": {"audience": "aud-g", "scope": "readGroups", "api_url": "http://g"},'
+        ' "users": {"audience": "aud-u"}}'
+    )
+
+    assert profiles == {
+        "groups": ExchangeProfile(audience="aud-g", scope="readGroups", api_url="http://g"),
+        "users": ExchangeProfile(audience="aud-u"),
+    }
+
+
+@pytest.mark.parametrize(
+    "raw", ["not json", "[]", '{"x": "aud"}', '{"x": {}}', '{"x": {"audience": "a", "scope": 1}}']
+)
+def test_parse_exchange_profiles_rejects_invalid_input(raw: str) -> None:
+    with pytest.raises(RuntimeError):
+        _ = parse_exchange_profiles(raw)
+
+
+def test_exchange_runs_all_profiles_concurrently(monkeypatch: pytest.MonkeyPatch) -> None:
+    fake = _FakeOIDCClient(parties=3)
+    profiles = {"a": ExchangeProfile("aud-a"), "b": ExchangeProfile("aud-b")}
+    client = _client(monkeypatch, fake, _settings(profiles, token_exchange_audience="aud-legacy"))
+
+    resp = client.get("/exchange")
+
+    assert resp.status_code == 200
+    assert sorted(fake.audiences) == ["aud-a", "aud-b", "aud-legacy"]
+    with client.session_transaction() as session:
+        user = session["user"]
+    assert user["exchanged_access_token"] == "jwt-for-aud-legacy"
+    assert user["exchanged_tokens"]["a"]["access_token"] == "jwt-for-aud-a"
+    assert user["exchanged_tokens"]["b"]["access_token"] == "jwt-for-aud-b"
+
+
+def test_exchange_reports_failed_profiles(monkeypatch: pytest.MonkeyPatch) -> None:
+    fake = _FakeOIDCClient(parties=2)
+    profiles = {"ok": ExchangeProfile("aud-ok"), "broken": ExchangeProfile("aud-broken")}
+    client = _client(monkeypatch, fake, _settings(profiles))
+
+    resp = client.get("/exchange")
+
+    assert resp.status_code == 200
+    assert b"exchange refused" in resp.data
+    with client.session_transaction() as session:
+        assert set(session["user"]["exchanged_tokens"]) == {"ok"}
+
+
+@pytest.mark.parametrize(
+    ("audience", "message"),
+    [("aud-broken", b"exchange refused"), ("aud-unreachable", b"connection refused")],
+)
+def test_exchange_keeps_profiles_when_the_default_exchange_fails(
+    monkeypatch: pytest.MonkeyPatch, audience: str, message: bytes
+) -> None:
+    fake = _FakeOIDCClient(parties=2)
+    profiles = {"ok": ExchangeProfile("aud-ok")}
+    client = _client(monkeypatch, fake, _settings(profiles, token_exchange_audience=audience))
+
+    resp = client.get("/exchange")
+
+    assert resp.status_code == 200
+    assert message in resp.data
+    assert b"jwt-for-aud-ok" in resp.data
+    with client.session_transaction() as session:
+        assert set(session["user"]["exchanged_tokens"]) == {"ok"}
+        assert "exchanged_access_token" not in session["user"]
+
+
+def test_datasource_reports_an_unreachable_profile_exchange(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    fake = _FakeOIDCClient(parties=1)
+    profiles = {"groups": ExchangeProfile("aud-unreachable", api_url="http://groups")}
+    client = _client(monkeypatch, fake, _settings(profiles))
+
+    resp = client.get("/datasource?target=groups")
+
+    assert resp.status_code == 502
+    assert b"connection refused" in resp.data
+
+
+def test_datasource_routes_target_to_profile_token_and_api(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    sent: list[tuple[str, str]] = []
+
+    class _Response:
+        status_code = 200
+        headers: Mapping[str, str] = {}
+        content = b"{}"
+
+        def json(self) -> object:
+            return {"ok": True}
+
+    def fake_get(url: str, headers: Mapping[str, str], timeout: float) -> _Response:
+        _ = timeout
+        sent.append((url, headers["Authorization"]))
+        return _Response()
+
+    monkeypatch.setattr(requests, "get", fake_get)
+    fake = _FakeOIDCClient(parties=1)
+    profiles = {"groups": ExchangeProfile("aud-g", api_url="http://groups")}
+    client = _client(monkeypatch, fake, _settings(profiles))
+
+    assert client.get("/datasource?target=groups").status_code == 200
+    assert client.get("/datasource?target=groups").status_code == 200
+    assert client.get("/datasource?target=missing").status_code == 404
+
+    # Exchanged on first use, then reused from the session.
+    assert fake.audiences == ["aud-g"]
+    assert sent == [("http://groups/me", "Bearer jwt-for-aud-g")] * 2
+
+
+def test_datasource_exchanges_a_missing_profile_token_inline(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    fake = _FakeOIDCClient(parties=1)
+    profiles = {"groups": ExchangeProfile("aud-unreachable", api_url="http://groups")}
+    client = _client(monkeypatch, fake, _settings(profiles))
+
+    _ = client.get("/datasource?target=groups")
+
+    # Not queued on the background pool behind prefetch/refresh/userinfo work.
+    assert fake.threads == [threading.current_thread().name]
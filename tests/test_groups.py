@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import pytest
+
+from feide_data_source_api.groups import GroupIndex, GroupQuery
+
+_GROUPS: list[object] = [
+    {"id": "fc:org:example.org", "type": "fc:org", "membership": {"basic": "member"}},
+    {
+        "id": "fc:gogroup:example.org:u:ma101:2023h",
+        "type": "fc:gogroup",
+        "membership": {"basic": "admin", "active": False},
+    },
+    {
+        "id": "fc:gogroup:example.org:u:ma101:2024h",
+        "type": "fc:gogroup",
+        "membership": {"basic": "admin"},
+    },
+    {
+        "id": "fc:gogroup:example.org:b:fy201:2024h",
+        "type": "fc:gogroup",
+        "membership": {"basic": "member"},
+    },
+    "not-a-group",
+]
+
+
+def _ids(page_groups: list[object]) -> list[object]:
+    return [group["id"] for group in page_groups if isinstance(group, dict)]
+
+
+def test_filters_are_combined_and_keep_upstream_order() -> None:
+    index = GroupIndex(_GROUPS)
+    page = index.query(GroupQuery(type="fc:gogroup", role="admin", active=True))
+    assert page.total == 1
+    assert _ids(list(page.groups)) == ["fc:gogroup:example.org:u:ma101:2024h"]
+
+
+def test_id_prefix_uses_sorted_ids() -> None:
+    index = GroupIndex(_GROUPS)
+    page = index.query(GroupQuery(id_prefix="fc:gogroup:example.org:u:"))
+    assert _ids(list(page.groups)) == [
+        "fc:gogroup:example.org:u:ma101:2023h",
+        "fc:gogroup:example.org:u:ma101:2024h",
+    ]
+    assert index.query(GroupQuery(id_prefix="fc:adhoc:")).total == 0
+
+
+def test_pagination() -> None:
+    index = GroupIndex(_GROUPS)
+    assert len(index) == 4
+    page = index.query(GroupQuery(offset=1, limit=2))
+    assert page.total == 4
+    assert _ids(list(page.groups)) == [
+        "fc:gogroup:example.org:u:ma101:2023h",
+        "fc:gogroup:example.org:u:ma101:2024h",
+    ]
+
+
+def test_query_args_are_validated() -> None:
+    query = GroupQuery.from_args({"type": "fc:org", "active": "false", "limit": "5"})
+    assert query == GroupQuery(type="fc:org", active=False, limit=5)
+    with pytest.raises(ValueError):
+        _ = GroupQuery.from_args({"limit": "0"})
+    with pytest.raises(ValueError):
+        _ = GroupQuery.from_args({"active": "maybe"})
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import pytest
+
+import feide_login_full.app as app_module
+from feide_login_core.oidc_models import DiscoveryDocument
+from feide_login_full.config import Settings
+
+
+def _settings() -> Settings:
+    return Settings(
+        issuer="https://issuer",
+        client_id="cid",
+        client_secret="csec",
+        redirect_uri="http://localhost/callback",
+        app_secret_key="secret",
+        extended_userinfo_url="https://example/userinfo",
+        token_exchange_audience=None,
+        token_exchange_scope=None,
+        post_logout_redirect_uri=None,
+        datasource_api_url=None,
+    )
+
+
+def _user(name: str, version: str | None, token: str = "at") -> dict[str, object]:
+    user: dict[str, object] = {
+        "sub": "user-1",
+        "id_token_claims": {"sub": "user-1"},
+        "oidc_userinfo": {"name": name},
+        "extended_userinfo": None,
+        "feide_access_token": token,
+        "feide_access_token_expires_in": 3600,
+    }
+    if version is not None:
+        user["render_version"] = version
+    return user
+
+
+def test_index_page_is_cached_per_content_version(monkeypatch: pytest.MonkeyPatch) -> None:
+    rendered: list[str] = []
+    original = app_module.render_user_details
+
+    def counting_render(**kwargs: object) -> str:
+        rendered.append(str(kwargs["oidc_userinfo"]))
+        return original(**kwargs)  # pyright: ignore[reportArgumentType]
+
+    monkeypatch.setattr(app_module, "render_user_details", counting_render)
+    client = app_module.create_app(_settings()).test_client()
+
+    with client.session_transaction() as session:
+        session["user"] = _user("Ada", "v1")
+    first = client.get("/")
+    second = client.get("/")
+    assert first.data == second.data
+    assert b"Ada" in first.data
+    assert len(rendered) == 1
+
+    with client.session_transaction() as session:
+        session["user"] = _user("Grace", "v2")
+    updated = client.get("/")
+    assert b"Grace" in updated.data
+    assert len(rendered) == 2
+
+    metrics = client.get("/metrics").get_json()
+    assert metrics["index_fragments"]["hits"] == 1
+
+
+def test_index_page_without_version_is_rendered_every_time() -> None:
+    client = app_module.create_app(_settings()).test_client()
+    with client.session_transaction() as session:
+        session["user"] = _user("Ada", None)
+    _ = client.get("/")
+    with client.session_transaction() as session:
+        session["user"] = _user("Grace", None)
+    assert b"Grace" in client.get("/").data
+
+
+class _FakeOIDCClient:
+    def discover_configuration(self) -> DiscoveryDocument:
+        return DiscoveryDocument(
+            authorization_endpoint="https://issuer/auth",
+            token_endpoint="https://issuer/token",
+            jwks_uri="https://issuer/jwks",
+            userinfo_endpoint="https://issuer/userinfo",
+            end_session_endpoint=None,
+        )
+
+
+def test_tokens_are_not_cached_and_logout_drops_the_entry(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(app_module, "OIDCClient", lambda **kwargs: _FakeOIDCClient())
+    client = app_module.create_app(_settings()).test_client()
+    with client.session_transaction() as session:
+        session["user"] = _user("Ada", "v1", token="token-one")
+    assert b"token-one" in client.get("/").data
+
+    # Same content version, different token: the cached part cannot hold the token.
+    with client.session_transaction() as session:
+        session["user"] = _user("Ada", "v1", token="token-two")
+    page = client.get("/").data
+    assert b"token-two" in page and b"token-one" not in page
+    assert client.get("/metrics").get_json()["index_fragments"]["hits"] == 1
+
+    _ = client.get("/logout")
+    assert client.get("/metrics").get_json()["index_fragments"]["entries"] == 0
@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import dataclasses
+import threading
+import time
+from collections.abc import Mapping
+from typing import cast
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from flask.testing import FlaskClient
+
+import feide_login_full.app as app_module
+from feide_login_core.bulkhead import BulkheadRejected
+from feide_login_core.jwt_validation import IDTokenClaims
+from feide_login_core.oidc_models import (
+    DiscoveryDocument,
+    TokenExchangeResponse,
+    TokenResponse,
+)
+from feide_login_full.config import Settings
+
+
+class _FakeOIDCClient:
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+        self.release_extended = threading.Event()
+        self.release_extended.set()
+        self.exchange_expires_in = 3600
+        self.extended_saturated = False
+
+    def discover_configuration(self) -> DiscoveryDocument:
+        return DiscoveryDocument(
+            authorization_endpoint="https://issuer/auth",
+            token_endpoint="https://issuer/token",
+            jwks_uri="https://issuer/jwks",
+            userinfo_endpoint="https://issuer/userinfo",
+            end_session_endpoint=None,
+        )
+
+    def fetch_jwks(self) -> Mapping[str, object]:
+        return {"keys": []}
+
+    def exchange_code_for_tokens(self, *, code: str, code_verifier: str) -> TokenResponse:
+        return TokenResponse(
+            access_token=f"at-{code}",
+            id_token="id",
+            token_type="Bearer",
+            expires_in=3600,
+            scope=None,
+        )
+
+    def userinfo(self, *, access_token: str) -> Mapping[str, object]:
+        return {"sub": "user-1"}
+
+    def token_exchange(
+        self, *, subject_token: str, audience: str, scope: str
+    ) -> TokenExchangeResponse:
+        self.calls.append("token_exchange")
+        return TokenExchangeResponse(
+            access_token=f"jwt-{len(self.calls)}",
+            token_type="Bearer",
+            expires_in=self.exchange_expires_in,
+            scope=scope,
+        )
+
+    def extended_userinfo(
+        self, *, access_token: str, extended_userinfo_url: str
+    ) -> Mapping[str, object]:
+        self.calls.append("extended_userinfo")
+        if self.extended_saturated:
+            raise BulkheadRejected("extended_userinfo bulkhead is saturated", retry_after_s=1.0)
+        assert self.release_extended.wait(5)
+        return {"eduPersonPrincipalName": "ada@example.org"}
+
+
+def _settings(**overrides: object) -> Settings:
+    settings = Settings(
+        issuer="https://issuer",
+        client_id="cid",
+        client_secret="csec",
+        redirect_uri="http://localhost/callback",
+        app_secret_key="secret",
+        extended_userinfo_url="https://example/userinfo",
+        token_exchange_audience=None,
+        token_exchange_scope=None,
+        post_logout_redirect_uri=None,
+        datasource_api_url=None,
+    )
+    return dataclasses.replace(settings, **overrides)  # pyright: ignore[reportArgumentType]
+
+
+def _install(monkeypatch: pytest.MonkeyPatch) -> _FakeOIDCClient:
+    fake = _FakeOIDCClient()
+    monkeypatch.setattr(app_module, "OIDCClient", lambda **kwargs: fake)
+    monkeypatch.setattr(
+        app_module, "validate_id_token", lambda **kwargs: IDTokenClaims(raw={"sub": "user-1"})
+    )
+    return fake
+
+
+def _log_in(client: FlaskClient) -> None:
+    started = client.get("/login")
+    state = parse_qs(urlparse(started.location).query)["state"][0]
+    assert client.get(f"/callback?state={state}&code=a").status_code == 200
+
+
+def test_lazy_mode_fetches_extended_userinfo_on_first_view(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    fake = _install(monkeypatch)
+    client = app_module.create_app(_settings(extended_userinfo_mode="lazy")).test_client()
+
+    _log_in(client)
+    assert fake.calls == []
+
+    assert b"ada@example.org" in client.get("/").data
+    assert b"ada@example.org" in client.get("/").data
+    assert fake.calls == ["extended_userinfo"]
+
+
+@pytest.mark.parametrize("mode", ["eager", "lazy"])
+def test_saturated_extended_userinfo_bulkhead_does_not_fail_login(
+    monkeypatch: pytest.MonkeyPatch, mode: str
+) -> None:
+    fake = _install(monkeypatch)
+    fake.extended_saturated = True
+    client = app_module.create_app(_settings(extended_userinfo_mode=mode)).test_client()
+
+    _log_in(client)
+    page = client.get("/")
+
+    assert page.status_code == 200
+    assert b"Logged in as" in page.data
+    assert fake.calls == ["extended_userinfo"]
+
+
+def test_background_mode_shows_loading_until_ready(monkeypatch: pytest.MonkeyPatch) -> None:
+    fake = _install(monkeypatch)
+    fake.release_extended.clear()
+    settings = _settings(extended_userinfo_mode="background", extended_userinfo_timeout_s=0.01)
+    client = app_module.create_app(settings).test_client()
+
+    _log_in(client)
+    assert b"loading" in client.get("/").data
+
+    fake.release_extended.set()
+    deadline = time.monotonic() + 5
+    page = client.get("/").data
+    while b"ada@example.org" not in page and time.monotonic() < deadline:
+        page = client.get("/").data
+    assert b"ada@example.org" in page
+    assert fake.calls == ["extended_userinfo"]
+
+
+def test_eager_mode_is_the_default(monkeypatch: pytest.MonkeyPatch) -> None:
+    fake = _install(monkeypatch)
+    client = app_module.create_app(_settings()).test_client()
+
+    _log_in(client)
+    assert fake.calls == ["extended_userinfo"]
+    assert b"ada@example.org" in client.get("/").data
+
+
+def _prefetch_settings() -> Settings:
+    return _settings(
+        extended_userinfo_mode="lazy",
+        prefetch_token_exchange=True,
+        token_exchange_audience="https://n.feide.no/datasources/x",
+        token_exchange_scope="readUser",
+    )
+
+
+def _wait_for_calls(fake: _FakeOIDCClient, count: int) -> None:
+    deadline = time.monotonic() + 5
+    while len(fake.calls) < count and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def test_exchange_reuses_prefetched_token(monkeypatch: pytest.MonkeyPatch) -> None:
+    fake = _install(monkeypatch)
+    client = app_module.create_app(_prefetch_settings()).test_client()
+
+    _log_in(client)
+    _wait_for_calls(fake, 1)
+    resp = client.get("/exchange")
+
+    assert resp.status_code == 200
+    assert b"jwt-1" in resp.data
+    assert fake.calls == ["token_exchange"]
+    metrics = client.get("/metrics").get_json()["token_exchange_prefetch"]
+    assert (metrics["started"], metrics["hits"], metrics["misses"]) == (1, 1, 0)
+
+    # The prefetched result is claimed once; a second /exchange exchanges again.
+    _ = client.get("/exchange")
+    assert fake.calls == ["token_exchange", "token_exchange"]
+
+
+def test_unused_prefetch_is_counted_as_discarded_on_logout(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    fake = _install(monkeypatch)
+    client = app_module.create_app(_prefetch_settings()).test_client()
+
+    _log_in(client)
+    _wait_for_calls(fake, 1)
+    _ = client.get("/logout")
+
+    metrics = client.get("/metrics").get_json()["token_exchange_prefetch"]
+    assert (metrics["started"], metrics["hits"], metrics["discarded"]) == (1, 0, 1)
+
+
+def test_prefetch_that_times_out_unclaimed_is_counted(monkeypatch: pytest.MonkeyPatch) -> None:
+    fake = _install(monkeypatch)
+    monkeypatch.setattr(app_module, "_BACKGROUND_RESULT_TTL_S", 0.05)
+    client = app_module.create_app(_prefetch_settings()).test_client()
+
+    _log_in(client)
+    _wait_for_calls(fake, 1)
+    time.sleep(0.1)
+
+    metrics = client.get("/metrics").get_json()["token_exchange_prefetch"]
+    assert (metrics["started"], metrics["hits"], metrics["unclaimed"]) == (1, 0, 1)
+    # Counted once, not again on the next scrape.
+    assert client.get("/metrics").get_json()["token_exchange_prefetch"]["unclaimed"] == 1
+
+
+def _session_user(client: FlaskClient) -> dict[str, object]:
+    with client.session_transaction() as sess:
+        return dict(sess["user"])
+
+
+def test_token_inside_refresh_window_is_re_exchanged(monkeypatch: pytest.MonkeyPatch) -> None:
+    fake = _install(monkeypatch)
+    fake.exchange_expires_in = 60
+    settings = dataclasses.replace(_prefetch_settings(), exchange_refresh_window_s=120.0)
+    client = app_module.create_app(settings).test_client()
+
+    _log_in(client)
+    _ = client.get("/exchange")
+    assert _session_user(client)["exchanged_access_token"] == "jwt-1"
+
+    fake.exchange_expires_in = 3600
+    _ = client.get("/datasource")
+    user = _session_user(client)
+    assert user["exchanged_access_token"] == "jwt-2"
+    assert cast(float, user["exchanged_expires_at"]) > time.time() + 3000
+    # The refreshed token is outside the window, so the next request keeps it.
+    _ = client.get("/datasource")
+    assert _session_user(client)["exchanged_access_token"] == "jwt-2"
+    assert client.get("/metrics").get_json()["token_refresh"]["refreshed"] == 1
+
+
+def test_no_refresh_after_feide_token_expired(monkeypatch: pytest.MonkeyPatch) -> None:
+    fake = _install(monkeypatch)
+    fake.exchange_expires_in = 60
+    settings = dataclasses.replace(_prefetch_settings(), exchange_refresh_window_s=120.0)
+    client = app_module.create_app(settings).test_client()
+
+    _log_in(client)
+    _ = client.get("/exchange")
+    with client.session_transaction() as sess:
+        sess["user"] = {**sess["user"], "feide_access_token_expires_at": time.time() - 1}
+    calls = len(fake.calls)
+    _ = client.get("/datasource")
+
+    assert len(fake.calls) == calls
+    assert _session_user(client)["exchanged_access_token"] == "jwt-1"
+
+
+def test_scheduler_refreshes_ahead_and_next_request_adopts_it(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    fake = _install(monkeypatch)
+    fake.exchange_expires_in = 60
+    settings = dataclasses.replace(
+        _prefetch_settings(), exchange_refresh_window_s=120.0, exchange_refresh_scheduler=True
+    )
+    client = app_module.create_app(settings).test_client()
+
+    _log_in(client)
+    _wait_for_calls(fake, 1)
+    fake.exchange_expires_in = 3600
+    _ = client.get("/exchange")
+    # The prefetched token is already inside the window, so its refresh is due immediately.
+    _wait_for_calls(fake, 2)
+    assert fake.calls == ["token_exchange", "token_exchange"]
+
+    _ = client.get("/datasource")
+    assert _session_user(client)["exchanged_access_token"] == "jwt-2"
+    # The adopted result came from the scheduler; no further exchange was needed.
+    assert fake.calls == ["token_exchange", "token_exchange"]
+    scheduler = client.get("/metrics").get_json()["token_refresh"]["scheduler"]
+    assert scheduler["fired"] >= 1
+
+
+def test_refresh_scheduler_replaces_earlier_entry_for_key() -> None:
+    scheduler = app_module.RefreshScheduler()
+    fired: list[str] = []
+    done = threading.Event()
+
+    _ = scheduler.schedule("k", time.time() + 60, lambda: fired.append("old"))
+    _ = scheduler.schedule("k", time.time(), lambda: (fired.append("new"), done.set()))
+
+    assert done.wait(5)
+    assert fired == ["new"]
+    assert scheduler.stats().pending == 0
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+from pathlib import Path
+
+import pytest
+import requests
+
+from feide_login_core.metadata_cache import SharedMetadataCache
+from feide_login_core.oidc import OIDCClient
+
+
+class _FakeResponse:
+    status_code: int
+    _payload: Mapping[str, object]
+    text: str
+
+    def __init__(self, status_code: int, payload: Mapping[str, object]) -> None:
+        self.status_code = status_code
+        self._payload = payload
+        self.text = str(payload)
+
+    def json(self) -> Mapping[str, object]:
+        return self._payload
+
+
+def _client(cache: SharedMetadataCache) -> OIDCClient:
+    return OIDCClient(
+        issuer="https://issuer",
+        client_id="cid",
+        client_secret="csec",
+        redirect_uri="http://localhost/callback",
+        metadata_cache=cache,
+    )
+
+
+def test_workers_share_a_single_upstream_fetch(tmp_path: Path) -> None:
+    path = str(tmp_path / "metadata.bin")
+    calls: list[str] = []
+
+    def fetch() -> Mapping[str, object]:
+        calls.append("fetch")
+        return {"keys": [{"kid": "k1"}]}
+
+    workers = [SharedMetadataCache(path) for _ in range(4)]
+    results = [worker.get_or_fetch("jwks", fetch) for worker in workers]
+
+    assert calls == ["fetch"]
+    assert all(result == {"keys": [{"kid": "k1"}]} for result in results)
+    assert {worker.version for worker in workers} == {1}
+
+
+def test_stale_entry_is_refreshed_and_version_bumped(tmp_path: Path) -> None:
+    path = str(tmp_path / "metadata.bin")
+    payloads = iter([{"keys": ["old"]}, {"keys": ["new"]}])
+
+    def fetch() -> Mapping[str, object]:
+        return next(payloads)
+
+    writer = SharedMetadataCache(path, ttl_s=0.0)
+    assert writer.get_or_fetch("jwks", fetch) == {"keys": ["old"]}
+    assert writer.get_or_fetch("jwks", fetch) == {"keys": ["new"]}
+
+    reader = SharedMetadataCache(path)
+    assert reader.version == 2
+    assert reader.get_or_fetch("jwks", fetch) == {"keys": ["new"]}
+
+
+def test_failed_refresh_serves_the_stale_entry(tmp_path: Path) -> None:
+    path = str(tmp_path / "metadata.bin")
+    cache = SharedMetadataCache(path, ttl_s=0.0)
+    assert cache.get_or_fetch("jwks", lambda: {"keys": ["old"]}) == {"keys": ["old"]}
+
+    def failing_fetch() -> Mapping[str, object]:
+        raise RuntimeError("issuer unavailable")
+
+    assert cache.get_or_fetch("jwks", failing_fetch) == {"keys": ["old"]}
+    with pytest.raises(RuntimeError, match="unavailable"):
+        _ = cache.get_or_fetch("discovery", failing_fetch)
+
+
+def test_corrupt_file_is_treated_as_empty(tmp_path: Path) -> None:
+    path = tmp_path / "metadata.bin"
+    _ = path.write_bytes(b"garbage")
+
+    cache = SharedMetadataCache(str(path))
+    assert cache.entry("jwks") is None
+    assert cache.get_or_fetch("jwks", lambda: {"keys": []}) == {"keys": []}
+    assert cache.version == 1
+
+
+def test_new_oidc_client_starts_warm_from_shared_file(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = str(tmp_path / "metadata.bin")
+    fetched: list[str] = []
+
+    def fake_get(url: str, timeout: float) -> _FakeResponse:
+        _ = timeout
+        fetched.append(url)
+        if url.endswith("/.well-known/openid-configuration"):
+            return _FakeResponse(
+                200,
+                {
+                    "authorization_endpoint": "https://issuer/auth",
+                    "token_endpoint": "https://issuer/token",
+                    "jwks_uri": "https://issuer/jwks",
+                    "userinfo_endpoint": "https://issuer/userinfo",
+                },
+            )
+        if url.endswith("/jwks"):
+            return _FakeResponse(200, {"keys": []})
+        raise AssertionError(f"unexpected GET: {url}")
+
+    monkeypatch.setattr(requests, "get", fake_get)
+
+    first = _client(SharedMetadataCache(path))
+    _ = first.fetch_jwks()
+    assert fetched == ["https://issuer/.well-known/openid-configuration", "https://issuer/jwks"]
+
+    second = _client(SharedMetadataCache(path))
+    assert second.discover_configuration().token_endpoint == "https://issuer/token"
+    assert second.fetch_jwks() == {"keys": []}
+    assert len(fetched) == 2
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import dataclasses
+import time
+from collections.abc import Mapping
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import feide_login_full.app as app_module
+from feide_login_core.jwt_validation import IDTokenClaims
+from feide_login_core.oidc_models import DiscoveryDocument, TokenResponse
+from feide_login_full.config import Settings, load_settings
+from feide_login_full.pending_auth import (
+    PendingAuthorization,
+    PendingAuthorizationStore,
+    safe_return_to,
+)
+
+
+class _FakeOIDCClient:
+    def __init__(self) -> None:
+        self.verifiers: list[str] = []
+
+    def discover_configuration(self) -> DiscoveryDocument:
+        return DiscoveryDocument(
+            authorization_endpoint="https://issuer/auth",
+            token_endpoint="https://issuer/token",
+            jwks_uri="https://issuer/jwks",
+            userinfo_endpoint="https://issuer/userinfo",
+            end_session_endpoint=None,
+        )
+
+    def fetch_jwks(self) -> Mapping[str, object]:
+        return {"keys": []}
+
+    def exchange_code_for_tokens(self, *, code: str, code_verifier: str) -> TokenResponse:
+        self.verifiers.append(code_verifier)
+        return TokenResponse(
+            access_token=f"at-{code}",
+            id_token="id",
+            token_type="Bearer",
+            expires_in=3600,
+            scope=None,
+        )
+
+    def userinfo(self, *, access_token: str) -> Mapping[str, object]:
+        return {"sub": "user-1"}
+
+    def extended_userinfo(
+        self, *, access_token: str, extended_userinfo_url: str
+    ) -> Mapping[str, object]:
+        return {}
+
+
+def _settings() -> Settings:
+    return Settings(
+        issuer="https://issuer",
+        client_id="cid",
+        client_secret="csec",
+        redirect_uri="http://localhost/callback",
+        app_secret_key="secret",
+        extended_userinfo_url="https://example/userinfo",
+        token_exchange_audience=None,
+        token_exchange_scope=None,
+        post_logout_redirect_uri=None,
+        datasource_api_url=None,
+        pending_login_store=True,
+    )
+
+
+def _install(monkeypatch: pytest.MonkeyPatch) -> _FakeOIDCClient:
+    fake = _FakeOIDCClient()
+    nonces: list[str] = []
+
+    def fake_validate_id_token(**kwargs: object) -> IDTokenClaims:
+        nonces.append(str(kwargs["expected_nonce"]))
+        return IDTokenClaims(raw={"sub": "user-1"})
+
+    monkeypatch.setattr(app_module, "OIDCClient", lambda **kwargs: fake)
+    monkeypatch.setattr(app_module, "validate_id_token", fake_validate_id_token)
+    return fake
+
+
+def _state(location: str) -> str:
+    return parse_qs(urlparse(location).query)["state"][0]
+
+
+def test_concurrent_logins_from_one_browser_both_complete(monkeypatch: pytest.MonkeyPatch) -> None:
+    fake = _install(monkeypatch)
+    client = app_module.create_app(_settings()).test_client()
+
+    first = client.get("/login")
+    second = client.get("/login?next=/exchange")
+    # Only the first login sets the session cookie.
+    assert "Set-Cookie" in first.headers
+    assert "Set-Cookie" not in second.headers
+
+    done_second = client.get(f"/callback?state={_state(second.location)}&code=b")
+    done_first = client.get(f"/callback?state={_state(first.location)}&code=a")
+
+    assert done_second.status_code == 302
+    assert done_second.location == "/exchange"
+    assert done_first.status_code == 200
+    assert len(set(fake.verifiers)) == 2
+
+    # States are single use.
+    replay = client.get(f"/callback?state={_state(first.location)}&code=a")
+    assert replay.status_code == 400
+
+
+def test_state_from_another_browser_is_rejected(monkeypatch: pytest.MonkeyPatch) -> None:
+    _ = _install(monkeypatch)
+    app = app_module.create_app(_settings())
+
+    started = app.test_client().get("/login")
+    resp = app.test_client().get(f"/callback?state={_state(started.location)}&code=a")
+    assert resp.status_code == 400
+
+
+def test_store_expires_and_caps_entries() -> None:
+    store = PendingAuthorizationStore(ttl_s=60, max_entries=2)
+    for state in ("s1", "s2", "s3"):
+        store.put(state, PendingAuthorization(verifier="v", nonce="n", browser="b"))
+    assert len(store) == 2
+    assert store.consume("s1") is None
+    assert store.consume("s3") is not None
+
+    stale = PendingAuthorization(
+        verifier="v", nonce="n", browser="b", created_at=time.monotonic() - 120
+    )
+    store.put("old", stale)
+    assert store.consume("old") is None
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [("/exchange", "/exchange"), ("//evil.example", None), ("https://evil", None), (None, None)],
+)
+def test_safe_return_to(value: str | None, expected: str | None) -> None:
+    assert safe_return_to(value) == expected
+
+
+def test_session_flow_is_unchanged_when_store_is_disabled(monkeypatch: pytest.MonkeyPatch) -> None:
+    _ = _install(monkeypatch)
+    settings = dataclasses.replace(_settings(), pending_login_store=False)
+    client = app_module.create_app(settings).test_client()
+
+    started = client.get("/login")
+    with client.session_transaction() as session:
+        assert session["state"] == _state(started.location)
+    done = client.get(f"/callback?state={_state(started.location)}&code=a")
+    assert done.status_code == 200
+
+
+def test_serving_the_store_requires_a_single_worker(monkeypatch: pytest.MonkeyPatch) -> None:
+    environ = {
+        "OIDC_CLIENT_ID": "cid",
+        "OIDC_CLIENT_SECRET": "secret",
+        "OIDC_REDIRECT_URI": "http://localhost:8000/callback",
+        "APP_SECRET_KEY": "key",
+        "LOGIN_PENDING_STORE": "1",
+    }
+    for name, value in environ.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.delenv("SERVER_WORKERS", raising=False)
+    monkeypatch.delenv("SETTINGS_FILE", raising=False)
+    served: list[int] = []
+    monkeypatch.setattr(
+        app_module, "run_server", lambda factory, server: served.append(server.workers)
+    )
+
+    # The single-process development server loads the same settings without complaint.
+    assert load_settings(environ=environ).pending_login_store is True
+    with pytest.raises(RuntimeError, match="SERVER_WORKERS=1"):
+        app_module.serve()
+    monkeypatch.setenv("SERVER_WORKERS", "1")
+    app_module.serve()
+    assert served == [1]
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import json
+import time
+from collections.abc import Mapping
+from pathlib import Path
+
+import pytest
+import requests
+
+from feide_login_core.bulkhead import Bulkheads, BulkheadSettings
+from feide_login_core.oidc import OIDCClient
+from feide_login_core.pinned_metadata import MetadataRefresher, load_pinned_metadata
+
+_DISCOVERY = {
+    "authorization_endpoint": "https://issuer/auth",
+    "token_endpoint": "https://issuer/token",
+    "jwks_uri": "https://issuer/jwks",
+    "userinfo_endpoint": "https://issuer/userinfo",
+}
+_PINNED_JWKS = {"keys": [{"kid": "old", "kty": "RSA"}]}
+_LIVE_JWKS = {"keys": [{"kid": "new", "kty": "RSA"}]}
+
+
+class _Resp:
+    def __init__(self, status_code: int, payload: Mapping[str, object]) -> None:
+        self.status_code = status_code
+        self.text = json.dumps(payload)
+        self._payload = payload
+
+    def json(self) -> object:
+        return self._payload
+
+
+def _pin(tmp_path: Path) -> tuple[str, str]:
+    discovery = tmp_path / "discovery.json"
+    jwks = tmp_path / "jwks.json"
+    _ = discovery.write_text(json.dumps(_DISCOVERY))
+    _ = jwks.write_text(json.dumps(_PINNED_JWKS))
+    return str(discovery), str(jwks)
+
+
+def _client() -> OIDCClient:
+    return OIDCClient(
+        issuer="https://issuer", client_id="cid", client_secret="sec", redirect_uri="https://rp/cb"
+    )
+
+
+def _patch_issuer(monkeypatch: pytest.MonkeyPatch, *, up: bool) -> list[str]:
+    fetched: list[str] = []
+
+    def fake_get(url: str, timeout: float) -> _Resp:
+        fetched.append(url)
+        if not up:
+            return _Resp(503, {"error": "unavailable"})
+        return _Resp(200, _DISCOVERY if url.endswith("openid-configuration") else _LIVE_JWKS)
+
+    monkeypatch.setattr(requests, "get", fake_get)
+    return fetched
+
+
+def test_pinned_documents_seed_the_client_without_network(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    fetched = _patch_issuer(monkeypatch, up=True)
+    discovery_path, jwks_path = _pin(tmp_path)
+    oidc = _client()
+
+    oidc.seed_metadata(load_pinned_metadata(discovery_path=discovery_path, jwks_path=jwks_path))
+
+    assert oidc.discover_configuration().jwks_uri == "https://issuer/jwks"
+    assert oidc.fetch_jwks() == _PINNED_JWKS
+    assert fetched == []
+
+
+def test_refresh_replaces_pinned_documents(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    _ = _patch_issuer(monkeypatch, up=True)
+    discovery_path, jwks_path = _pin(tmp_path)
+    pinned = load_pinned_metadata(discovery_path=discovery_path, jwks_path=jwks_path)
+    oidc = _client()
+    oidc.seed_metadata(pinned)
+    refresher = MetadataRefresher(oidc, interval_s=300, pinned=pinned)
+
+    assert refresher.refresh() is True
+
+    assert oidc.fetch_jwks() == _LIVE_JWKS
+    status = refresher.status()
+    assert (status.refreshes, status.failures, status.last_error) == (1, 0, None)
+    assert status.pinned_jwks_current is False
+
+
+def test_failed_refresh_keeps_serving_pinned_documents(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    _ = _patch_issuer(monkeypatch, up=False)
+    discovery_path, jwks_path = _pin(tmp_path)
+    pinned = load_pinned_metadata(discovery_path=discovery_path, jwks_path=jwks_path)
+    oidc = _client()
+    oidc.seed_metadata(pinned)
+    refresher = MetadataRefresher(oidc, interval_s=300, pinned=pinned)
+
+    assert refresher.refresh() is False
+
+    assert oidc.fetch_jwks() == _PINNED_JWKS
+    status = refresher.status()
+    assert (status.refreshes, status.failures) == (0, 1)
+    assert status.last_error is not None and "503" in status.last_error
+    assert status.pinned_jwks_current is None
+
+
+def test_unusable_pinned_files_fail_at_startup(tmp_path: Path) -> None:
+    bad_jwks = tmp_path / "jwks.json"
+    _ = bad_jwks.write_text(json.dumps({"not": "a jwks"}))
+    bad_discovery = tmp_path / "discovery.json"
+    _ = bad_discovery.write_text(json.dumps({"issuer": "https://issuer"}))
+
+    with pytest.raises(RuntimeError, match="keys"):
+        _ = load_pinned_metadata(discovery_path=None, jwks_path=str(bad_jwks))
+    with pytest.raises(RuntimeError, match="discovery"):
+        _ = load_pinned_metadata(discovery_path=str(bad_discovery), jwks_path=None)
+    with pytest.raises(RuntimeError, match="Cannot read"):
+        _ = load_pinned_metadata(discovery_path=None, jwks_path=str(tmp_path / "missing.json"))
+    assert load_pinned_metadata(discovery_path=None, jwks_path=None) == {}
+
+
+def test_refresher_survives_a_saturated_bulkhead(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    _ = _patch_issuer(monkeypatch, up=True)
+    discovery_path, jwks_path = _pin(tmp_path)
+    pinned = load_pinned_metadata(discovery_path=discovery_path, jwks_path=jwks_path)
+    bulkheads = Bulkheads(BulkheadSettings(max_concurrent=1))
+    oidc = OIDCClient(
+        issuer="https://issuer",
+        client_id="cid",
+        client_secret="sec",
+        redirect_uri="https://rp/cb",
+        bulkheads=bulkheads,
+    )
+    oidc.seed_metadata(pinned)
+    refresher = MetadataRefresher(oidc, interval_s=300, pinned=pinned, min_spacing_s=0)
+
+    with bulkheads.call("discovery"):
+        assert refresher.refresh() is False
+        refresher.ensure_running()
+        deadline = time.monotonic() + 5
+        while refresher.status().failures < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    status = refresher.status()
+    assert (status.refreshes, status.failures) == (0, 2)
+    assert status.last_error is not None and "saturated" in status.last_error
+    # The background thread is still alive: a requested refresh now succeeds.
+    refresher.request_refresh()
+    deadline = time.monotonic() + 5
+    while refresher.status().refreshes < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert refresher.status().refreshes == 1
+    assert oidc.fetch_jwks() == _LIVE_JWKS
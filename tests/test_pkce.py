@@ -2,8 +2,10 @@ from __future__ import annotations
 
 import base64
 import hashlib
+import threading
+import time
 
-from feide_login_core.pkce import generate_pkce
+from feide_login_core.pkce import LoginSecrets, LoginSecretsPool, generate_pkce
 
 
 def _b64url_decode(s: str) -> bytes:
@@ -26,3 +28,48 @@ def test_generate_pkce_returns_verifier_and_challenge() -> None:
 
     # verifier should be valid base64url
     _ = _b64url_decode(verifier)
+
+
+def _wait_for_depth(pool: LoginSecretsPool, depth: int) -> None:
+    deadline = time.monotonic() + 5
+    while pool.stats().depth < depth and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def test_login_secrets_pool_hands_out_each_entry_once() -> None:
+    pool = LoginSecretsPool(8)
+    try:
+        _wait_for_depth(pool, 8)
+        taken: list[LoginSecrets] = []
+        threads = [
+            threading.Thread(target=lambda: taken.extend(pool.take() for _ in range(50)))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        pool.close()
+
+    assert len(taken) == 200
+    assert len({item.verifier for item in taken}) == 200
+    assert len({item.state for item in taken}) == 200
+    stats = pool.stats()
+    assert stats.served + stats.fallbacks == 200
+    assert stats.served >= 8
+
+
+def test_login_secrets_pool_falls_back_when_empty() -> None:
+    pool = LoginSecretsPool(1)
+    pool.close()
+    # Drain what the filler produced before it stopped.
+    while pool.stats().depth:
+        _ = pool.take()
+    before = pool.stats().fallbacks
+
+    item = pool.take()
+
+    assert pool.stats().fallbacks == before + 1
+    expected = base64.urlsafe_b64encode(hashlib.sha256(item.verifier.encode()).digest())
+    assert item.challenge == expected.rstrip(b"=").decode("ascii")
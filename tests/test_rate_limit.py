@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import pytest
+
+from feide_login_core.rate_limit import InMemoryRateLimitBackend, RateLimit
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_bucket_allows_burst_then_reports_wait() -> None:
+    clock = _Clock()
+    backend = InMemoryRateLimitBackend(clock=clock)
+    limit = RateLimit(rate_per_s=2.0, burst=3.0)
+
+    assert [backend.take("k", limit) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert backend.take("k", limit) == pytest.approx(0.5)
+
+    clock.now = 0.5
+    assert backend.take("k", limit) == 0.0
+    assert backend.take("other", limit) == 0.0
+
+
+def test_bucket_refill_is_capped_at_burst() -> None:
+    clock = _Clock()
+    backend = InMemoryRateLimitBackend(clock=clock)
+    limit = RateLimit(rate_per_s=1.0, burst=2.0)
+
+    _ = backend.take("k", limit)
+    clock.now = 100.0
+    assert [backend.take("k", limit) for _ in range(3)] == [0.0, 0.0, pytest.approx(1.0)]
+
+
+def test_least_recently_used_buckets_are_dropped() -> None:
+    backend = InMemoryRateLimitBackend(max_keys=2, clock=_Clock())
+    limit = RateLimit(rate_per_s=1.0, burst=1.0)
+    for key in ("a", "b", "c"):
+        _ = backend.take(key, limit)
+    assert len(backend) == 2
+    # "a" was dropped and starts with a full bucket again.
+    assert backend.take("a", limit) == 0.0
+
+
+def test_take_all_consumes_every_bucket_or_none() -> None:
+    clock = _Clock()
+    backend = InMemoryRateLimitBackend(clock=clock)
+    roomy = RateLimit(rate_per_s=1.0, burst=2.0)
+    tight = RateLimit(rate_per_s=0.5, burst=1.0)
+
+    assert backend.take_all([("client", roomy), ("sub-1", tight)]) == 0.0
+    assert backend.take_all([("client", roomy), ("sub-1", tight)]) == pytest.approx(2.0)
+    # The refused request left the client bucket untouched.
+    assert backend.take_all([("client", roomy), ("sub-2", tight)]) == 0.0
+    assert backend.take("client", roomy) == pytest.approx(1.0)
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import base64
+import time
+from collections.abc import Mapping
+
+import pytest
+from jose import jwt
+
+from feide_login_core.jwt_validation import AccessTokenValidationError, validate_access_token
+from feide_login_core.replay_cache import ReplayCache
+
+_SECRET = b"super-secret-for-tests"
+_JWKS = {
+    "keys": [
+        {
+            "kty": "oct",
+            "kid": "test-kid",
+            "k": base64.urlsafe_b64encode(_SECRET).rstrip(b"=").decode("ascii"),
+        }
+    ]
+}
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_second_use_of_jti_is_detected() -> None:
+    clock = _Clock()
+    cache = ReplayCache(tokens_per_slice=1000, clock=clock)
+
+    assert cache.check_and_add("jti-1", clock.now + 300)
+    assert not cache.check_and_add("jti-1", clock.now + 300)
+    assert cache.check_and_add("jti-2", clock.now + 300)
+    assert cache.stats().replays == 1
+
+
+def test_expired_slices_are_dropped_and_memory_is_bounded() -> None:
+    clock = _Clock()
+    cache = ReplayCache(max_lifetime_s=3600, slice_s=600, tokens_per_slice=1000, clock=clock)
+
+    for step in range(50):
+        clock.now += 600
+        for i in range(20):
+            assert cache.check_and_add(f"{step}-{i}", clock.now + 3600)
+
+    stats = cache.stats()
+    assert stats.filters <= 7
+    assert stats.bytes <= cache.max_bytes
+
+
+def test_token_lifetime_beyond_window_is_rejected() -> None:
+    clock = _Clock()
+    cache = ReplayCache(max_lifetime_s=3600, clock=clock)
+    with pytest.raises(ValueError):
+        _ = cache.check_and_add("jti", clock.now + 7200)
+
+
+def test_false_positive_rate_stays_within_budget() -> None:
+    clock = _Clock()
+    cache = ReplayCache(tokens_per_slice=20_000, false_positive_rate=1e-3, clock=clock)
+    exp = clock.now + 300
+    for i in range(20_000):
+        _ = cache.check_and_add(f"inserted-{i}", exp)
+
+    # Probes are inserted too, so keep them few enough not to overfill the filter.
+    false_positives = sum(not cache.check_and_add(f"fresh-{i}", exp) for i in range(2000))
+    assert false_positives / 2000 < 5e-3
+
+
+def _access_token(**claims: object) -> str:
+    return jwt.encode(
+        {"iss": "https://issuer.example", "aud": "api", "exp": int(time.time()) + 60, **claims},
+        _SECRET,
+        algorithm="HS256",
+        headers={"kid": "test-kid"},
+    )
+
+
+def test_access_token_replay_is_a_validation_error() -> None:
+    cache = ReplayCache()
+    token = _access_token(jti="abc")
+
+    def validate(token: str) -> Mapping[str, object]:
+        return validate_access_token(
+            token=token,
+            jwks=_JWKS,
+            issuer="https://issuer.example",
+            audience="api",
+            replay_cache=cache,
+        )
+
+    assert validate(token)["jti"] == "abc"
+    with pytest.raises(AccessTokenValidationError, match="replay"):
+        _ = validate(token)
+    with pytest.raises(AccessTokenValidationError, match="jti"):
+        _ = validate(_access_token())
+
+
+def test_seen_checks_without_recording() -> None:
+    clock = _Clock()
+    cache = ReplayCache(tokens_per_slice=1000, clock=clock)
+
+    assert not cache.seen("jti-1", clock.now + 300)
+    assert cache.check_and_add("jti-1", clock.now + 300)
+    assert cache.seen("jti-1", clock.now + 300)
+    assert cache.stats().replays == 1
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import os
+import signal
+import time
+
+import pytest
+
+from feide_login_core.serving import exit_on_sigterm, load_server_settings
+
+
+def test_server_settings_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("SERVER_WORKERS", "6")
+    monkeypatch.setenv("SERVER_THREADS", "12")
+    monkeypatch.setenv("SERVER_PRELOAD_APP", "false")
+    monkeypatch.delenv("PORT", raising=False)
+
+    server = load_server_settings(default_port=8001)
+    options = server.gunicorn_options()
+
+    assert options["bind"] == "0.0.0.0:8001"
+    assert options["workers"] == 6
+    assert options["threads"] == 12
+    assert options["worker_class"] == "gthread"
+    assert options["preload_app"] is False
+
+
+def test_server_settings_reject_invalid_numbers(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("SERVER_WORKERS", "many")
+    with pytest.raises(RuntimeError):
+        _ = load_server_settings(default_port=8000)
+
+
+def test_preloading_is_off_unless_the_app_opts_in(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("SERVER_PRELOAD_APP", raising=False)
+
+    assert load_server_settings(default_port=8000).preload_app is False
+    assert load_server_settings(default_port=8000, default_preload_app=True).preload_app is True
+
+
+def test_sigterm_exits_cleanly_so_atexit_handlers_run() -> None:
+    previous = signal.getsignal(signal.SIGTERM)
+    try:
+        exit_on_sigterm()
+        with pytest.raises(SystemExit) as exc_info:
+            os.kill(os.getpid(), signal.SIGTERM)
+            time.sleep(5)  # Interrupted as soon as the handler runs.
+    finally:
+        _ = signal.signal(signal.SIGTERM, previous)
+    assert exc_info.value.code == 0
@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import os
+from collections.abc import Mapping
+from dataclasses import dataclass
+from pathlib import Path
+
+import pytest
+import requests
+
+import feide_data_source_api.app as app_module
+from feide_data_source_api.config import RELOADABLE_FIELDS, load_settings
+from feide_login_core.env import env_int
+from feide_login_core.oidc import OIDCClient
+from feide_login_core.settings_reload import SettingsProvider, read_env_file
+
+
+@dataclass(frozen=True)
+class _Settings:
+    secret: str
+    pool_size: int
+
+
+def _load(environ: Mapping[str, str]) -> _Settings:
+    return _Settings(
+        secret=environ["TEST_SECRET"], pool_size=env_int("TEST_POOL_SIZE", 1, environ=environ)
+    )
+
+
+def _write(path: Path, text: str, *, mtime_ns: int) -> None:
+    _ = path.write_text(text)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_read_env_file(tmp_path: Path) -> None:
+    path = tmp_path / "settings.env"
+    _ = path.write_text("# comment\n\nexport A=1\nB = 'two words'\nC=\"x=y\"\n")
+
+    assert read_env_file(str(path)) == {"A": "1", "B": "two words", "C": "x=y"}
+
+    _ = path.write_text("not a setting\n")
+    with pytest.raises(RuntimeError, match="settings.env:1"):
+        _ = read_env_file(str(path))
+
+
+def test_file_change_swaps_reloadable_fields_only(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.setenv("TEST_SECRET", "from-env")
+    monkeypatch.delenv("TEST_POOL_SIZE", raising=False)
+    path = tmp_path / "settings.env"
+    _write(path, "TEST_SECRET=first\n", mtime_ns=1_000_000_000)
+    provider = SettingsProvider(
+        _load, reloadable={"secret"}, env_file=str(path), check_interval_s=0
+    )
+    seen: list[tuple[str, str]] = []
+    provider.on_reload(lambda old, new: seen.append((old.secret, new.secret)))
+    before = provider.current
+
+    assert before == _Settings(secret="first", pool_size=1)
+    assert provider.maybe_reload() is False
+
+    _write(path, "TEST_SECRET=second\nTEST_POOL_SIZE=8\n", mtime_ns=2_000_000_000)
+    assert provider.maybe_reload() is True
+
+    assert provider.current == _Settings(secret="second", pool_size=1)
+    assert before.secret == "first"
+    assert seen == [("first", "second")]
+    status = provider.status()
+    assert (status.version, status.reloads, status.failures) == (2, 1, 0)
+    assert status.last_changed == ("secret",)
+    assert status.restart_required == ("pool_size",)
+    assert status.last_reload_latency_s is not None
+
+    # Removing a key from the file restores the environment's own value.
+    _write(path, "TEST_POOL_SIZE=8\n", mtime_ns=3_000_000_000)
+    assert provider.maybe_reload() is True
+    assert provider.current.secret == "from-env"
+    # The file is applied to a copy; the process environment is never modified.
+    assert "TEST_POOL_SIZE" not in os.environ
+
+
+def test_broken_file_keeps_running_settings(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    monkeypatch.setenv("TEST_SECRET", "from-env")
+    monkeypatch.delenv("TEST_POOL_SIZE", raising=False)
+    path = tmp_path / "settings.env"
+    _write(path, "TEST_SECRET=first\n", mtime_ns=1_000_000_000)
+    provider = SettingsProvider(
+        _load, reloadable={"secret", "pool_size"}, env_file=str(path), check_interval_s=0
+    )
+
+    _write(path, "TEST_SECRET=second\nTEST_POOL_SIZE=many\n", mtime_ns=2_000_000_000)
+    assert provider.maybe_reload() is False
+
+    assert provider.current == _Settings(secret="first", pool_size=1)
+    assert os.environ["TEST_SECRET"] == "from-env"
+    status = provider.status()
+    assert (status.version, status.failures) == (1, 1)
+    assert status.last_error is not None and "TEST_POOL_SIZE" in status.last_error
+    # The same broken file is not retried on every request.
+    assert provider.maybe_reload() is False
+    assert provider.status().failures == 1
+
+
+def test_requested_reload_without_file(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("TEST_SECRET", "first")
+    provider = SettingsProvider(_load, reloadable={"secret"})
+
+    monkeypatch.setenv("TEST_SECRET", "second")
+    assert provider.maybe_reload() is False
+    provider.request_reload()
+    assert provider.maybe_reload() is True
+    assert provider.current.secret == "second"
+
+
+_DISCOVERY = {
+    "authorization_endpoint": "https://issuer/auth",
+    "token_endpoint": "https://issuer/token",
+    "jwks_uri": "https://issuer/jwks",
+    "userinfo_endpoint": "https://issuer/userinfo",
+}
+
+
+class _Resp:
+    status_code = 200
+    text = ""
+
+    def __init__(self, payload: Mapping[str, object]) -> None:
+        self._payload = payload
+
+    def json(self) -> object:
+        return self._payload
+
+
+def test_data_source_rotates_credentials_without_losing_caches(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    for name, value in {
+        "DATASOURCE_CLIENT_ID": "cid",
+        "DATASOURCE_CLIENT_SECRET": "old-secret",
+        "DATASOURCE_AUDIENCE": "aud-1",
+        "DATASOURCE_REQUIRED_SCOPE": "readUser",
+        "DATASOURCE_TOKEN_EXCHANGE_AUDIENCE": "ex-aud",
+        "DATASOURCE_ME_CACHE_TTL_S": "300",
+    }.items():
+        monkeypatch.setenv(name, value)
+    fetched: list[str] = []
+    audiences: list[object] = []
+
+    def fake_get(url: str, timeout: float) -> _Resp:
+        fetched.append(url)
+        if url.endswith("openid-configuration"):
+            return _Resp(_DISCOVERY)
+        return _Resp({"keys": []})
+
+    def fake_validate(**kwargs: object) -> dict[str, object]:
+        audiences.append(kwargs["audience"])
+        return {"sub": "u1", "scope": "readUser"}
+
+    clients: list[OIDCClient] = []
+
+    def make_client(**kwargs: object) -> OIDCClient:
+        client = OIDCClient(**kwargs)  # pyright: ignore[reportArgumentType]
+        clients.append(client)
+        return client
+
+    monkeypatch.setattr(requests, "get", fake_get)
+    monkeypatch.setattr(app_module, "validate_access_token", fake_validate)
+    monkeypatch.setattr(app_module, "OIDCClient", make_client)
+    path = tmp_path / "settings.env"
+    _write(path, "DATASOURCE_CLIENT_SECRET=old-secret\n", mtime_ns=1_000_000_000)
+    monkeypatch.delenv("HTTP_POOL_MAXSIZE", raising=False)
+    provider = SettingsProvider(
+        lambda environ: load_settings(environ=environ),
+        reloadable=RELOADABLE_FIELDS,
+        env_file=str(path),
+        check_interval_s=0,
+    )
+    client = app_module.create_app(provider.current, settings_provider=provider).test_client()
+    headers = {"Authorization": "Bearer token"}
+    assert client.get("/me?fields=subject", headers=headers).status_code == 200
+
+    _write(
+        path,
+        "DATASOURCE_CLIENT_SECRET=new-secret\nDATASOURCE_AUDIENCE=aud-2\nHTTP_POOL_MAXSIZE=4\n",
+        mtime_ns=2_000_000_000,
+    )
+    resp = client.get("/me?fields=subject", headers=headers)
+
+    assert resp.status_code == 200
+    assert resp.headers["X-Cache"] == "hit"
+    assert audiences == ["aud-1", "aud-2"]
+    assert (clients[0].client_id, clients[0].client_secret) == ("cid", "new-secret")
+    # Discovery and JWKS were fetched once, before the reload.
+    assert len(fetched) == 2
+    settings = client.get("/metrics").get_json()["settings"]
+    assert settings["version"] == 2
+    assert sorted(settings["last_changed"]) == ["client_secret", "datasource_audience"]
+    assert settings["restart_required"] == ["http_pool_maxsize"]
+
+
+def test_set_credentials_is_used_for_token_exchange(monkeypatch: pytest.MonkeyPatch) -> None:
+    auths: list[tuple[str, str]] = []
+
+    def fake_get(url: str, timeout: float) -> _Resp:
+        return _Resp(_DISCOVERY)
+
+    def fake_post(
+        url: str, data: Mapping[str, object], auth: tuple[str, str], timeout: float
+    ) -> _Resp:
+        auths.append(auth)
+        return _Resp({"access_token": "jwt", "token_type": "Bearer", "expires_in": 60})
+
+    monkeypatch.setattr(requests, "get", fake_get)
+    monkeypatch.setattr(requests, "post", fake_post)
+    oidc = OIDCClient(
+        issuer="https://issuer", client_id="cid", client_secret="old", redirect_uri="http://rp"
+    )
+
+    _ = oidc.token_exchange(subject_token="opaque", audience="aud", scope="")
+    oidc.set_credentials("cid-2", "new")
+    _ = oidc.token_exchange(subject_token="opaque", audience="aud", scope="")
+
+    assert auths == [("cid", "old"), ("cid-2", "new")]
+
+
+def test_a_reload_during_a_request_does_not_mix_versions(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    for name, value in {
+        "DATASOURCE_CLIENT_ID": "cid",
+        "DATASOURCE_CLIENT_SECRET": "secret",
+        "DATASOURCE_AUDIENCE": "aud",
+        "DATASOURCE_REQUIRED_SCOPE": "readUser",
+        "DATASOURCE_TOKEN_EXCHANGE_AUDIENCE": "ex-aud-1",
+    }.items():
+        monkeypatch.setenv(name, value)
+    path = tmp_path / "settings.env"
+    _write(path, "", mtime_ns=1_000_000_000)
+    provider = SettingsProvider(
+        lambda environ: load_settings(environ=environ),
+        reloadable=RELOADABLE_FIELDS,
+        env_file=str(path),
+    )
+    exchanged_for: list[object] = []
+
+    def fake_get(url: str, timeout: float, headers: Mapping[str, str] | None = None) -> _Resp:
+        if url.endswith("openid-configuration"):
+            return _Resp(_DISCOVERY)
+        return _Resp({"keys": []})
+
+    def fake_post(
+        url: str, data: Mapping[str, object], auth: tuple[str, str], timeout: float
+    ) -> _Resp:
+        exchanged_for.append(data["audience"])
+        return _Resp({"access_token": "jwt", "token_type": "Bearer", "expires_in": 60})
+
+    def fake_validate(**kwargs: object) -> dict[str, object]:
+        # Another thread publishes a new version while this request is running.
+        _write(path, "DATASOURCE_TOKEN_EXCHANGE_AUDIENCE=ex-aud-2\n", mtime_ns=2_000_000_000)
+        _ = provider.reload()
+        return {"sub": "u1", "scope": "readUser"}
+
+    monkeypatch.setattr(requests, "get", fake_get)
+    monkeypatch.setattr(requests, "post", fake_post)
+    monkeypatch.setattr(app_module, "validate_access_token", fake_validate)
+    client = app_module.create_app(provider.current, settings_provider=provider).test_client()
+    headers = {"Authorization": "Bearer token"}
+
+    _ = client.get("/me?fields=extended_userinfo", headers=headers)
+    _ = client.get("/me?fields=extended_userinfo", headers=headers)
+
+    assert provider.status().version == 2
+    assert exchanged_for == ["ex-aud-1", "ex-aud-2"]
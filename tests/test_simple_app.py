@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 import os
+from collections.abc import Iterator
 
 import pytest
-import requests
 
+from feide_login_core import oidc_simple
 from feide_login_simple.app import create_app
 
 
@@ -21,14 +22,22 @@ class _FakeResponse:
             raise RuntimeError("bad response")
 
 
-def test_login_redirects_to_authorization_endpoint(monkeypatch: pytest.MonkeyPatch) -> None:
+@pytest.fixture(autouse=True)
+def _fresh_discovery_cache() -> Iterator[None]:
+    oidc_simple.clear_discovery_cache()
+    yield
+    oidc_simple.clear_discovery_cache()
+
+
+def _install_discovery(monkeypatch: pytest.MonkeyPatch) -> list[str]:
     os.environ["OIDC_CLIENT_ID"] = "cid"
     os.environ["OIDC_CLIENT_SECRET"] = "csec"
     os.environ["OIDC_REDIRECT_URI"] = "http://localhost/callback"
+    calls: list[str] = []
 
     def fake_get(url: str, timeout: float) -> _FakeResponse:
-        _ = url
         _ = timeout
+        calls.append(url)
         return _FakeResponse(
             {
                 "authorization_endpoint": "https://issuer/auth",
@@ -36,7 +45,12 @@ def test_login_redirects_to_authorization_endpoint(monkeypatch: pytest.MonkeyPat
             }
         )
 
-    monkeypatch.setattr(requests, "get", fake_get)
+    monkeypatch.setattr(oidc_simple.http, "get", fake_get)
+    return calls
+
+
+def test_login_redirects_to_authorization_endpoint(monkeypatch: pytest.MonkeyPatch) -> None:
+    _ = _install_discovery(monkeypatch)
 
     app = create_app()
     client = app.test_client()
@@ -44,3 +58,16 @@ def test_login_redirects_to_authorization_endpoint(monkeypatch: pytest.MonkeyPat
     resp = client.get("/login")
     assert resp.status_code == 302
     assert "https://issuer/auth" in resp.location
+
+
+def test_discovery_is_fetched_once_per_ttl(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls = _install_discovery(monkeypatch)
+    client = create_app().test_client()
+
+    for _ in range(3):
+        assert client.get("/login").status_code == 302
+    assert len(calls) == 1
+
+    monkeypatch.setattr(oidc_simple, "DISCOVERY_TTL_S", 0.0)
+    _ = client.get("/login")
+    assert len(calls) == 2
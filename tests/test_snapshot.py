@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Callable, Mapping
+from pathlib import Path
+
+import pytest
+import requests
+
+import feide_data_source_api.app as app_module
+from feide_data_source_api.config import Settings
+from feide_login_core.metadata_cache import CacheEntry
+from feide_login_core.snapshot import (
+    CacheSnapshot,
+    SnapshotSettings,
+    entries_from_json,
+    entries_to_json,
+    metadata_from_json,
+    metadata_to_json,
+)
+
+
+def test_snapshot_round_trip_is_encrypted(tmp_path: Path) -> None:
+    path = tmp_path / "snapshot.jwe"
+    snapshot = CacheSnapshot(str(path), secret="app-secret")
+
+    snapshot.save({"me": [["user-1", {"email": "ada@example.org"}, time.time() + 60]]})
+
+    assert b"ada@example.org" not in path.read_bytes()
+    loaded = snapshot.load()
+    assert loaded is not None
+    assert loaded["me"] == [
+        ["user-1", {"email": "ada@example.org"}, pytest.approx(time.time() + 60, abs=5)]
+    ]
+
+
+def test_snapshot_is_ignored_with_another_secret_or_when_tampered(tmp_path: Path) -> None:
+    path = tmp_path / "snapshot.jwe"
+    CacheSnapshot(str(path), secret="app-secret").save({"metadata": {}})
+
+    assert CacheSnapshot(str(path), secret="other-secret").load() is None
+    token = path.read_bytes()
+    _ = path.write_bytes(token[:-4] + (b"AAAA" if not token.endswith(b"AAAA") else b"BBBB"))
+    assert CacheSnapshot(str(path), secret="app-secret").load() is None
+    assert CacheSnapshot(str(tmp_path / "missing"), secret="app-secret").load() is None
+
+
+def test_old_snapshot_is_ignored(tmp_path: Path) -> None:
+    path = tmp_path / "snapshot.jwe"
+    CacheSnapshot(str(path), secret="app-secret").save({})
+
+    assert CacheSnapshot(str(path), secret="app-secret", max_age_s=60).load() is not None
+    assert CacheSnapshot(str(path), secret="app-secret", max_age_s=-1).load() is None
+
+
+def test_expired_entries_and_metadata_are_not_restored() -> None:
+    entries = entries_to_json([("live", 1, 60.0), ("expired", 2, -1.0)])
+    assert [(key, value) for key, value, _ in entries_from_json(entries)] == [("live", 1)]
+
+    metadata = metadata_to_json(
+        {
+            "discovery": CacheEntry(fetched_at=time.time() - 10, value={"a": 1}),
+            "jwks": CacheEntry(fetched_at=time.time() - 7200, value={"keys": []}),
+        }
+    )
+    assert list(metadata_from_json(metadata, max_age_s=3600)) == ["discovery"]
+
+
+_DISCOVERY = {
+    "authorization_endpoint": "https://issuer/auth",
+    "token_endpoint": "https://issuer/token",
+    "jwks_uri": "https://issuer/jwks",
+    "userinfo_endpoint": "https://issuer/userinfo",
+}
+
+
+class _Resp:
+    status_code = 200
+    text = ""
+
+    def __init__(self, payload: Mapping[str, object]) -> None:
+        self._payload = payload
+
+    def json(self) -> object:
+        return self._payload
+
+
+def _patch_issuer(monkeypatch: pytest.MonkeyPatch) -> list[str]:
+    fetched: list[str] = []
+
+    def fake_get(url: str, timeout: float) -> _Resp:
+        fetched.append(url)
+        return _Resp(_DISCOVERY if url.endswith("openid-configuration") else {"keys": []})
+
+    monkeypatch.setattr(requests, "get", fake_get)
+    monkeypatch.setattr(
+        app_module, "validate_access_token", lambda **kwargs: {"sub": "u1", "scope": "readUser"}
+    )
+    return fetched
+
+
+def test_data_source_restarts_warm_from_snapshot(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    fetched = _patch_issuer(monkeypatch)
+    settings = Settings(
+        issuer="https://issuer",
+        client_id="cid",
+        client_secret="c_sec",
+        datasource_audience="aud",
+        required_scope="readUser",
+        token_exchange_audience="ex-aud",
+        token_exchange_scope="readUser",
+        extended_userinfo_url="https://example/userinfo",
+        groupinfo_url="https://example/groups",
+        me_cache_ttl_s=300.0,
+        snapshot=SnapshotSettings(path=str(tmp_path / "snapshot.jwe")),
+    )
+    headers = {"Authorization": "Bearer token"}
+
+    before = app_module.create_app(settings)
+    assert before.test_client().get("/me?fields=subject", headers=headers).status_code == 200
+    save: Callable[[], None] = before.extensions["save_cache_snapshot"]
+    save()
+    assert len(fetched) == 2
+
+    after = app_module.create_app(settings).test_client()
+    resp = after.get("/me?fields=subject", headers=headers)
+
+    assert resp.status_code == 200
+    assert resp.headers["X-Cache"] == "hit"
+    # Discovery and JWKS came from the snapshot: no new issuer calls.
+    assert len(fetched) == 2
+    assert after.get("/metrics").get_json()["snapshot_restored"] == {
+        "metadata": 2,
+        "me": 1,
+        "shared": 0,
+    }
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from feide_login_core.ttl_cache import TTLCache
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_entries_expire_after_ttl() -> None:
+    clock = _Clock()
+    cache: TTLCache[str] = TTLCache(max_entries=10, clock=clock)
+    assert cache.set("a", "value", ttl_s=5)
+
+    clock.now = 4.9
+    assert cache.get("a") == "value"
+    clock.now = 5.0
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted() -> None:
+    cache: TTLCache[int] = TTLCache(max_entries=2)
+    _ = cache.set("a", 1, ttl_s=60)
+    _ = cache.set("b", 2, ttl_s=60)
+    assert cache.get("a") == 1
+    _ = cache.set("c", 3, ttl_s=60)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats().evictions == 1
+
+
+def test_size_budget_is_enforced() -> None:
+    cache: TTLCache[str] = TTLCache(max_entries=100, max_size=10)
+    _ = cache.set("a", "x", ttl_s=60, size=6)
+    _ = cache.set("b", "y", ttl_s=60, size=6)
+
+    assert cache.get("a") is None
+    assert cache.stats().size == 6
+    assert not cache.set("huge", "z", ttl_s=60, size=11)
+    assert cache.get("huge") is None
+
+
+def test_expired_entries_are_reclaimed_before_evicting_live_ones() -> None:
+    clock = _Clock()
+    cache: TTLCache[int] = TTLCache(max_entries=2, clock=clock)
+    _ = cache.set("short", 1, ttl_s=1)
+    _ = cache.set("long", 2, ttl_s=60)
+    clock.now = 2.0
+    _ = cache.set("new", 3, ttl_s=60)
+
+    assert cache.get("long") == 2
+    assert cache.get("new") == 3
+    assert cache.stats().evictions == 0
+
+
+def test_on_evict_sees_expired_and_evicted_entries_only() -> None:
+    clock = _Clock()
+    evicted: list[tuple[str, int]] = []
+    cache: TTLCache[int] = TTLCache(
+        max_entries=2, clock=clock, on_evict=lambda key, value: evicted.append((key, value))
+    )
+    _ = cache.set("a", 1, ttl_s=5)
+    _ = cache.set("b", 2, ttl_s=60)
+    _ = cache.set("c", 3, ttl_s=60)
+    assert evicted == [("a", 1)]
+
+    assert cache.pop("b") == 2
+    _ = cache.set("c", 4, ttl_s=60)
+    clock.now = 60.0
+    assert cache.purge_expired() == 1
+
+    assert evicted == [("a", 1), ("c", 4)]
+    assert len(cache) == 0
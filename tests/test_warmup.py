@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+
+import pytest
+import requests
+
+from feide_data_source_api.app import create_app
+from feide_data_source_api.config import Settings
+from feide_login_core.oidc import OIDCClient
+from feide_login_core.warmup import readiness, warm_up
+
+
+class _FakeResponse:
+    status_code: int
+    _payload: Mapping[str, object]
+    text: str
+
+    def __init__(self, status_code: int, payload: Mapping[str, object]) -> None:
+        self.status_code = status_code
+        self._payload = payload
+        self.text = str(payload)
+
+    def json(self) -> Mapping[str, object]:
+        return self._payload
+
+
+def _install_fake_issuer(monkeypatch: pytest.MonkeyPatch, *, up: bool = True) -> list[str]:
+    fetched: list[str] = []
+
+    def fake_get(url: str, timeout: float) -> _FakeResponse:
+        _ = timeout
+        fetched.append(url)
+        if not up:
+            return _FakeResponse(503, {"error": "down"})
+        if url.endswith("/.well-known/openid-configuration"):
+            return _FakeResponse(
+                200,
+                {
+                    "authorization_endpoint": "https://issuer/auth",
+                    "token_endpoint": "https://issuer/token",
+                    "jwks_uri": "https://issuer/jwks",
+                    "userinfo_endpoint": "https://issuer/userinfo",
+                },
+            )
+        if url.endswith("/jwks"):
+            return _FakeResponse(200, {"keys": [{"kty": "oct", "kid": "k", "k": "c2VjcmV0"}]})
+        raise AssertionError(f"unexpected GET: {url}")
+
+    monkeypatch.setattr(requests, "get", fake_get)
+    return fetched
+
+
+def _client() -> OIDCClient:
+    return OIDCClient(
+        issuer="https://issuer",
+        client_id="cid",
+        client_secret="csec",
+        redirect_uri="http://localhost/callback",
+    )
+
+
+def _settings(*, warmup_on_start: bool) -> Settings:
+    return Settings(
+        issuer="https://issuer",
+        client_id="cid",
+        client_secret="c_sec",
+        datasource_audience="aud",
+        required_scope="readUser",
+        token_exchange_audience="ex-aud",
+        token_exchange_scope="readUser",
+        extended_userinfo_url="https://example/userinfo",
+        groupinfo_url="https://example/groups",
+        warmup_on_start=warmup_on_start,
+    )
+
+
+def test_warm_up_prefetches_metadata_and_keys(monkeypatch: pytest.MonkeyPatch) -> None:
+    _ = _install_fake_issuer(monkeypatch)
+    oidc = _client()
+
+    report = warm_up(oidc)
+
+    assert report.ok
+    assert report.keys_loaded == 1
+    status = oidc.metadata_status()
+    assert status["discovery"]["fresh"] is True
+    assert status["jwks"]["fresh"] is True
+
+
+def test_warm_up_reports_errors_instead_of_raising(monkeypatch: pytest.MonkeyPatch) -> None:
+    _ = _install_fake_issuer(monkeypatch, up=False)
+
+    report = warm_up(_client())
+
+    assert not report.ok
+    assert report.errors and report.errors[0].startswith("metadata:")
+
+
+def test_readiness_recovers_once_issuer_is_reachable(monkeypatch: pytest.MonkeyPatch) -> None:
+    _ = _install_fake_issuer(monkeypatch, up=False)
+    oidc = _client()
+    ready, _details = readiness(oidc)
+    assert not ready
+
+    _ = _install_fake_issuer(monkeypatch)
+    ready, _details = readiness(oidc)
+    assert ready
+
+
+def test_data_source_warms_up_before_serving(monkeypatch: pytest.MonkeyPatch) -> None:
+    fetched = _install_fake_issuer(monkeypatch)
+
+    app = create_app(_settings(warmup_on_start=True))
+    assert len(fetched) == 2
+
+    client = app.test_client()
+    assert client.get("/readyz").status_code == 200
+    health = client.get("/healthz").get_json()
+    assert health["warmup"]["ok"] is True
+    assert len(fetched) == 2
+
+
+def test_data_source_not_ready_while_issuer_is_down(monkeypatch: pytest.MonkeyPatch) -> None:
+    _ = _install_fake_issuer(monkeypatch, up=False)
+
+    client = create_app(_settings(warmup_on_start=False)).test_client()
+    resp = client.get("/readyz")
+    assert resp.status_code == 503
+    assert resp.get_json()["ready"] is False
+    assert client.get("/healthz").status_code == 200